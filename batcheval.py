@@ -0,0 +1,233 @@
+#Contains a batch evaluation function that scores whole arrays of positions at once with NumPy.
+#minimax_eval scores one Checkers object at a time, which is fine for a search but slow for
+#anything that has lots of positions to score together (the leaves gathered by a search,
+#MCTS leaves, tuning the weights offline). Here the positions are rows of a uint32 array:
+#(black pieces, red pieces, kings, turn) with the masks of bitboard.py and a turn of
+#BLACK_TURN or RED_TURN (see encode()), and every feature is worked out for all of them
+#with a few array operations:
+#   . material and piece-square tables: what each man and king is worth on its square, from
+#     pst.py's tables, blended by the phase of the game the way pst_eval's are
+#   . back rank: BACK_RANK_BONUS per man still guarding its own king row
+#   . mobility: MOBILITY_BONUS per move (step or jump) each side could make
+#The scores are whole numbers in hundredths of a man, from the point of view of the side
+#to move (like pvs's) or of a given player (like minimax_eval's).
+#NumPy isn't needed by anything else in the game, only by this module.
+#Run it with e.g.:  python batcheval.py --positions 100000
+
+import argparse
+import random
+import sys
+import time
+
+import numpy
+
+import bitboard
+import checkers
+import checkersai
+import perft
+import pst
+
+BLACK_TURN = 0
+RED_TURN = 1
+BACK_RANK_BONUS = 6
+MOBILITY_BONUS = 2
+
+_BACK_RANK = {"B": bitboard.KING_ROW["R"], "R": bitboard.KING_ROW["B"]} #Where each color's men start out
+
+
+def _byte_tables(values):
+    """
+    Makes the lookup tables that add up a value per square over a mask
+    a byte at a time (see _add_up()).
+    @values: A value per square
+    type values: tuple
+    return: A (4, 256) int64 array: for each byte of a mask and each
+            value of that byte, the sum of the values of its squares
+    rtype: ndarray
+    """
+    return numpy.array([[sum(values[8*i + bit] for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+                        for i in range(4)], dtype=numpy.int64)
+
+
+_COUNT_TABLES = _byte_tables((1,) * bitboard.NUM_SQUARES)
+#pst.py's values, counting up for either color: (color, is_king) -> (opening, endgame) tables
+_PIECE_TABLES = {key: tuple(_byte_tables([abs(pair[i]) for pair in values]) for i in (0, 1))
+                 for (key, values) in pst.VALUES.items()}
+
+
+
+
+def encode(gamestates):
+    """
+    Stacks the positions of some game states into an array that
+    evaluate() can score.
+    @gamestates: A list of Checkers game states, or of their snapshots
+                 (see Checkers.snapshot())
+    type gamestates: list
+    return: A uint32 array with a row per position: the black pieces,
+            red pieces and kings masks and the turn (BLACK_TURN or RED_TURN)
+    rtype: ndarray
+    """
+    rows = []
+    for gamestate in gamestates:
+        (black, red, kings, turn) = gamestate if isinstance(gamestate, tuple) else gamestate.snapshot()
+        rows.append((black, red, kings, BLACK_TURN if turn == "B" else RED_TURN))
+    return numpy.array(rows, dtype=numpy.uint32).reshape(len(rows), 4)
+
+
+def evaluate(positions, cpu_color=None):
+    """
+    Scores an array of positions.
+    @positions: A uint32 array of positions, a row each (see encode())
+    @cpu_color: The player to score every position for ("B" or "R"), or
+                None to score each one for its side to move
+    type positions: ndarray
+    type cpu_color: str
+    return: An int64 array with a score per position
+    rtype: ndarray
+    """
+    positions = numpy.asarray(positions, dtype=numpy.uint32)
+    (black, red, kings) = (positions[:, 0], positions[:, 1], positions[:, 2])
+    (black_opening, black_endgame, black_rest) = _side_score(black, red, kings, "B")
+    (red_opening, red_endgame, red_rest) = _side_score(red, black, kings, "R")
+    phase = numpy.minimum(_add_up(black | red, _COUNT_TABLES), pst.FULL_PHASE) #As in pst.blend()
+    score = ((black_opening - red_opening)*phase + (black_endgame - red_endgame)*(pst.FULL_PHASE - phase)
+             ) // pst.FULL_PHASE + black_rest - red_rest
+    if cpu_color == "B":
+        return score
+    if cpu_color == "R":
+        return -score
+    return numpy.where(positions[:, 3] == BLACK_TURN, score, -score)
+
+
+def evaluate_one(gamestate, cpu_color):
+    """
+    Scores a single game state (a convenience for comparing with
+    minimax_eval; scoring positions one at a time is what this module
+    is meant to avoid).
+    @gamestate: A Checkers game state
+    @cpu_color: The player to score it for ("B" or "R")
+    type gamestate: Checkers
+    type cpu_color: str
+    return: The score
+    rtype: int
+    """
+    return int(evaluate(encode([gamestate]), cpu_color)[0])
+
+
+def _side_score(own, opp, kings, color):
+    """
+    Adds up one side's features.
+    @own: The masks of the side's pieces, per position
+    @opp: The masks of the other side's pieces, per position
+    @kings: The masks of all kings, per position
+    @color: The side ("B" or "R")
+    type own: ndarray
+    type opp: ndarray
+    type kings: ndarray
+    type color: str
+    return: A 3-tuple of the side's scores (in hundredths of a man), per
+            position: the opening and endgame sums of its pieces' values
+            (see pst.py), and the rest of its features
+    rtype: tuple
+    """
+    (men, own_kings) = (own & ~kings, own & kings)
+    (man_tables, king_tables) = (_PIECE_TABLES[(color, False)], _PIECE_TABLES[(color, True)])
+    (opening, endgame) = (_add_up(men, man_tables[i]) + _add_up(own_kings, king_tables[i]) for i in (0, 1))
+    rest = BACK_RANK_BONUS*_add_up(men & numpy.uint32(_BACK_RANK[color]), _COUNT_TABLES)
+    rest += MOBILITY_BONUS*_mobility(own, opp, kings, color)
+    return (opening, endgame, rest)
+
+
+def _mobility(own, opp, kings, color):
+    """
+    Counts the moves (steps and single jumps, whether or not jumping is
+    forced) that one side could make.
+    @own: The masks of the side's pieces, per position
+    @opp: The masks of the other side's pieces, per position
+    @kings: The masks of all kings, per position
+    @color: The side ("B" or "R")
+    type own: ndarray
+    type opp: ndarray
+    type kings: ndarray
+    type color: str
+    return: The number of moves, per position
+    rtype: ndarray
+    """
+    empty = ~(own | opp) & numpy.uint32(bitboard.FULL_MASK)
+    count = 0
+    for d in bitboard.ALL_DIRS:
+        #bitboard's shift-and-mask helpers work on arrays of masks as they are:
+        movers = bitboard.movers_in_dir(own, kings, color, d)
+        back = bitboard.opposite(d)
+        count = count + _add_up(movers & bitboard.shift(empty, back), _COUNT_TABLES)
+        count = count + _add_up(movers & bitboard.shift(bitboard.shift(empty, back) & opp, back), _COUNT_TABLES)
+    return count
+
+
+def _add_up(masks, tables):
+    """
+    Adds up a value per square over the set bits of every mask.
+    @masks: An array of 32-bit masks
+    @tables: The values, as lookup tables by byte (see _byte_tables())
+    type masks: ndarray
+    type tables: ndarray
+    return: An int64 array with the sum for each mask
+    rtype: ndarray
+    """
+    return (tables[0][masks & 0xFF] + tables[1][(masks >> 8) & 0xFF]
+            + tables[2][(masks >> 16) & 0xFF] + tables[3][masks >> 24])
+
+
+
+
+def main(argv=None):
+    """
+    The command line entry point: times scoring positions from random
+    games in a batch, against scoring them one at a time.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Time the batch evaluation of checkers positions.")
+    parser.add_argument("-n", "--positions", type=int, default=100000, help="the number of positions to score")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the random games")
+    args = parser.parse_args(argv)
+
+    #Positions from random games (played on bare bitboards, see mcts.playout()):
+    rng = random.Random(args.seed)
+    snapshots = []
+    while len(snapshots) < args.positions:
+        (black, red, kings, turn) = checkers.from_fen(perft.START_FEN).snapshot()
+        while len(snapshots) < args.positions:
+            snapshots.append((black, red, kings, turn))
+            (own, opp) = (black, red) if turn == "B" else (red, black)
+            positions = bitboard.successors(own, opp, kings, turn)
+            if not positions:
+                break
+            (own, opp, kings) = positions[rng.randrange(len(positions))]
+            (black, red) = (own, opp) if turn == "B" else (opp, own)
+            turn = "R" if turn == "B" else "B"
+
+    start = time.perf_counter()
+    scores = evaluate(encode(snapshots))
+    batch_seconds = time.perf_counter() - start
+    #The same positions one at a time, with minimax_eval (material only) and with evaluate_one():
+    sample = [checkers.from_snapshot(snapshot) for snapshot in snapshots[:min(len(snapshots), 2000)]]
+    timings = []
+    for score in (checkersai.minimax_eval, evaluate_one):
+        start = time.perf_counter()
+        for gamestate in sample:
+            score(gamestate, gamestate.get_turn())
+        timings.append((time.perf_counter() - start) * len(snapshots) / len(sample))
+    print("{} positions in {:.3f}s ({} positions/s), mean score {:.1f}".format(
+        len(snapshots), batch_seconds, int(len(snapshots) / batch_seconds), scores.mean()))
+    print("one at a time: ~{:.3f}s with minimax_eval, ~{:.3f}s with evaluate_one".format(*timings))
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
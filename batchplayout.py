@@ -0,0 +1,348 @@
+#Contains a batch simulator that plays thousands of random games (playouts) at once with NumPy.
+#A playout one game at a time (see mcts.playout()) spends nearly all of its time in the
+#interpreter. Here every game's board is three 32-bit masks in NumPy arrays (one entry per
+#game), and each step works out the legal moves of every unfinished game and plays a
+#random one with the same shift-and-mask operations bitboard.py uses (bitboard.shift()
+#works on whole arrays as it is), so the interpreter's overhead is shared by the batch.
+#The boards are kept from the point of view of the player to move: their pieces always
+#move down the board (like black's), and after every move the board is turned around (see
+#tablebase.py). The rules are the same as Checkers': jumps are mandatory, a jump goes on
+#for as long as the jumping piece can jump again (a man crowned partway carries on as a
+#king), jumped pieces come off the board straight away, and a player who can't move loses.
+#A jump sequence is picked one jump at a time, so unlike mcts.playout(), every complete
+#move isn't equally likely to be picked (the games are just as legal, only a bit differently random).
+#NumPy isn't needed by anything else in the game, only by this module.
+#Run it with e.g.:  python batchplayout.py --games 4096
+
+import argparse
+import sys
+import time
+
+import numpy
+
+import bitboard
+import checkers
+import perft
+
+BLACK_WON = 1
+RED_WON = -1
+DRAWN = 0
+MAX_PLIES = 150 #A game this long is called a draw (like mcts's playouts)
+
+_KING_ROW = numpy.uint32(bitboard.KING_ROW["B"]) #The king row of the player to move
+_FULL = numpy.uint32(bitboard.FULL_MASK)
+_DOWN_DIRS = bitboard.move_dirs("B") #The directions men move in
+_BIT_INDICES = numpy.arange(bitboard.NUM_SQUARES, dtype=numpy.uint32)
+#bitboard.REVERSED_HALVES as an array, for turning arrays of boards around (see bitboard.flip()),
+#and the number of set bits of every byte:
+_REVERSED_HALVES = numpy.array(bitboard.REVERSED_HALVES, dtype=numpy.uint32)
+_BYTE_COUNTS = numpy.array([bin(byte).count("1") for byte in range(256)], dtype=numpy.int64)
+
+
+
+
+class BatchSimulator:
+    """ Plays a batch of random games to the end, all at once. """
+
+    def __init__(self, black, red, kings, turn, max_plies=MAX_PLIES, seed=None):
+        """
+        Initializes a BatchSimulator with the games' starting positions.
+        @black: The masks of the black pieces, one per game
+        @red: The masks of the red pieces, one per game
+        @kings: The masks of all kings, one per game
+        @turn: The side to move ("B" or "R"), one per game
+        @max_plies: How many moves may be played before a game is called a draw
+        @seed: The seed of the random moves, or None
+        type black: list
+        type red: list
+        type kings: list
+        type turn: list
+        type max_plies: int
+        type seed: int
+        """
+        black = numpy.asarray(black, dtype=numpy.uint32)
+        red = numpy.asarray(red, dtype=numpy.uint32)
+        kings = numpy.asarray(kings, dtype=numpy.uint32)
+        red_to_move = numpy.array([side == "R" for side in turn], dtype=bool)
+        #Each game's pieces from the point of view of the player to move:
+        self._own = numpy.where(red_to_move, bitboard.flip(red, _REVERSED_HALVES), black)
+        self._opp = numpy.where(red_to_move, bitboard.flip(black, _REVERSED_HALVES), red)
+        self._kings = numpy.where(red_to_move, bitboard.flip(kings, _REVERSED_HALVES), kings)
+        self._sides = numpy.where(red_to_move, RED_WON, BLACK_WON).astype(numpy.int8) #Who's to move, as a result
+        self._ids = numpy.arange(len(red_to_move)) #Which game each row is
+        self._plies = 0
+        self._max_plies = max_plies
+        self._rng = numpy.random.default_rng(seed)
+        self._winners = numpy.zeros(len(red_to_move), dtype=numpy.int8)
+        self._lengths = numpy.zeros(len(red_to_move), dtype=numpy.int32)
+
+
+    def get_num_going(self):
+        """
+        Returns the number of games that aren't over yet.
+        return: The number of unfinished games
+        rtype: int
+        """
+        return len(self._ids)
+
+
+    def get_positions(self):
+        """
+        Returns the positions of the games that aren't over yet, the
+        right way round (e.g., to check them against Checkers).
+        return: A 5-tuple: the games' indices, and a list each of their
+                black pieces, red pieces and kings masks and turns
+        rtype: tuple
+        """
+        black_to_move = self._sides == BLACK_WON
+        black = numpy.where(black_to_move, self._own, bitboard.flip(self._opp, _REVERSED_HALVES))
+        red = numpy.where(black_to_move, self._opp, bitboard.flip(self._own, _REVERSED_HALVES))
+        kings = numpy.where(black_to_move, self._kings, bitboard.flip(self._kings, _REVERSED_HALVES))
+        return (self._ids.tolist(), black.tolist(), red.tolist(), kings.tolist(),
+                ["B" if side == BLACK_WON else "R" for side in self._sides])
+
+
+    def get_results(self):
+        """
+        Returns the results of the games (only meaningful once they're
+        all over).
+        return: A 2-tuple of arrays with a result per game: the winner
+                (BLACK_WON, RED_WON or DRAWN) and the number of moves played
+        rtype: tuple
+        """
+        return (self._winners, self._lengths)
+
+
+    def run(self):
+        """
+        Plays every game to the end.
+        return: Like get_results()
+        rtype: tuple
+        """
+        while self.get_num_going() > 0:
+            self.step()
+        return self.get_results()
+
+
+    def step(self):
+        """
+        Plays one move (a whole jump sequence, if it's a jump) in every
+        unfinished game. A player who can't move loses, and the games
+        that reach the move limit are drawn.
+        return: The number of games that aren't over yet
+        rtype: int
+        """
+        (own, opp, kings) = (self._own, self._opp, self._kings)
+        empty = ~(own | opp) & _FULL
+        #The pieces that can jump, and step, in each direction:
+        jumps = [_movers(own, kings, d) & bitboard.shift(bitboard.shift(empty, bitboard.opposite(d)) & opp,
+                                                         bitboard.opposite(d))
+                 for d in bitboard.ALL_DIRS]
+        jumping = (jumps[0] | jumps[1] | jumps[2] | jumps[3]) != 0
+        moves = [numpy.where(jumping, jumps[i], _movers(own, kings, d) & bitboard.shift(empty, bitboard.opposite(d)))
+                 for (i, d) in enumerate(bitboard.ALL_DIRS)]
+
+        stuck = (moves[0] | moves[1] | moves[2] | moves[3]) == 0
+        if stuck.any():
+            self._finish(stuck, -self._sides[stuck])
+            (moves, jumping) = ([m[~stuck] for m in moves], jumping[~stuck])
+        if len(self._ids) == 0:
+            return 0
+
+        (pieces, directions) = self._pick(moves)
+        (targets, jumped) = (_shift_each(pieces, directions), numpy.zeros_like(pieces))
+        jumped[jumping] = targets[jumping]
+        targets[jumping] = _shift_each(targets[jumping], directions[jumping])
+        self._move_pieces(slice(None), pieces, targets, jumped)
+
+        #A jump goes on for as long as the piece that jumped can jump again:
+        rows = numpy.flatnonzero(jumping)
+        while len(rows) > 0:
+            (here, opp, kings) = (targets[rows], self._opp[rows], self._kings[rows])
+            empty = ~(self._own[rows] | opp) & _FULL
+            jumps = [_movers(here, kings, d) & bitboard.shift(bitboard.shift(empty, bitboard.opposite(d)) & opp,
+                                                              bitboard.opposite(d))
+                     for d in bitboard.ALL_DIRS]
+            going_on = (jumps[0] | jumps[1] | jumps[2] | jumps[3]) != 0
+            (rows, here, jumps) = (rows[going_on], here[going_on], [j[going_on] for j in jumps])
+            if len(rows) == 0:
+                break
+            directions = self._pick(jumps)[1]
+            jumped = _shift_each(here, directions)
+            targets[rows] = _shift_each(jumped, directions)
+            self._move_pieces(rows, here, targets[rows], jumped)
+
+        #Turn the boards around for the other player:
+        (self._own, self._opp) = (bitboard.flip(self._opp, _REVERSED_HALVES),
+                                  bitboard.flip(self._own, _REVERSED_HALVES))
+        self._kings = bitboard.flip(self._kings, _REVERSED_HALVES)
+        self._sides = -self._sides
+        self._plies += 1
+        if self._plies >= self._max_plies:
+            self._finish(numpy.ones(len(self._ids), dtype=bool), DRAWN)
+        return len(self._ids)
+
+
+    def _pick(self, moves):
+        """
+        Picks one of the possible moves of every row at random.
+        @moves: A list of 4 arrays of masks (one per direction, in
+                bitboard.ALL_DIRS order): the pieces that can move in that
+                direction, per row (each row has at least one)
+        type moves: list
+        return: A 2-tuple of arrays: the mask of the piece picked and the
+                index of its direction, per row
+        rtype: tuple
+        """
+        counts = numpy.stack([_count(m) for m in moves])
+        picks = (self._rng.random(counts.shape[1]) * counts.sum(axis=0)).astype(numpy.int64)
+        #The direction the pick falls in, and which of that direction's pieces it is:
+        ends = numpy.cumsum(counts, axis=0)
+        directions = (ends <= picks).sum(axis=0)
+        picks -= ends[directions, numpy.arange(len(picks))] - counts[directions, numpy.arange(len(picks))]
+        chosen = numpy.choose(directions, moves)
+        bits = (chosen[:, None] >> _BIT_INDICES[None, :]) & 1
+        squares = (numpy.cumsum(bits, axis=1) > picks[:, None]).argmax(axis=1)
+        return (numpy.uint32(1) << squares.astype(numpy.uint32), directions)
+
+
+    def _move_pieces(self, rows, pieces, targets, jumped):
+        """
+        Moves a piece in each of the given rows, removes the piece it
+        jumped (if any) and crowns it if it got to the king row.
+        @rows: The rows to move in (an index array or a slice)
+        @pieces: The mask of the piece to move, per row
+        @targets: The mask of the square it goes to, per row
+        @jumped: The mask of the piece it jumped, per row (0 if it didn't jump)
+        type rows: ndarray
+        type pieces: ndarray
+        type targets: ndarray
+        type jumped: ndarray
+        return: None
+        rtype: None
+        """
+        kings = self._kings[rows]
+        crowned = ((kings & pieces) != 0) | ((targets & _KING_ROW) != 0)
+        self._own[rows] = self._own[rows] & ~pieces | targets
+        self._opp[rows] = self._opp[rows] & ~jumped
+        self._kings[rows] = kings & ~(pieces | jumped) | numpy.where(crowned, targets, 0).astype(numpy.uint32)
+
+
+    def _finish(self, done, winners):
+        """
+        Records the results of the games in the given rows and drops them.
+        @done: A boolean array: True for the rows of the finished games
+        @winners: The winner of each finished game (or one for all of them)
+        type done: ndarray
+        type winners: ndarray
+        return: None
+        rtype: None
+        """
+        self._winners[self._ids[done]] = winners
+        self._lengths[self._ids[done]] = self._plies
+        going = ~done
+        self._ids = self._ids[going]
+        self._sides = self._sides[going]
+        (self._own, self._opp, self._kings) = (self._own[going], self._opp[going], self._kings[going])
+
+
+
+
+def playouts(black, red, kings, turn, num_games, max_plies=MAX_PLIES, seed=None):
+    """
+    Plays a number of random games out from the same position.
+    @black: The mask of the black pieces
+    @red: The mask of the red pieces
+    @kings: The mask of all kings
+    @turn: The side to move ("B" or "R")
+    @num_games: The number of games to play
+    @max_plies: How many moves may be played before a game is called a draw
+    @seed: The seed of the random moves, or None
+    type black: int
+    type red: int
+    type kings: int
+    type turn: str
+    type num_games: int
+    type max_plies: int
+    type seed: int
+    return: Like BatchSimulator.get_results()
+    rtype: tuple
+    """
+    return BatchSimulator([black] * num_games, [red] * num_games, [kings] * num_games,
+                          [turn] * num_games, max_plies, seed).run()
+
+
+def _movers(own, kings, d):
+    """
+    Returns the pieces of the player to move that may go in a direction
+    (like bitboard.movers_in_dir(), for arrays of masks).
+    @own: The masks of the player's pieces
+    @kings: The masks of all kings
+    @d: A direction
+    type own: ndarray
+    type kings: ndarray
+    type d: tuple
+    return: The masks of the pieces that may go in direction d
+    rtype: ndarray
+    """
+    return own if d in _DOWN_DIRS else own & kings
+
+
+def _shift_each(masks, directions):
+    """
+    Shifts each mask one square in its own direction.
+    @masks: An array of masks
+    @directions: The index of each mask's direction (in bitboard.ALL_DIRS)
+    type masks: ndarray
+    type directions: ndarray
+    return: The shifted masks
+    rtype: ndarray
+    """
+    return numpy.choose(directions, [bitboard.shift(masks, d) for d in bitboard.ALL_DIRS])
+
+
+def _count(masks):
+    """
+    Counts the set bits of every mask.
+    @masks: An array of 32-bit masks
+    type masks: ndarray
+    return: The number of set bits of each
+    rtype: ndarray
+    """
+    return (_BYTE_COUNTS[masks & 0xFF] + _BYTE_COUNTS[(masks >> 8) & 0xFF]
+            + _BYTE_COUNTS[(masks >> 16) & 0xFF] + _BYTE_COUNTS[masks >> 24])
+
+
+
+
+def main(argv=None):
+    """
+    The command line entry point: times a batch of playouts.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Time a batch of random checkers games.")
+    parser.add_argument("--fen", default=perft.START_FEN, help="the PDN FEN position to play out from")
+    parser.add_argument("-n", "--games", type=int, default=4096, help="the number of games in the batch")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the random moves")
+    args = parser.parse_args(argv)
+    try:
+        gamestate = checkers.from_fen(args.fen)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    (winners, lengths) = playouts(*gamestate.snapshot(), args.games, seed=args.seed)
+    seconds = time.perf_counter() - start
+    print("{} games in {:.3f}s ({} playouts/s): black won {}, red won {}, {} drawn, {:.1f} moves on average".format(
+        args.games, seconds, int(args.games / seconds), int((winners == BLACK_WON).sum()),
+        int((winners == RED_WON).sum()), int((winners == DRAWN).sum()), lengths.mean()))
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,563 @@
+#Contains the bitboard representation of a checkers board and the
+#shift-and-mask helpers used for move generation.
+#
+#Only the 32 dark squares of the board can ever hold a piece, so a
+#position fits in three 32-bit masks: one for the black pieces, one for
+#the red pieces and one for the kings (of either color). Square n lives
+#at bit n, numbered row by row from the top-left of the board:
+#
+#     .  0  .  1  .  2  .  3        (row 0)
+#     4  .  5  .  6  .  7  .        (row 1)
+#     .  8  .  9  . 10  . 11        (row 2)
+#    ...
+#    28  . 29  . 30  . 31  .        (row 7)
+#
+#This happens to be the standard checkers square numbering minus one.
+
+
+import random
+
+
+NUM_SQUARES = 32
+FULL_MASK = (1 << NUM_SQUARES) - 1
+
+#Directions are (row delta, col delta). Black starts at the top of the
+#board and moves down, red starts at the bottom and moves up.
+UP_LEFT = (-1, -1)
+UP_RIGHT = (-1, 1)
+DOWN_LEFT = (1, -1)
+DOWN_RIGHT = (1, 1)
+ALL_DIRS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+BLACK_DIRS = (DOWN_LEFT, DOWN_RIGHT)
+RED_DIRS = (UP_LEFT, UP_RIGHT)
+
+#The squares where an uncrowned piece of each color gets crowned.
+KING_ROW = {"B": 0xF0000000, "R": 0x0000000F}
+
+
+
+
+def sq_to_cell(sq):
+    """
+    Converts a square number into a 0-based (row, col) cell.
+    @sq: A square number (0 through 31)
+    type sq: int
+    return: The 0-based (row, col) of the square
+    rtype: tuple
+    """
+    row = sq // 4
+    return (row, 2*(sq % 4) + (1 if row % 2 == 0 else 0))
+
+
+def cell_to_sq(i_row, i_col):
+    """
+    Converts a 0-based (row, col) cell into a square number. The cell
+    is assumed to be one of the dark squares that pieces can occupy.
+    @i_row: A 0-based row index
+    @i_col: A 0-based col index
+    type i_row: int
+    type i_col: int
+    return: The square number of the cell
+    rtype: int
+    """
+    return i_row*4 + i_col//2
+
+
+def _make_dir_shifts():
+    """
+    Works out, for every direction, which shift moves a square's bit
+    onto its neighbor in that direction. The shift differs between even
+    and odd rows, so each direction gets a list of (shift, mask) pairs
+    where mask holds the squares that the shift applies to. Squares
+    whose neighbor would be off the board are left out of every mask.
+    return: A dict mapping each direction to its (shift, mask) pairs
+    rtype: dict
+    """
+    dir_shifts = dict()
+    for d in ALL_DIRS:
+        masks = dict()
+        for sq in range(NUM_SQUARES):
+            i_row, i_col = sq_to_cell(sq)
+            n_row, n_col = i_row+d[0], i_col+d[1]
+            if 0 <= n_row <= 7 and 0 <= n_col <= 7:
+                s = cell_to_sq(n_row, n_col) - sq
+                masks[s] = masks.get(s, 0) | (1 << sq)
+        dir_shifts[d] = tuple(masks.items())
+    return dir_shifts
+
+
+_DIR_SHIFTS = _make_dir_shifts()
+
+
+
+
+#Static per-square lookup tables, built once at import. Directions are
+#referred to by their index in ALL_DIRS, and a piece's "kind" is its
+#color ("B" or "R") if it's uncrowned or "K" if it's a king (kings move
+#the same way regardless of color).
+SQ_CELLS = tuple(sq_to_cell(sq) for sq in range(NUM_SQUARES))
+PIECE_DIRS = {"B": (2, 3), "R": (0, 1), "K": (0, 1, 2, 3)}
+
+
+def _make_tables():
+    """
+    Builds the per-square neighbor and jump tables.
+    return: A 2-tuple whose first component maps [sq][dir index] to the
+            neighboring square (or None if off the board) and whose second
+            component maps [sq][dir index] to a (jumped square, landing
+            square) pair (or None if the landing square is off the board).
+    rtype: tuple
+    """
+    neighbors, jumps = [], []
+    for sq in range(NUM_SQUARES):
+        i_row, i_col = sq_to_cell(sq)
+        sq_neighbors, sq_jumps = [], []
+        for d in ALL_DIRS:
+            n_row, n_col = i_row+d[0], i_col+d[1]
+            l_row, l_col = i_row+2*d[0], i_col+2*d[1]
+            sq_neighbors.append(cell_to_sq(n_row, n_col)
+                                if 0 <= n_row <= 7 and 0 <= n_col <= 7 else None)
+            sq_jumps.append((cell_to_sq(n_row, n_col), cell_to_sq(l_row, l_col))
+                            if 0 <= l_row <= 7 and 0 <= l_col <= 7 else None)
+        neighbors.append(tuple(sq_neighbors))
+        jumps.append(tuple(sq_jumps))
+    return (tuple(neighbors), tuple(jumps))
+
+
+NEIGHBORS, JUMPS = _make_tables()
+
+#For every kind of piece and square: the squares it can step to, and the
+#(jumped square, landing square) pairs of the jumps it can make.
+STEP_TABLE = {kind: tuple(tuple(NEIGHBORS[sq][i] for i in dirs if NEIGHBORS[sq][i] != None)
+                          for sq in range(NUM_SQUARES))
+              for (kind, dirs) in PIECE_DIRS.items()}
+JUMP_TABLE = {kind: tuple(tuple(JUMPS[sq][i] for i in dirs if JUMPS[sq][i] != None)
+                          for sq in range(NUM_SQUARES))
+              for (kind, dirs) in PIECE_DIRS.items()}
+
+#For every square: the square itself and the squares one or two diagonal
+#steps away from it. These are the only pieces whose steps or jumps can
+#change when something arrives at (or leaves) that square.
+NEARBY = tuple((1 << sq) | sum(1 << n for n in NEIGHBORS[sq] if n != None)
+               | sum(1 << jump[1] for jump in JUMPS[sq] if jump != None)
+               for sq in range(NUM_SQUARES))
+
+#The same tables keyed by 0-based (row, col) cells, for code that works
+#with the list board.
+CELL_STEP_TABLE = {kind: {sq_to_cell(sq): tuple(sq_to_cell(t) for t in table[sq])
+                          for sq in range(NUM_SQUARES)}
+                   for (kind, table) in STEP_TABLE.items()}
+CELL_JUMP_TABLE = {kind: {sq_to_cell(sq): tuple((sq_to_cell(o), sq_to_cell(l)) for (o, l) in table[sq])
+                          for sq in range(NUM_SQUARES)}
+                   for (kind, table) in JUMP_TABLE.items()}
+
+#Zobrist keys: a random 64-bit key for every (color, is king) pair and
+#square, plus one for red being the side to move. A position's key is the
+#XOR of the keys of everything in it. The seed is fixed so that keys (and
+#anything stored under them) are the same in every process and every run.
+_zobrist_rng = random.Random(0x5EEDC4EC)
+ZOBRIST = {(color, is_king): tuple(_zobrist_rng.getrandbits(64) for sq in range(NUM_SQUARES))
+           for color in ("B", "R") for is_king in (False, True)}
+ZOBRIST_TURN = _zobrist_rng.getrandbits(64)
+
+#Maps a (piece cell, jumped cell) pair to the cell the piece would land on.
+JUMP_LANDINGS = {(sq_to_cell(sq), sq_to_cell(jump[0])): sq_to_cell(jump[1])
+                 for sq in range(NUM_SQUARES) for jump in JUMPS[sq] if jump != None}
+
+#Maps a (square, landing square) pair to the square jumped over on the way.
+JUMPED_SQUARES = {(sq, jump[1]): jump[0] for sq in range(NUM_SQUARES) for jump in JUMPS[sq] if jump != None}
+
+#Every 16-bit number with its bits in reverse order (see flip()):
+_REVERSED_BYTES = tuple(int("{:08b}".format(byte)[::-1], 2) for byte in range(256))
+REVERSED_HALVES = tuple(_REVERSED_BYTES[half & 0xFF] << 8 | _REVERSED_BYTES[half >> 8]
+                        for half in range(1 << 16))
+
+
+
+
+def shift(bb, d):
+    """
+    Moves every bit of a mask one square in the given direction. Bits
+    that would fall off the edge of the board are dropped.
+    @bb: A 32-bit square mask
+    @d: A direction (e.g., UP_LEFT)
+    type bb: int
+    type d: tuple
+    return: The shifted mask
+    rtype: int
+    """
+    out = 0
+    for (s, mask) in _DIR_SHIFTS[d]:
+        if s > 0:
+            out |= (bb & mask) << s
+        else:
+            out |= (bb & mask) >> -s
+    return out
+
+
+def opposite(d):
+    """
+    Returns the direction opposite to the given one.
+    @d: A direction
+    type d: tuple
+    return: The opposite direction
+    rtype: tuple
+    """
+    return (-d[0], -d[1])
+
+
+def move_dirs(color):
+    """
+    Returns the directions that an uncrowned piece of the given color
+    is allowed to move in.
+    @color: "B" or "R"
+    type color: str
+    return: A tuple of directions
+    rtype: tuple
+    """
+    return BLACK_DIRS if color == "B" else RED_DIRS
+
+
+def iter_bits(bb):
+    """
+    Yields the square numbers of the set bits of a mask, lowest first
+    (i.e., in the same top-to-bottom, left-to-right order a board scan
+    would visit them).
+    @bb: A 32-bit square mask
+    type bb: int
+    """
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def count_bits(bb):
+    """
+    Counts the set bits of a mask.
+    @bb: A 32-bit square mask
+    type bb: int
+    return: The number of set bits
+    rtype: int
+    """
+    return bin(bb).count("1")
+
+
+def flip(bb, reversed_halves=REVERSED_HALVES):
+    """
+    Turns a mask around: square n becomes square 31-n, which is the
+    same square seen from the other side of the board (so a position
+    with red to move, flipped and with the colors swapped, is the same
+    position with black to move). Each half of the mask is reversed by
+    looking it up, so passing the table as a NumPy array turns a whole
+    array of masks around at once.
+    @bb: A 32-bit square mask (or a NumPy array of them)
+    @reversed_halves: REVERSED_HALVES, or a uint32 NumPy array of it
+    type bb: int
+    type reversed_halves: tuple
+    return: The turned around mask (or masks)
+    rtype: int
+    """
+    return reversed_halves[bb & 0xFFFF] << 16 | reversed_halves[bb >> 16]
+
+
+def movers_in_dir(own, kings, color, d):
+    """
+    Returns the pieces of one side that are allowed to move in the given
+    direction (every king, plus the uncrowned pieces if d is forward for
+    that color).
+    @own: The mask of the moving side's pieces
+    @kings: The mask of all kings on the board
+    @color: The moving side ("B" or "R")
+    @d: A direction
+    type own: int
+    type kings: int
+    type color: str
+    type d: tuple
+    return: A mask of pieces that may move in direction d
+    rtype: int
+    """
+    return own if d in move_dirs(color) else own & kings
+
+
+def jumpers_in_dir(own, opp, kings, color, d):
+    """
+    Returns the pieces of one side that can jump in the given direction.
+    @own: The mask of the moving side's pieces
+    @opp: The mask of the opposing side's pieces
+    @kings: The mask of all kings on the board
+    @color: The moving side ("B" or "R")
+    @d: A direction
+    type own: int
+    type opp: int
+    type kings: int
+    type color: str
+    type d: tuple
+    return: A mask of pieces that can jump in direction d
+    rtype: int
+    """
+    empty = ~(own | opp) & FULL_MASK
+    back = opposite(d)
+    return movers_in_dir(own, kings, color, d) & shift(shift(empty, back) & opp, back)
+
+
+def steppers_in_dir(own, opp, kings, color, d):
+    """
+    Returns the pieces of one side that can step in the given direction.
+    @own: The mask of the moving side's pieces
+    @opp: The mask of the opposing side's pieces
+    @kings: The mask of all kings on the board
+    @color: The moving side ("B" or "R")
+    @d: A direction
+    type own: int
+    type opp: int
+    type kings: int
+    type color: str
+    type d: tuple
+    return: A mask of pieces that can step in direction d
+    rtype: int
+    """
+    empty = ~(own | opp) & FULL_MASK
+    return movers_in_dir(own, kings, color, d) & shift(empty, opposite(d))
+
+
+def jumpers(own, opp, kings, color):
+    """
+    Returns the pieces of one side that have at least one jump.
+    @own: The mask of the moving side's pieces
+    @opp: The mask of the opposing side's pieces
+    @kings: The mask of all kings on the board
+    @color: The moving side ("B" or "R")
+    type own: int
+    type opp: int
+    type kings: int
+    type color: str
+    return: A mask of pieces that can jump
+    rtype: int
+    """
+    out = 0
+    for d in ALL_DIRS:
+        out |= jumpers_in_dir(own, opp, kings, color, d)
+    return out
+
+
+def steppers(own, opp, kings, color):
+    """
+    Returns the pieces of one side that have at least one step.
+    @own: The mask of the moving side's pieces
+    @opp: The mask of the opposing side's pieces
+    @kings: The mask of all kings on the board
+    @color: The moving side ("B" or "R")
+    type own: int
+    type opp: int
+    type kings: int
+    type color: str
+    return: A mask of pieces that can step
+    rtype: int
+    """
+    out = 0
+    for d in ALL_DIRS:
+        out |= steppers_in_dir(own, opp, kings, color, d)
+    return out
+
+
+def generate_moves(own, opp, kings, color):
+    """
+    Generates every single-hop step and jump for one side. Moves are
+    5-tuples in the same format the rest of the game uses:
+        (ip_row, ip_col, it_row, it_col, move_type)
+    Jumps are listed before steps. Whether a jump has to be taken is
+    left to the caller.
+    @own: The mask of the moving side's pieces
+    @opp: The mask of the opposing side's pieces
+    @kings: The mask of all kings on the board
+    @color: The moving side ("B" or "R")
+    type own: int
+    type opp: int
+    type kings: int
+    type color: str
+    return: A list of moves
+    rtype: [tuple]
+    """
+    moves = []
+    for (i, d) in enumerate(ALL_DIRS):
+        for sq in iter_bits(jumpers_in_dir(own, opp, kings, color, d)):
+            moves.append(SQ_CELLS[sq] + SQ_CELLS[JUMPS[sq][i][1]] + ("jump",))
+    for (i, d) in enumerate(ALL_DIRS):
+        for sq in iter_bits(steppers_in_dir(own, opp, kings, color, d)):
+            moves.append(SQ_CELLS[sq] + SQ_CELLS[NEIGHBORS[sq][i]] + ("step",))
+    return moves
+
+
+def jump_paths(sq, kind, color, opp, empty):
+    """
+    Returns every complete jump sequence that the piece on sq can make.
+    Jumped pieces come off the board straight away (so their squares can
+    be crossed or landed on later in the same sequence), and a piece that
+    reaches its king row carries on as a king.
+    @sq: The square of the jumping piece
+    @kind: The kind of the jumping piece ("B", "R" or "K")
+    @color: The color of the jumping piece ("B" or "R")
+    @opp: The mask of the opposing side's pieces
+    @empty: The mask of empty squares
+    type sq: int
+    type kind: str
+    type color: str
+    type opp: int
+    type empty: int
+    return: A list of paths, each a tuple of the squares landed on in order
+    rtype: [tuple]
+    """
+    paths = []
+    _extend_jump_path(sq, kind, color, opp, empty, (), paths)
+    return paths
+
+
+def _extend_jump_path(sq, kind, color, opp, empty, path, paths):
+    """
+    Extends a partial jump sequence by every jump available from sq,
+    adding the sequences that can't be extended any further to paths.
+    @sq: The square the jumping piece is on
+    @kind: The kind of the jumping piece ("B", "R" or "K")
+    @color: The color of the jumping piece ("B" or "R")
+    @opp: The mask of the opposing side's pieces that are left
+    @empty: The mask of empty squares
+    @path: The squares landed on so far
+    @paths: The list to add complete sequences to
+    type sq: int
+    type kind: str
+    type color: str
+    type opp: int
+    type empty: int
+    type path: tuple
+    type paths: list
+    return: None
+    rtype: None
+    """
+    extended = False
+    for (over, land) in JUMP_TABLE[kind][sq]:
+        if opp >> over & 1 and empty >> land & 1:
+            extended = True
+            land_kind = "K" if kind == "K" or KING_ROW[color] >> land & 1 else kind
+            _extend_jump_path(land, land_kind, color, opp & ~(1 << over),
+                              (empty | 1 << sq | 1 << over) & ~(1 << land), path + (land,), paths)
+    if not extended and path:
+        paths.append(path)
+
+
+def successors(own, opp, kings, color):
+    """
+    Returns the position after every legal move of one side, straight
+    from the masks (no Checkers gamestate or Move is made, so this is
+    cheap enough for random playouts). Like Checkers.legal_moves(), a jump
+    sequence is one move and steps are only legal if there's no jump.
+    @own: The mask of the moving side's pieces
+    @opp: The mask of the opposing side's pieces
+    @kings: The mask of all kings on the board
+    @color: The moving side ("B" or "R")
+    type own: int
+    type opp: int
+    type kings: int
+    type color: str
+    return: A list of (own, opp, kings) masks, one per move
+    rtype: [tuple]
+    """
+    positions = []
+    empty = ~(own | opp) & FULL_MASK
+    king_row = KING_ROW[color]
+    can_jump = False
+    for sq in iter_bits(own): #Square by square, like mobility(), which beats shifting whole boards here
+        kind = "K" if kings >> sq & 1 else color
+        for (over, land) in JUMP_TABLE[kind][sq]:
+            if opp >> over & 1 and empty >> land & 1:
+                break
+        else:
+            continue
+        can_jump = True
+        for path in jump_paths(sq, kind, color, opp, empty):
+            jumped, here, crowned = 0, sq, kind == "K"
+            for land in path:
+                jumped |= 1 << JUMPED_SQUARES[(here, land)]
+                crowned = crowned or king_row >> land & 1
+                here = land
+            new_kings = kings & ~(1 << sq) & ~jumped
+            positions.append((own & ~(1 << sq) | 1 << here, opp & ~jumped,
+                              new_kings | 1 << here if crowned else new_kings))
+    if can_jump:
+        return positions
+    for sq in iter_bits(own):
+        kind = "K" if kings >> sq & 1 else color
+        for to in STEP_TABLE[kind][sq]:
+            if empty >> to & 1:
+                new_kings = kings & ~(1 << sq)
+                positions.append((own & ~(1 << sq) | 1 << to, opp,
+                                  new_kings | 1 << to if kind == "K" or king_row >> to & 1 else new_kings))
+    return positions
+
+
+def zobrist_keys(piece):
+    """
+    Returns the per-square Zobrist keys for a piece's color and rank.
+    @piece: A checkers Piece
+    type piece: Piece
+    return: A tuple of 32 keys, indexed by square
+    rtype: tuple
+    """
+    return ZOBRIST[(piece.get_color(), piece.piece_is_king())]
+
+
+def zobrist_hash(black, red, kings, turn):
+    """
+    Computes the Zobrist key of a position from scratch.
+    @black: The mask of the black pieces
+    @red: The mask of the red pieces
+    @kings: The mask of all kings
+    @turn: The side to move ("B" or "R")
+    type black: int
+    type red: int
+    type kings: int
+    type turn: str
+    return: A 64-bit key
+    rtype: int
+    """
+    key = ZOBRIST_TURN if turn == "R" else 0
+    for sq in iter_bits(black):
+        key ^= ZOBRIST[("B", bool(kings >> sq & 1))][sq]
+    for sq in iter_bits(red):
+        key ^= ZOBRIST[("R", bool(kings >> sq & 1))][sq]
+    return key
+
+
+def mobility(own, opp, kings, color, region=FULL_MASK):
+    """
+    Works out which of a side's pieces inside a region can jump and which
+    can move at all, one square at a time with the step and jump tables.
+    This is cheaper than shifting whole boards when only a handful of
+    squares need looking at (e.g., the ones around the last move).
+    @own: Mask of the side's pieces
+    @opp: Mask of the opponent's pieces
+    @kings: Mask of all kings
+    @color: "B" or "R"
+    @region: Mask of the squares to look at
+    type own: int
+    type opp: int
+    type kings: int
+    type color: str
+    type region: int
+    return: A 2-tuple of masks: the pieces that can jump, and the pieces
+            that can either jump or step
+    rtype: tuple
+    """
+    empty = ~(own | opp) & FULL_MASK
+    can_jump = can_move = 0
+    for sq in iter_bits(own & region):
+        kind = "K" if kings >> sq & 1 else color
+        for (over, land) in JUMP_TABLE[kind][sq]:
+            if opp >> over & 1 and empty >> land & 1:
+                can_jump |= 1 << sq
+                break
+        for to in STEP_TABLE[kind][sq]:
+            if empty >> to & 1:
+                can_move |= 1 << sq
+                break
+    return (can_jump, can_move | can_jump)
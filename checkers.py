@@ -1,5 +1,8 @@
 #Contains all of the classes corresponding to a checkers gamestate.
 from copy import deepcopy
+from collections import namedtuple
+import bitboard
+import pst
 
 
 
@@ -24,6 +27,74 @@ class GameOverError(Exception):
 
 
 
+class Move(namedtuple("Move", ["ip_row", "ip_col", "it_row", "it_col", "move_type", "path"],
+                      defaults=((),))):
+    """
+    Represents a move as generated by Checkers.legal_moves(). A Move
+    starts like the old 5-tuple: (ip_row, ip_col, it_row, it_col,
+    move_type), with 0-based rows and cols, where (it_row, it_col) is
+    where the piece lands first. For a jump, path holds every cell the
+    piece lands on in order, so a combo jump is one Move (and the number
+    of pieces it captures is len(path)). Steps have an empty path.
+    """
+    __slots__ = ()
+
+    def encode(self):
+        """
+        Packs this Move into a small int (e.g., for storing it in a table).
+        return: The from square in bits 0-4, the first landing square in
+                bits 5-9, a jump flag in bit 10, the length of the path in
+                bits 11-14 and the rest of the path 5 bits per square
+                from bit 15 on
+        rtype: int
+        """
+        code = (bitboard.cell_to_sq(self.ip_row, self.ip_col)
+                | bitboard.cell_to_sq(self.it_row, self.it_col) << 5
+                | (1 << 10 if self.move_type == "jump" else 0)
+                | len(self.path) << 11)
+        for (i, cell) in enumerate(self.path[1:]):
+            code |= bitboard.cell_to_sq(cell[0], cell[1]) << (15 + 5*i)
+        return code
+
+
+    @staticmethod
+    def decode(code):
+        """
+        Unpacks a Move that was packed with encode().
+        @code: An int returned by Move.encode()
+        type code: int
+        return: The unpacked Move
+        rtype: Move
+        """
+        it_cell = bitboard.SQ_CELLS[(code >> 5) & 31]
+        path = tuple([it_cell] + [bitboard.SQ_CELLS[(code >> (15 + 5*i)) & 31]
+                                  for i in range(((code >> 11) & 15) - 1)])
+        return Move(*(bitboard.SQ_CELLS[code & 31] + it_cell),
+                    move_type="jump" if code & (1 << 10) else "step",
+                    path=path if code & (1 << 10) else ())
+
+
+    def notation(self):
+        """
+        Writes this Move in PDN notation, where the dark squares are
+        numbered 1 to 32 starting from black's side (e.g., "11-15" for a
+        step or "22x15x8" for a double jump).
+        return: The PDN notation of this Move
+        rtype: str
+        """
+        cells = ((self.ip_row, self.ip_col),) + (self.path or ((self.it_row, self.it_col),))
+        return ("x" if self.move_type == "jump" else "-").join(
+            str(bitboard.cell_to_sq(cell[0], cell[1]) + 1) for cell in cells)
+
+
+
+
+Material = namedtuple("Material", ["black_men", "black_kings", "red_men", "red_kings"])
+#^A snapshot of how many men and kings each player has (see Checkers.material()).
+
+
+
+
 #This gamestate corresponds to standard U.S. Rules,
 #which means that you can only jump backwards IF you're a king.
 class Checkers:
@@ -40,8 +111,6 @@ class Checkers:
         #self._player = player_color
         self._num_rows = 8
         self._num_cols = 8
-        self._red_count = 12
-        self._black_count = 12
         #self._turn = "B" #Black goes first
         #self._turn = "R"  #FOR TESTING GUI!!!
         self._turn = init_turn
@@ -51,6 +120,23 @@ class Checkers:
             #self._board = self._make_test_board() #FOR TESTING GUI!!!
         else:
             self._board = deepcopy(init_config)
+        self._black_bb, self._red_bb, self._king_bb = self._make_bitboards()
+        self._hash = bitboard.zobrist_hash(self._black_bb, self._red_bb, self._king_bb, self._turn)
+        #Piece counts, kept up to date through captures and promotions:
+        self._black_count = bitboard.count_bits(self._black_bb)
+        self._red_count = bitboard.count_bits(self._red_bb)
+        self._black_kings = bitboard.count_bits(self._black_bb & self._king_bb)
+        self._red_kings = bitboard.count_bits(self._red_bb & self._king_bb)
+        #The piece-square sums (see pst.py), kept up to date the same way:
+        self._pst_opening, self._pst_endgame = pst.position_sums(self._black_bb, self._red_bb, self._king_bb)
+        self._accumulator = None #An evaluation network's accumulator to keep up to date too (see nnue.py)
+        #Which pieces of each color can jump, and which can move at all. These are
+        #kept up to date incrementally: moves mark the squares around the cells
+        #they touch as dirty and only those get looked at again (see _update_mobility).
+        self._jumpers_bb = {"B": 0, "R": 0}
+        self._movers_bb = {"B": 0, "R": 0}
+        self._dirty = bitboard.FULL_MASK
+        self._update_mobility()
         self._test_board = self._make_test_board() #FOR TESTING!!!
         self._game_over = False
         self._winner = None
@@ -63,6 +149,9 @@ class Checkers:
         #highlighted piece in the GUI version...
         self._forced_jumps = []
 
+        #Undo records for the moves applied with push():
+        self._undo_stack = []
+
         #For forced situations involving opponent:
         self._opp_forced = False
         self._opp_forced_pieces = []
@@ -139,6 +228,128 @@ class Checkers:
         return self._opp_forced_pieces
 
 
+    def has_legal_moves(self, player=None):
+        """
+        Returns a boolean specifying if a player has any move left. This
+        reads the maintained movers mask, so it doesn't generate anything.
+        @player: "B" or "R" (defaults to the player whose turn it is)
+        type player: str
+        return: A boolean specifying if the player can still move
+        rtype: bool
+        """
+        if player == None:
+            player = self._turn
+        return self._movers_bb[player] != 0
+
+
+    def has_captures(self):
+        """
+        Returns a boolean specifying if the player whose turn it is has a
+        jump available (and so has to take it). Like has_legal_moves(),
+        this reads a maintained mask instead of generating moves.
+        return: A boolean specifying if a jump is available
+        rtype: bool
+        """
+        if self._must_move_again:
+            return True #The combo isn't over until the piece can't jump anymore
+        return self._jumpers_bb[self._turn] != 0
+
+
+    def legal_moves(self):
+        """
+        Yields the legal moves for the player whose turn it is. Moves are
+        generated in stages, as the consumer asks for them: captures first
+        (see capture_sequences), and the quiet steps (see quiet_moves) only
+        if there turned out to be no capture, since jumps are mandatory. A
+        search that cuts off after the first few moves never pays for the
+        rest. In the middle of a combo jump only the piece that has to move
+        again is considered, and nothing is yielded once the game has a
+        winner. Unlike make_move, no exceptions are raised (or caught) to
+        find out which moves are legal.
+        return: A generator of Moves
+        rtype: generator
+        """
+        if self._winner != None:
+            return
+        any_captures = False
+        for move in self.capture_sequences():
+            any_captures = True
+            yield move
+        if not any_captures and not self._must_move_again:
+            yield from self.quiet_moves()
+
+
+    def capture_sequences(self):
+        """
+        Yields every complete jump sequence available to the player whose
+        turn it is, each as a single composite Move. A sequence only ends
+        when the jumping piece has no further jump (a piece that gets
+        crowned partway through carries on jumping as a king, just like
+        it would with make_move). The sequences of one piece are worked
+        out only once the previous piece's have all been consumed.
+        return: A generator of jump Moves, each with its full path
+        rtype: generator
+        """
+        own, opp = self._side_bitboards(self._turn)
+        sources = own
+        if self._must_move_again:
+            sources = 1 << bitboard.cell_to_sq(*self._must_move_again_piece)
+        empty = ~(own | opp) & bitboard.FULL_MASK
+        kings, turn = self._king_bb, self._turn
+
+        for sq in bitboard.iter_bits(self._jumpers_bb[turn] & sources):
+            kind = "K" if kings >> sq & 1 else turn
+            for path in bitboard.jump_paths(sq, kind, turn, opp, empty):
+                cells = tuple(bitboard.SQ_CELLS[land] for land in path)
+                yield Move(*(bitboard.SQ_CELLS[sq] + cells[0]), move_type="jump", path=cells)
+
+
+    def quiet_moves(self):
+        """
+        Yields the steps available to the player whose turn it is, one
+        direction at a time. This doesn't check whether a jump is
+        available (which would make the steps illegal); legal_moves()
+        only gets here when there isn't one.
+        return: A generator of step Moves
+        rtype: generator
+        """
+        own, opp = self._side_bitboards(self._turn)
+        kings, turn = self._king_bb, self._turn
+        for (i, d) in enumerate(bitboard.ALL_DIRS):
+            for sq in bitboard.iter_bits(bitboard.steppers_in_dir(own, opp, kings, turn, d)):
+                yield Move(*(bitboard.SQ_CELLS[sq] + bitboard.SQ_CELLS[bitboard.NEIGHBORS[sq][i]]),
+                           move_type="step")
+
+
+    def is_legal_move(self, move):
+        """
+        Returns a boolean specifying if a move (e.g., one remembered from
+        another position, like a hash or killer move) is legal for the
+        player whose turn it is, without generating the other moves: a
+        step is checked against the squares around it, and a jump against
+        the sequences of the piece that makes it.
+        @move: A Move
+        type move: Move
+        return: A boolean specifying if the move is legal
+        rtype: bool
+        """
+        if self._winner != None:
+            return False
+        own, opp = self._side_bitboards(self._turn)
+        sq = bitboard.cell_to_sq(move.ip_row, move.ip_col)
+        if not own >> sq & 1:
+            return False
+        kind = "K" if self._king_bb >> sq & 1 else self._turn
+        empty = ~(own | opp) & bitboard.FULL_MASK
+        if move.move_type != "jump":
+            to = bitboard.cell_to_sq(move.it_row, move.it_col)
+            return not self.has_captures() and empty >> to & 1 == 1 and to in bitboard.STEP_TABLE[kind][sq]
+        if self._must_move_again and (move.ip_row, move.ip_col) != self._must_move_again_piece:
+            return False
+        path = tuple(bitboard.cell_to_sq(cell[0], cell[1]) for cell in move.path)
+        return path in bitboard.jump_paths(sq, kind, self._turn, opp, empty)
+
+
     def _switch_turn(self, cur_turn):
         """
         Switches the player turn in a Checkers game.
@@ -151,6 +362,7 @@ class Checkers:
             self._turn = "B"
         else:
             self._turn = "R"
+        self._hash ^= bitboard.ZOBRIST_TURN
 
 
     def _make_test_board(self):
@@ -209,13 +421,45 @@ class Checkers:
         return self._board
 
 
+    def get_bitboards(self):
+        """
+        Returns the bitboard representation of the board (see bitboard.py).
+        return: A 3-tuple of 32-bit masks: (black pieces, red pieces, kings)
+        rtype: tuple
+        """
+        return (self._black_bb, self._red_bb, self._king_bb)
+
+
+    def snapshot(self):
+        """
+        Returns a compact copy of the position: the three bitboards and
+        whose turn it is. It's cheap to send to another process, where
+        from_snapshot() turns it back into a Checkers gamestate. (The
+        state of a combo jump that's still in progress isn't included.)
+        return: A 4-tuple: (black pieces, red pieces, kings, turn)
+        rtype: tuple
+        """
+        return (self._black_bb, self._red_bb, self._king_bb, self._turn)
+
+
+    def hash_key(self):
+        """
+        Returns the Zobrist key of the current position (the pieces on the
+        board and whose turn it is). The key is kept up to date as moves
+        are made and taken back, so reading it is free.
+        return: A 64-bit int that identifies the position
+        rtype: int
+        """
+        return self._hash
+
+
     def get_red_count(self):
         """
         Returns the number of red pieces on the board.
         return: The number of red pieces on the board.
         rtype: int
         """
-        return self._count_colors("R")
+        return self._red_count
 
 
     def get_black_count(self):
@@ -224,7 +468,59 @@ class Checkers:
         return: The number of black pieces on the board.
         rtype: int
         """
-        return self._count_colors("B")
+        return self._black_count
+
+
+    def material(self):
+        """
+        Returns how many men and kings each player has. The counts are
+        maintained as pieces get captured and crowned, so this is cheap
+        enough to call at every leaf of a search.
+        return: A Material: (black_men, black_kings, red_men, red_kings)
+        rtype: Material
+        """
+        return Material(self._black_count - self._black_kings, self._black_kings,
+                        self._red_count - self._red_kings, self._red_kings)
+
+
+    def pst_score(self):
+        """
+        Returns the piece-square score of the position (see pst.py). The
+        sums behind it are maintained as pieces move, get captured and
+        get crowned, so like material(), it's cheap enough to call at
+        every leaf of a search.
+        return: The score, in hundredths of a man, for black
+        rtype: int
+        """
+        return pst.blend(self._pst_opening, self._pst_endgame, self._black_count + self._red_count)
+
+
+    def set_accumulator(self, accumulator):
+        """
+        Attaches an accumulator (e.g., an nnue.Accumulator) that gets told
+        about every piece that's put on or taken off a square from now on,
+        as moves are made and taken back, so that it never has to look at
+        the whole board again. It's brought up to date with the current
+        position straight away.
+        @accumulator: An object with refresh(black, red, kings),
+                      update(piece, sq, sign) and move(piece, from_sq,
+                      to_sq) methods, or None to detach it
+        type accumulator: Accumulator
+        return: None
+        rtype: None
+        """
+        self._accumulator = accumulator
+        if accumulator != None:
+            accumulator.refresh(self._black_bb, self._red_bb, self._king_bb)
+
+
+    def get_accumulator(self):
+        """
+        Returns the attached accumulator.
+        return: The accumulator, or None
+        rtype: Accumulator
+        """
+        return self._accumulator
 
 
     def get_turn(self):
@@ -247,20 +543,77 @@ class Checkers:
         self._winner = player
 
 
-    def _count_colors(self, color):
+    def _make_bitboards(self):
+        """
+        Builds the black, red and king bitboards from the list board.
+        return: A 3-tuple of 32-bit masks: (black pieces, red pieces, kings)
+        rtype: tuple
+        """
+        black_bb, red_bb, king_bb = 0, 0, 0
+        for sq in range(bitboard.NUM_SQUARES):
+            i_row, i_col = bitboard.sq_to_cell(sq)
+            piece = self._board[i_row][i_col]
+            if piece != " ":
+                if piece.get_color() == "B":
+                    black_bb |= 1 << sq
+                else:
+                    red_bb |= 1 << sq
+                if piece.piece_is_king():
+                    king_bb |= 1 << sq
+        return (black_bb, red_bb, king_bb)
+
+
+    def _side_bitboards(self, color):
         """
-        Counts the number of pieces corresponding to the given color.
-        @color: The color ("B" or "R") to count pieces for
+        Returns the bitboards of the given color and of its opponent.
+        @color: The color ("B" or "R") whose pieces come first
         type color: str
-        return: The number of pieces corresponding to the given color.
-        rtype: int
+        return: A 2-tuple of 32-bit masks: (color's pieces, opponent's pieces)
+        rtype: tuple
         """
-        count = 0
-        for row in self._board:
-            for col in row:
-                if type(col) == Piece and col.get_color() == color:
-                    count += 1
-        return count
+        if color == "B":
+            return (self._black_bb, self._red_bb)
+        return (self._red_bb, self._black_bb)
+
+
+    def _update_counts(self, color, pieces, kings):
+        """
+        Adjusts the piece and king counts of a player.
+        @color: The color ("B" or "R") whose counts change
+        @pieces: The change in the number of pieces
+        @kings: The change in the number of kings
+        type color: str
+        type pieces: int
+        type kings: int
+        return: None
+        rtype: None
+        """
+        if color == "B":
+            self._black_count += pieces
+            self._black_kings += kings
+        else:
+            self._red_count += pieces
+            self._red_kings += kings
+
+
+    def _update_pst(self, piece, sq, sign):
+        """
+        Adds a piece's value on a square to the piece-square sums (and
+        the attached accumulator, if any), or takes it away.
+        @piece: The Piece
+        @sq: The square it's on
+        @sign: 1 to add the value, -1 to take it away
+        type piece: Piece
+        type sq: int
+        type sign: int
+        return: None
+        rtype: None
+        """
+        (opening, endgame) = pst.piece_values(piece)[sq]
+        self._pst_opening += sign*opening
+        self._pst_endgame += sign*endgame
+        if self._accumulator != None:
+            self._accumulator.update(piece, sq, sign)
 
 
     def make_move(self, p_row, p_col, t_row, t_col):
@@ -290,10 +643,119 @@ class Checkers:
         self._check_if_valid_piece(ip_row, ip_col)
         jumped_piece, move_type = self._check_if_valid_move(ip_row, ip_col, it_row, it_col)
         #If all of ^those^ checks pass, then go ahead and update the gamestate's board.
-        
-        self._relocate_piece(ip_row, ip_col, it_row, it_col, jumped_piece)        
+        self._apply_move(ip_row, ip_col, it_row, it_col, jumped_piece, move_type)
+
+
+    def push(self, move):
+        """
+        Applies a move in place and remembers how to take it back with pop().
+        This is the cheap alternative to copying the whole gamestate for every
+        move that a search wants to try. The move is trusted (it's expected to
+        come from legal_moves()), and a move that ends the game sets the
+        winner instead of raising GameOverError. A jump Move is played along
+        its whole path, so the turn passes to the opponent afterwards.
+        @move: A Move, or a 5-tuple: (ip_row, ip_col, it_row, it_col, move_type)
+        type move: Move, tuple
+        return: None
+        rtype: None
+        """
+        ip_row, ip_col, move_type = move[0], move[1], move[4]
+        hops = move[5] if len(move) > 5 and move[5] else ((move[2], move[3]),)
+
+        #Everything the move might change, so that pop() can put it all back:
+        captured = []
+        self._undo_stack.append((move, captured, self._hash,
+                                 self._board[ip_row][ip_col].piece_is_king(),
+                                 self._turn, self._winner, self._checking_opp_valid_moves,
+                                 self._must_move_again, self._must_move_again_piece,
+                                 self._forced_jumps, self._opp_forced,
+                                 self._opp_forced_pieces, self._opp_forced_jumps,
+                                 self._jumpers_bb, self._movers_bb))
+
+        cur_row, cur_col = ip_row, ip_col
+        for (it_row, it_col) in hops:
+            jumped_piece = None
+            if move_type == "jump":
+                jumped_piece = ((cur_row+it_row)//2, (cur_col+it_col)//2)
+                captured.append((jumped_piece, self._board[jumped_piece[0]][jumped_piece[1]]))
+            self._relocate_piece(cur_row, cur_col, it_row, it_col, jumped_piece)
+            self._check_if_need_to_king(it_row, it_col)
+            cur_row, cur_col = it_row, it_col
+
+        try:
+            self._end_move(cur_row, cur_col, move_type)
+        except GameOverError:
+            pass #The winner has already been set.
+
+
+    def pop(self):
+        """
+        Takes back the last move applied with push().
+        return: The move that was taken back
+        rtype: Move, tuple
+        """
+        (move, captured, old_hash, was_king,
+         self._turn, self._winner, self._checking_opp_valid_moves,
+         self._must_move_again, self._must_move_again_piece,
+         self._forced_jumps, self._opp_forced,
+         self._opp_forced_pieces, self._opp_forced_jumps,
+         self._jumpers_bb, self._movers_bb) = self._undo_stack.pop()
+        ip_row, ip_col = move[0], move[1]
+        it_row, it_col = move[5][-1] if len(move) > 5 and move[5] else (move[2], move[3])
+
+        if not was_king and self._board[it_row][it_col].piece_is_king():
+            self._update_pst(self._board[it_row][it_col], bitboard.cell_to_sq(it_row, it_col), -1)
+            self._board[it_row][it_col].set_to_man()
+            self._update_pst(self._board[it_row][it_col], bitboard.cell_to_sq(it_row, it_col), 1)
+            self._update_counts(self._turn, 0, -1)
+            self._king_bb &= ~(1 << bitboard.cell_to_sq(it_row, it_col))
+        if (it_row, it_col) != (ip_row, ip_col): #A king's combo jump can end where it started
+            self._relocate_piece(it_row, it_col, ip_row, ip_col, None)
+        for (cell, piece) in captured:
+            self._place_piece(piece, cell[0], cell[1])
+        self._hash = old_hash
+        self._dirty = 0 #The masks were restored along with everything else
+
+        return move
+
+
+    def _apply_move(self, ip_row, ip_col, it_row, it_col, jumped_piece, move_type):
+        """
+        Carries out a move that has already been validated and updates
+        the turn and forced jump state accordingly.
+        @ip_row: A 0-based index of a player's row
+        @ip_col: A 0-based index of a player's col
+        @it_row: A 0-based index of a target square's row
+        @it_col: A 0-based index of a target square's col
+        @jumped_piece: The (row, col) of the piece being jumped or None
+        @move_type: "jump" or "step"
+        type ip_row: int
+        type ip_col: int
+        type it_row: int
+        type it_col: int
+        type jumped_piece: tuple, None
+        type move_type: str
+        return: None
+        rtype: None
+        """
+        self._relocate_piece(ip_row, ip_col, it_row, it_col, jumped_piece)
         self._check_if_need_to_king(it_row, it_col)
+        self._end_move(it_row, it_col, move_type)
 
+
+    def _end_move(self, it_row, it_col, move_type):
+        """
+        Updates the turn and forced jump state once a piece has landed.
+        @it_row: A 0-based index of the row the piece landed on
+        @it_col: A 0-based index of the col the piece landed on
+        @move_type: "jump" or "step"
+        type it_row: int
+        type it_col: int
+        type move_type: str
+        return: None
+        rtype: None
+        """
+        self._update_mobility()
         # - GameOverError is raised in _check_if_opp_can_move
         #Check if opponent has any valid moves left
         self._check_if_opp_can_move()
@@ -346,15 +808,14 @@ class Checkers:
         return: None
         rtype: None
         """
-        for i in range(self._num_rows):
-            adj_opp_cells = []
-            for j in range(self._num_cols):
-                if self._board[i][j] != " " and self._board[i][j].get_color() == self._turn:
-                    adj_opp_cells = self._board[i][j].get_adj_opps(i, j, self._board)
-                    for cell in adj_opp_cells:
-                        if self._board[i][j].jump_is_possible(i, j, cell[0], cell[1], self._board):
-                            self._opp_forced_jumps.append((2*cell[0]-i, 2*cell[1]-j))
-                            self._opp_forced_pieces.append((i, j))
+        #Only the pieces in the jumpers mask can have a jump, so there's no need to scan the board:
+        for sq in bitboard.iter_bits(self._jumpers_bb[self._turn]):
+            (i, j) = bitboard.SQ_CELLS[sq]
+            adj_opp_cells = self._board[i][j].get_adj_opps(i, j, self._board)
+            for cell in adj_opp_cells:
+                if self._board[i][j].jump_is_possible(i, j, cell[0], cell[1], self._board):
+                    self._opp_forced_jumps.append((2*cell[0]-i, 2*cell[1]-j))
+                    self._opp_forced_pieces.append((i, j))
 
         if self._opp_forced_jumps != []: #There are jumps opponent can make on next turn...
             self._opp_forced = True
@@ -369,15 +830,32 @@ class Checkers:
         return: None
         rtype: None
         """
-        self._checking_opp_valid_moves = True
-        (valid_moves_exist, checked_player) = self._valid_moves_exist(
-                                                self._opp_player(self._turn))
-
-        #if not valid_moves_exist:
-        if not valid_moves_exist or self._count_colors(checked_player) == 0:
+        #A player with no pieces left has no movers either, so this covers both ways of losing:
+        checked_player = self._opp_player(self._turn)
+        if not self._movers_bb[checked_player]:
             self._set_winner_after_checking(checked_player)
             raise GameOverError
-        self._checking_opp_valid_moves = False
+
+
+    def _update_mobility(self):
+        """
+        Brings the jumpers and movers masks up to date by looking again
+        at just the pieces inside the dirty region (the squares near the
+        cells that changed since the last update).
+        return: None
+        rtype: None
+        """
+        dirty = self._dirty
+        if not dirty:
+            return
+        self._dirty = 0
+        #New dicts rather than updating in place, since push() keeps the old ones for pop():
+        jumpers_bb, movers_bb = {}, {}
+        for (color, own, opp) in (("B", self._black_bb, self._red_bb), ("R", self._red_bb, self._black_bb)):
+            (can_jump, can_move) = bitboard.mobility(own, opp, self._king_bb, color, dirty)
+            jumpers_bb[color] = self._jumpers_bb[color] & ~dirty | can_jump
+            movers_bb[color] = self._movers_bb[color] & ~dirty | can_move
+        self._jumpers_bb, self._movers_bb = jumpers_bb, movers_bb
 
 
     def _relocate_piece(self, ip_row, ip_col, it_row, it_col, jumped_piece):
@@ -399,9 +877,66 @@ class Checkers:
         #set new position:
         self._board[it_row][it_col].set_new_pos(it_row, it_col)
         self._board[ip_row][ip_col] = " "
-        
+
+        #Keep the bitboards in step with the list board:
+        p_bit = 1 << bitboard.cell_to_sq(ip_row, ip_col)
+        t_bit = 1 << bitboard.cell_to_sq(it_row, it_col)
+        if self._black_bb & p_bit:
+            self._black_bb ^= p_bit | t_bit
+        else:
+            self._red_bb ^= p_bit | t_bit
+        if self._king_bb & p_bit:
+            self._king_bb ^= p_bit | t_bit
+        keys = bitboard.zobrist_keys(self._board[it_row][it_col])
+        self._hash ^= keys[p_bit.bit_length()-1] ^ keys[t_bit.bit_length()-1]
+        values = pst.piece_values(self._board[it_row][it_col])
+        (p_values, t_values) = (values[p_bit.bit_length()-1], values[t_bit.bit_length()-1])
+        self._pst_opening += t_values[0] - p_values[0]
+        self._pst_endgame += t_values[1] - p_values[1]
+        if self._accumulator != None:
+            self._accumulator.move(self._board[it_row][it_col], p_bit.bit_length()-1, t_bit.bit_length()-1)
+        self._dirty |= bitboard.NEARBY[p_bit.bit_length()-1] | bitboard.NEARBY[t_bit.bit_length()-1]
+
         if jumped_piece != None:
-            self._board[jumped_piece[0]][jumped_piece[1]] = " " 
+            j_sq = bitboard.cell_to_sq(jumped_piece[0], jumped_piece[1])
+            captured = self._board[jumped_piece[0]][jumped_piece[1]]
+            self._hash ^= bitboard.zobrist_keys(captured)[j_sq]
+            self._update_pst(captured, j_sq, -1)
+            self._update_counts(captured.get_color(), -1, -1 if captured.piece_is_king() else 0)
+            self._board[jumped_piece[0]][jumped_piece[1]] = " "
+            j_mask = ~(1 << j_sq)
+            self._dirty |= bitboard.NEARBY[j_sq]
+            self._black_bb &= j_mask
+            self._red_bb &= j_mask
+            self._king_bb &= j_mask
+
+
+    def _place_piece(self, piece, i_row, i_col):
+        """
+        Puts a piece back onto an empty cell (e.g., when a
+        capture is taken back).
+        @piece: The Piece to place
+        @i_row: A 0-based row index
+        @i_col: A 0-based col index
+        type piece: Piece
+        type i_row: int
+        type i_col: int
+        return: None
+        rtype: None
+        """
+        self._board[i_row][i_col] = piece
+        piece.set_new_pos(i_row, i_col)
+        bit = 1 << bitboard.cell_to_sq(i_row, i_col)
+        if piece.get_color() == "B":
+            self._black_bb |= bit
+        else:
+            self._red_bb |= bit
+        if piece.piece_is_king():
+            self._king_bb |= bit
+        self._hash ^= bitboard.zobrist_keys(piece)[bit.bit_length()-1]
+        self._update_pst(piece, bit.bit_length()-1, 1)
+        self._dirty |= bitboard.NEARBY[bit.bit_length()-1]
+        self._update_counts(piece.get_color(), 1, 1 if piece.piece_is_king() else 0)
 
 
     def _check_if_need_to_king(self, it_row, it_col):
@@ -421,7 +956,15 @@ class Checkers:
                               not self._board[it_row][it_col].piece_is_king()
 
         if (red_to_other_side or black_to_other_side):
+            sq = bitboard.cell_to_sq(it_row, it_col)
+            self._hash ^= bitboard.zobrist_keys(self._board[it_row][it_col])[sq]
+            self._update_pst(self._board[it_row][it_col], sq, -1)
             self._board[it_row][it_col].set_to_king()
+            self._king_bb |= 1 << sq
+            self._hash ^= bitboard.zobrist_keys(self._board[it_row][it_col])[sq]
+            self._update_pst(self._board[it_row][it_col], sq, 1)
+            self._dirty |= 1 << sq #A new king only changes what that one piece can do
+            self._update_counts(self._turn, 0, 1)
 
 
     def _set_winner_after_checking(self, checked_player):
@@ -652,34 +1195,18 @@ class Checkers:
                 out for. If check_for_cpu is True, then a list of valid moves
                 is returned (used in implementing the AI).
         """
-        valid_moves = []        
+        valid_moves = []
         if not self._opp_forced:
-            tr_cell = (0, len(self._board[0])-1) #No need for top LEFT cuz no piece is ever gonna be there
-            bl_cell = (len(self._board)-1, 0) #No need for bottom RIGHT cuz no piece is ever gonna be there
-            ls_cells = [(c, 0) for c in range(1, len(self._board)-2, 2)] 
-            rs_cells = [(c, len(self._board[0])-1) for c in range(2, len(self._board)-1, 2)] 
-            ts_cells = [(0, c) for c in range(1, len(self._board[0])-1, 2)] 
-            bs_cells = [(len(self._board)-1, c) for c in range(2, len(self._board[0])-1, 2)]
-
-            #Loop through each of the cells. If there's a piece there, see if it can do a jump or a
-            #step (with self._check_if_valid_move)
-            for i_row in range(self._num_rows):
-                for i_col in range(self._num_cols):
-                    piece = self._board[i_row][i_col]
-                    if piece != " " and piece.get_color() == turn and (i_row, i_col) == tr_cell:
-                        self._check_moves_in_tr_cell(i_row, i_col, valid_moves)                    
-                    elif piece != " " and piece.get_color() == turn and (i_row, i_col) == bl_cell:
-                        self._check_moves_in_bl_cell(i_row, i_col, valid_moves)                    
-                    elif piece != " " and piece.get_color() == turn and (i_row, i_col) in ls_cells:
-                        self._check_moves_in_ls_cells(i_row, i_col, valid_moves, turn, piece.piece_is_king())                    
-                    elif piece != " " and piece.get_color() == turn and (i_row, i_col) in rs_cells:
-                        self._check_moves_in_rs_cells(i_row, i_col, valid_moves, turn, piece.piece_is_king())                
-                    elif piece != " " and piece.get_color() == turn and (i_row, i_col) in ts_cells:
-                        self._check_moves_in_ts_cells(i_row, i_col, valid_moves, turn)                    
-                    elif piece != " " and piece.get_color() == turn and (i_row, i_col) in bs_cells:
-                        self._check_moves_in_bs_cells(i_row, i_col, valid_moves, turn)                    
-                    elif piece != " " and piece.get_color() == turn:
-                        self._check_moves_in_nb_cells(i_row, i_col, valid_moves, turn, piece.piece_is_king())
+            #Moves come straight off the bitboards (see bitboard.py), so there's
+            #no need to try every direction of every piece and catch the failures.
+            own, opp = self._side_bitboards(turn)
+            valid_moves = bitboard.generate_moves(own, opp, self._king_bb, turn)
+
+            #In a combo jump, only the piece that just jumped may move, and it has to jump again.
+            if self._must_move_again and not self._checking_opp_valid_moves:
+                valid_moves = [move for move in valid_moves
+                               if move[:2] == self._must_move_again_piece
+                               and move[2:4] in self._forced_jumps]
         else:
             #NOTE: In checkers, IT'S REQUIRED that you make a jump if a jump is available.
             for i in range(len(self._opp_forced_pieces)):
@@ -688,179 +1215,6 @@ class Checkers:
         return (valid_moves != [], turn) if not check_for_cpu else valid_moves
 
 
-    def _check_moves_in_tr_cell(self, i_row, i_col, valid_moves):
-        """
-        Determines what moves can be done in the top-right cell.
-        @i_row: A 0-based row index
-        @i_col: A 0-based col index
-        @valid_moves: A list to append valid moves to for the piece
-                      in the top-right corner of the gameboard
-        type i_row: int
-        type i_col: int
-        type valid_moves: [tuple]
-        return: None
-        rtype: None
-        """
-        self._try_move(i_row, i_col, i_row+1, i_col-1, valid_moves) #down-left step
-        self._try_move(i_row, i_col, i_row+2, i_col-2, valid_moves) #down-left jump
-
-
-    def _check_moves_in_bl_cell(self, i_row, i_col, valid_moves):
-        """
-        Determines what moves can be done in the bottom-left cell.
-        @i_row: A 0-based row index
-        @i_col: A 0-based col index
-        @valid_moves: A list to append valid moves to for the piece
-                      in the bottom-left corner of the gameboard
-        type i_row: int
-        type i_col: int
-        type valid_moves: [tuple]
-        return: None
-        rtype: None
-        """
-        self._try_move(i_row, i_col, i_row-1, i_col+1, valid_moves) #up-right step
-        self._try_move(i_row, i_col, i_row-1, i_col+1, valid_moves) #up-right step
-        self._try_move(i_row, i_col, i_row-2, i_col+2, valid_moves) #up-right jump
-        
-
-    def _check_moves_in_ls_cells(self, i_row, i_col, valid_moves, turn, is_king):
-        """
-        Determines what moves can be done in the left side of the gameboard.
-        @i_row: A 0-based row index
-        @i_col: A 0-based col index
-        @valid_moves: A list to append valid moves to for the pieces
-                      in the left side of the gameboard
-        type i_row: int
-        type i_col: int
-        type valid_moves: [tuple]
-        return: None
-        rtype: None
-        """
-        if turn == "R" or is_king:
-            self._try_move(i_row, i_col, i_row-1, i_col+1, valid_moves) #up-right step
-            self._try_move(i_row, i_col, i_row-2, i_col+2, valid_moves) #up-right jump
-        if turn == "B" or is_king:
-            self._try_move(i_row, i_col, i_row+1, i_col+1, valid_moves) #down-right step
-            self._try_move(i_row, i_col, i_row+2, i_col+2, valid_moves) #down-right jump
-
-
-    def _check_moves_in_rs_cells(self, i_row, i_col, valid_moves, turn, is_king):
-        """
-        Determines what moves can be done in the right side of the gameboard.
-        @i_row: A 0-based row index
-        @i_col: A 0-based col index
-        @valid_moves: A list to append valid moves to for the pieces
-                      in the right side of the gameboard
-        type i_row: int
-        type i_col: int
-        type valid_moves: [tuple]
-        return: None
-        rtype: None
-        """
-        if turn == "R" or is_king:
-            self._try_move(i_row, i_col, i_row-1, i_col-1, valid_moves) #up-left step
-            self._try_move(i_row, i_col, i_row-2, i_col-2, valid_moves) #up-left jump
-        if turn == "B" or is_king:
-            self._try_move(i_row, i_col, i_row+1, i_col-1, valid_moves) #down-left step
-            self._try_move(i_row, i_col, i_row+2, i_col-2, valid_moves) #down-left jump
-
-
-    def _check_moves_in_ts_cells(self, i_row, i_col, valid_moves, turn):
-        """
-        Determines what moves can be done in the top side of the gameboard.
-        @i_row: A 0-based row index
-        @i_col: A 0-based col index
-        @valid_moves: A list to append valid moves to for the pieces
-                      in the top side of the gameboard
-        type i_row: int
-        type i_col: int
-        type valid_moves: [tuple]
-        return: None
-        rtype: None
-        """
-        self._try_move(i_row, i_col, i_row+1, i_col+1, valid_moves) #down-right step        
-        self._try_move(i_row, i_col, i_row+2, i_col+2, valid_moves) #down-right jump        
-        self._try_move(i_row, i_col, i_row+1, i_col-1, valid_moves) #down-left step        
-        self._try_move(i_row, i_col, i_row+2, i_col-2, valid_moves) #down-left jump
-
-
-    def _check_moves_in_bs_cells(self, i_row, i_col, valid_moves, turn):
-        """
-        Determines what moves can be done in the bottom side of the gameboard.
-        @i_row: A 0-based row index
-        @i_col: A 0-based col index
-        @valid_moves: A list to append valid moves to for the pieces
-                      in the bottom side of the gameboard
-        type i_row: int
-        type i_col: int
-        type valid_moves: [tuple]
-        return: None
-        rtype: None
-        """
-        self._try_move(i_row, i_col, i_row-1, i_col-1, valid_moves) #up-left step
-        self._try_move(i_row, i_col, i_row-2, i_col-2, valid_moves) #up-left jump
-        self._try_move(i_row, i_col, i_row-1, i_col+1, valid_moves) #up-right step
-        self._try_move(i_row, i_col, i_row-2, i_col+2, valid_moves) #up-right jump
-    
-
-    def _check_moves_in_nb_cells(self, i_row, i_col, valid_moves, turn, is_king):
-        """
-        Determines what moves can be done in the
-        non-boundary cells of the gameboard.
-        @i_row: A 0-based row index
-        @i_col: A 0-based col index
-        @valid_moves: A list to append valid moves to for the pieces
-                      in the non-boundary cells of the gameboard
-        type i_row: int
-        type i_col: int
-        type valid_moves: [tuple]
-        return: None
-        rtype: None
-        """
-        if turn == "R" or is_king:
-            self._try_move(i_row, i_col, i_row-1, i_col-1, valid_moves) #up-left step
-            self._try_move(i_row, i_col, i_row-2, i_col-2, valid_moves) #up-left jump
-            self._try_move(i_row, i_col, i_row-1, i_col+1, valid_moves) #up-right step
-            self._try_move(i_row, i_col, i_row-2, i_col+2, valid_moves) #up-right jump
-        if turn == "B" or is_king:
-            self._try_move(i_row, i_col, i_row+1, i_col+1, valid_moves) #down-right step
-            self._try_move(i_row, i_col, i_row+2, i_col+2, valid_moves) #down-right jump
-            self._try_move(i_row, i_col, i_row+1, i_col-1, valid_moves) #down-left step
-            self._try_move(i_row, i_col, i_row+2, i_col-2, valid_moves) #down-left jump
-
-
-    def _try_move(self, ip_row, ip_col, it_row, it_col, valid_moves):
-        """
-        Tries executing a move and appends the move to a list if
-        successful (i.e., no exceptions are thrown). A move is a
-        4-tuple of the following format:
-            (starting row, starting column,
-             targ row, targ column,
-             move type (e.g., "step", "jump"))
-        @ip_row: A 0-based index of a piece's starting row
-        @ip_col: A 0-based index of a piece's starting col
-        @it_row: A 0-based index of a target position's row
-        @it_col: A 0-based index of a target position's col
-        @valid_moves: A list to append the 4-tuple:
-                        (ip_row, ip_col, it_row,
-                         it_col, move_type)
-                      to if the move is valid.
-        type ip_row: int
-        type ip_col: int
-        type it_row: int
-        type it_col: int
-        type valid_moves: list
-        return: None
-        rtype: None
-        """
-        try:
-            dummy, move_type = self._check_if_valid_move(ip_row, ip_col, it_row, it_col)
-            valid_moves.append((ip_row, ip_col, it_row, it_col, move_type)) #need move_type for AI
-            #Example move: (0, 3, 1, 4, 'step')
-        except:
-            pass
-
-
 
 
 class Piece:
@@ -890,6 +1244,16 @@ class Piece:
         return self._is_king
 
 
+    def get_kind(self):
+        """
+        Returns the kind of this Piece as used by the lookup tables
+        in bitboard.py.
+        return: "K" if the piece is a king, else its color ("B" or "R")
+        rtype: str
+        """
+        return "K" if self._is_king else self._color
+
+
     def set_to_king(self):
         """
         Sets this Piece to a king piece.
@@ -899,6 +1263,16 @@ class Piece:
         self._is_king = True
 
 
+    def set_to_man(self):
+        """
+        Turns this Piece back into an uncrowned piece
+        (used when a crowning move is taken back).
+        return: None
+        rtype: None
+        """
+        self._is_king = False
+
+
     def set_new_pos(self, i_row, i_col):
         """
         Sets a new row and column position for a piece.
@@ -921,24 +1295,12 @@ class Piece:
 
     def possible_step_dirs(self):
         """
-        Returns all the possible directions a particular type of piece can step in.
-        return: A tuple containing all the possible directions (in the form of 2-tuples
-                the represent a board position) that a piece can perform a step in.
+        Returns all the possible cells a particular type of piece can step to.
+        return: A tuple containing all the on-board cells (in the form of 2-tuples
+                that represent a board position) that a piece can perform a step to.
         rtype: tuple
         """
-        if self._is_king:
-            return ((self._pos[0]-1, self._pos[1]+1),   #upper-right
-                    (self._pos[0]-1, self._pos[1]-1),   #upper-left
-                    (self._pos[0]+1, self._pos[1]-1),   #lower-left
-                    (self._pos[0]+1, self._pos[1]+1))   #lower-right
-        
-        elif self._color == "R":
-            return ((self._pos[0]-1, self._pos[1]+1),   #upper-right
-                    (self._pos[0]-1, self._pos[1]-1))   #upper-left
-
-        elif self._color == "B":
-            return ((self._pos[0]+1, self._pos[1]-1),   #lower-left
-                    (self._pos[0]+1, self._pos[1]+1))   #lower-right
+        return bitboard.CELL_STEP_TABLE[self.get_kind()][self._pos]
 
 
     def valid_jump(self, it_row, it_col, board):
@@ -954,47 +1316,10 @@ class Piece:
                 jump or False otherwise.
         rtype: bool
         """
-        if self._is_king:
-            #(upper-right jump and upper-right pos) or (upper-left jump and upper-left pos)
-            #or (lower-left jump and lower-left pos) or (lower-right jump and lower-right pos)
-            return ((self._jump_is_diagonal(self._pos[0]-2, self._pos[1]+2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]-1, self._pos[1]+1, board)) or\
-                    (self._jump_is_diagonal(self._pos[0]-2, self._pos[1]-2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]-1, self._pos[1]-1, board)) or\
-                    (self._jump_is_diagonal(self._pos[0]+2, self._pos[1]-2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]+1, self._pos[1]-1, board)) or\
-                    (self._jump_is_diagonal(self._pos[0]+2, self._pos[1]+2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]+1, self._pos[1]+1, board)))
-        elif self._color == "R":
-            return ((self._jump_is_diagonal(self._pos[0]-2, self._pos[1]+2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]-1, self._pos[1]+1, board)) or\
-                    (self._jump_is_diagonal(self._pos[0]-2, self._pos[1]-2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]-1, self._pos[1]-1, board)))
-        elif self._color == "B":
-            return ((self._jump_is_diagonal(self._pos[0]+2, self._pos[1]-2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]+1, self._pos[1]-1, board)) or\
-                    (self._jump_is_diagonal(self._pos[0]+2, self._pos[1]+2, it_row, it_col) and\
-                    self._jumped_piece_is_opp(self._pos[0]+1, self._pos[1]+1, board)))
-        
-
-    def _jump_is_diagonal(self, ip_row, ip_col, it_row, it_col):
-        """
-        Determines if the jump movement of a chosen piece is diagonal
-        (in cases where a user may erroneously attempt a jump that
-        is not diagonal)
-        @ip_row: A 0-based index of a piece's starting row
-        @ip_col: A 0-based index of a piece's starting col
-        @it_row: A 0-based index of a target position's row
-        @it_col: A 0-based index of a target position's col
-        type ip_row: int
-        type ip_col: int
-        type it_row: int
-        type it_col: int
-        return: True if the jump movement of a Piece is diagonal
-                or False otherwise
-        rtype: bool
-        """
-        return (it_row, it_col) == (ip_row, ip_col)
+        for (jumped_cell, land_cell) in bitboard.CELL_JUMP_TABLE[self.get_kind()][self._pos]:
+            if land_cell == (it_row, it_col):
+                return self._jumped_piece_is_opp(jumped_cell[0], jumped_cell[1], board)
+        return False
 
 
     def _jumped_piece_is_opp(self, ijp_row, ijp_col, board):
@@ -1033,7 +1358,8 @@ class Piece:
     def get_adj_opps(self, i_row, i_col, board):
         """
         Returns a list of all cells that are adjacent to the
-        given cell and contain an opposing piece.
+        given cell (in the directions this Piece can move in)
+        and contain an opposing piece.
         @i_row: A 0-based row index of the current Piece's cell
         @i_col: A 0-based col index of the current Piece's cell
         type i_row: int
@@ -1043,43 +1369,11 @@ class Piece:
         rtype: [tuple]
         """
         adj_opp_cells = []
-        tr_cell = (0, len(board[0])-1) #No need for top LEFT cuz no piece is ever gonna be there
-        bl_cell = (len(board)-1, 0) #No need for bottom RIGHT cuz no piece is ever gonna be there
-        ls_cells = [(c, 0) for c in range(1, len(board)-2, 2)] 
-        rs_cells = [(c, len(board[0])-1) for c in range(2, len(board)-1, 2)] 
-        ts_cells = [(0, c) for c in range(1, len(board[0])-1, 2)] 
-        bs_cells = [(len(board)-1, c) for c in range(2, len(board[0])-1, 2)]
-        
-        if (i_row, i_col) == tr_cell:
-            self._adjacency_check(i_row+1, i_col-1, board, adj_opp_cells) #diagonally down-left
-        elif (i_row, i_col) == bl_cell:
-            self._adjacency_check(i_row-1, i_col+1, board, adj_opp_cells) #diagonally up-right
-        elif (i_row, i_col) in ls_cells: #If in left side cells...
-            if self._color == "R" or self._is_king:
-                self._adjacency_check(i_row-1, i_col+1, board, adj_opp_cells) #diagonally up-right
-            if self._color == "B" or self._is_king:
-                self._adjacency_check(i_row+1, i_col+1, board, adj_opp_cells) #diagonally down-right
-        elif (i_row, i_col) in rs_cells: #If in right side cells...
-            if self._color == "R" or self._is_king:
-                self._adjacency_check(i_row-1, i_col-1, board, adj_opp_cells) #diagonally up-left
-            if self._color == "B" or self._is_king:
-                self._adjacency_check(i_row+1, i_col-1, board, adj_opp_cells) #diagonally down-left
-        elif (i_row, i_col) in ts_cells: #If in top side cells...
-            self._adjacency_check(i_row+1, i_col+1, board, adj_opp_cells) #diagonally down-right
-            self._adjacency_check(i_row+1, i_col-1, board, adj_opp_cells) #diagonally down-left
-        elif (i_row, i_col) in bs_cells: #If in bottom side cells...
-            self._adjacency_check(i_row-1, i_col-1, board, adj_opp_cells) #diagonally up-left
-            self._adjacency_check(i_row-1, i_col+1, board, adj_opp_cells) #diagonally up-right
-        else: #Piece is in non-boundary
-            if self._color == "R" or self._is_king:
-                self._adjacency_check(i_row-1, i_col-1, board, adj_opp_cells) #diagonally up-left
-                self._adjacency_check(i_row-1, i_col+1, board, adj_opp_cells) #diagonally up-right
-            if self._color == "B" or self._is_king:
-                self._adjacency_check(i_row+1, i_col+1, board, adj_opp_cells) #diagonally down-right
-                self._adjacency_check(i_row+1, i_col-1, board, adj_opp_cells) #diagonally down-left
+        for cell in bitboard.CELL_STEP_TABLE[self.get_kind()][(i_row, i_col)]:
+            self._adjacency_check(cell[0], cell[1], board, adj_opp_cells)
 
         return adj_opp_cells
-    
+
 
     def opp_piece(self):
         """
@@ -1127,19 +1421,86 @@ class Piece:
                 and a position adjacent to it or False otherwise.
         rtype: bool
         """
-        #The following is derived from the midpoint formula. Note how an empty
-        #space between two other spaces A and B on the same diagonal is the
-        #midpoint between A and B.
-        cand_targ_row = 2*iadj_row - ip_row
-        cand_targ_col = 2*iadj_col - ip_col
-        
-        #check if out of bounds...
-        if not 0 <= cand_targ_row <= len(board)-1:
-            return False
-        if not 0 <= cand_targ_col <= len(board[0])-1:
-            return False
+        #The landing cell is looked up rather than worked out with the midpoint
+        #formula. Jumps that would land off the board have no entry.
+        land_cell = bitboard.JUMP_LANDINGS.get(((ip_row, ip_col), (iadj_row, iadj_col)))
+        return land_cell != None and board[land_cell[0]][land_cell[1]] == " "
+
+
+
 
-        return board[cand_targ_row][cand_targ_col] == " "
+def from_snapshot(snapshot):
+    """
+    Sets up a Checkers gamestate from a snapshot (see Checkers.snapshot()).
+    @snapshot: A 4-tuple: (black pieces, red pieces, kings, turn)
+    type snapshot: tuple
+    return: A Checkers gamestate for the position
+    rtype: Checkers
+    """
+    (black_bb, red_bb, king_bb, turn) = snapshot
+    board = [[" " for i_col in range(8)] for i_row in range(8)]
+    for sq in bitboard.iter_bits(black_bb | red_bb):
+        (i_row, i_col) = bitboard.SQ_CELLS[sq]
+        board[i_row][i_col] = Piece("B" if black_bb >> sq & 1 else "R", i_row, i_col)
+        if king_bb >> sq & 1:
+            board[i_row][i_col].set_to_king()
+    return _set_up(board, turn)
+
+
+def from_fen(fen):
+    """
+    Sets up a Checkers gamestate from a PDN FEN string such as
+    "B:W21,22,K30:B1,2,K5". The first field is the side to move and the
+    other two list each side's squares (1 to 32), with a K in front of
+    the kings. PDN calls red "W" (white). Raises ValueError if the
+    string isn't such a position.
+    @fen: A PDN FEN string
+    type fen: str
+    return: A Checkers gamestate for the position
+    rtype: Checkers
+    """
+    fields = fen.strip().rstrip(".").split(":")
+    if fields[0] not in ("B", "W"):
+        raise ValueError("{!r}: the side to move must be B or W, not {!r}".format(fen, fields[0]))
+    board = [[" " for i_col in range(8)] for i_row in range(8)]
+    for field in fields[1:]:
+        if field[:1] not in ("B", "W"):
+            raise ValueError("{!r}: a side's squares must start with B or W, not {!r}".format(fen, field[:1]))
+        color = "R" if field[0] == "W" else "B"
+        for square in field[1:].split(","):
+            square = square.strip()
+            if square == "":
+                continue
+            is_king = square[0] == "K"
+            number = square[1:] if is_king else square
+            if not number.isdigit() or not 1 <= int(number) <= bitboard.NUM_SQUARES:
+                raise ValueError("{!r}: {!r} is not a square from 1 to {}".format(fen, square, bitboard.NUM_SQUARES))
+            (i_row, i_col) = bitboard.sq_to_cell(int(number) - 1)
+            if board[i_row][i_col] != " ":
+                raise ValueError("{!r}: square {} is listed twice".format(fen, number))
+            board[i_row][i_col] = Piece(color, i_row, i_col)
+            if is_king:
+                board[i_row][i_col].set_to_king()
+    return _set_up(board, "R" if fields[0] == "W" else "B")
+
+
+def _set_up(board, turn):
+    """
+    Makes a Checkers gamestate for a position that didn't come from
+    playing a game out, and works out what playing it out would have
+    (any jump that has to be made, and whether the game is already over).
+    @board: A list representation of a gameboard
+    @turn: The player ("B" or "R") whose turn it is
+    type board: list
+    type turn: str
+    return: A Checkers gamestate for the position
+    rtype: Checkers
+    """
+    gamestate = Checkers(board, turn)
+    gamestate._check_if_opp_forced_to_move() #So that make_move knows about any jump that must be made
+    if not gamestate.has_legal_moves():
+        gamestate.set_winner(gamestate._opp_player(turn))
+    return gamestate
 
 
 
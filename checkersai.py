@@ -1,10 +1,96 @@
-#Contains the classes that represent the AIs for the game (at the
-#moment, only random_randy is working properly).
-import checkers, random
+#Contains the AIs for the game: random_randy, which plays a random legal move, and the
+#Mini Max family: plain minimax, minimax_abp (alpha-beta with a transposition table,
+#move ordering, quiescence search and endgame tablebase probes) and pvs (negamax
+#principal variation search with aspiration windows and late move reductions), driven
+#by iterative_deepening within a time/node budget. The evaluations they can use are in
+#_EVALUATIONS. The Monte Carlo tree search AI is in mcts.py, the parallel search in
+#parallelsearch.py, and the GUI plays from the opening book (openingbook.py) first.
+import checkers, pst, random, tablebase, time, transtable
 
 #For your AIs, try to focus on returning moves only. Leave the
 #process of how the move changes the gamestate to the GUI code.
 
+_MAX_DEPTH = 64 #How deep iterative deepening goes if the budget never runs out
+_CLOCK_CHECK_NODES = 64 #How many nodes a search visits between looks at the clock
+QUIESCENCE_NODES = 256 #A reasonable node cap for the quiescence search at each leaf
+_ASPIRATION_WINDOW = 1 #How far (in pieces) either side of the last score the PVS root window starts out
+_LMR_MIN_DEPTH = 3 #Late move reductions only happen this deep or deeper...
+_LMR_MIN_MOVES = 3 #...and only to moves after the first few
+
+
+
+
+class SearchTimeout(Exception):
+    """ An error that represents a search running out of its budget. """
+    pass
+
+
+
+
+class SearchBudget:
+    """ Limits how long a search may run, in wall-clock seconds and/or nodes. """
+
+    def __init__(self, time_limit=None, node_limit=None):
+        """
+        Initializes a SearchBudget. A limit of None means no limit.
+        @time_limit: The number of seconds a search may take
+        @node_limit: The number of nodes a search may visit
+        type time_limit: float
+        type node_limit: int
+        """
+        self._time_limit = time_limit
+        self._node_limit = node_limit
+        self._deadline = None
+        self._nodes = 0
+        self._stopped = False
+
+
+    def start(self):
+        """
+        Starts the clock (and the node count) for a new search.
+        return: None
+        rtype: None
+        """
+        self._nodes = 0
+        if self._time_limit != None:
+            self._deadline = time.perf_counter() + self._time_limit
+
+
+    def get_nodes(self):
+        """
+        Returns the number of nodes visited since the search started.
+        return: The number of nodes visited
+        rtype: int
+        """
+        return self._nodes
+
+
+    def stop(self):
+        """
+        Makes the search stop (with SearchTimeout) as soon as it next looks
+        at the clock, whatever is left of the budget. This is safe to call
+        from another thread than the one searching, and it can't be undone.
+        return: None
+        rtype: None
+        """
+        self._stopped = True
+
+
+    def tick(self):
+        """
+        Counts a node and raises SearchTimeout once the budget is spent.
+        The clock is only looked at every few nodes since that's
+        (relatively) slow.
+        return: None
+        rtype: None
+        """
+        self._nodes += 1
+        if self._node_limit != None and self._nodes > self._node_limit:
+            raise SearchTimeout
+        if self._nodes % _CLOCK_CHECK_NODES == 0 and (
+            self._stopped or (self._deadline != None and time.perf_counter() >= self._deadline)):
+            raise SearchTimeout
+
 
 
 
@@ -14,37 +100,36 @@ def random_randy(gs, cpu_color):
     gamestate and the cpu's color and returns a valid random move.
     @cpu_color: The color of the CPU opponent ("R" or "B")
     type cpu_color: str
-    return: A 4-tuple that represents the move to be made:
-            (start_row, start_col, target_row, target_col)
-    rtype: tuple
+    return: A Move (which indexes like the 5-tuple:
+            (start_row, start_col, target_row, target_col, move_type))
+            or None if no move can be made
+    rtype: Move, None
     """
-    valid_moves = gs._valid_moves_exist(cpu_color, check_for_cpu=True)
-    jump_moves = [move for move in valid_moves if move[-1] == "jump"]
     #Recall that if there's a jump available, the jump must be made no matter what.
-    if len(jump_moves) > 0:
-        return random.choice(jump_moves)
+    #legal_moves() only yields jumps in that case.
+    valid_moves = list(gs.legal_moves())
     if len(valid_moves) == 0:
         return None
 
     return random.choice(valid_moves)
-    #Note how a move is a 4-tuple consisting of:
-    #(start_row, start_col, target_row, target_col)
 
 
 
 
-def minimax(gamestate, cpu_color, depth):
+def minimax(gamestate, cpu_color, depth, verbose=True):
     """
     Executes a cpu move based on a depth-limited minimax algorithm.
-    @gamestate: The game state of a checkers match. The game state is
-                altered as the minimax search progresses down the tree
-                of possible move outcomes.
+    @gamestate: The game state of a checkers match. Moves are tried on
+                the game state itself with push() and taken back with
+                pop(), so it's left as it was once the search is done.
     @cpu_color: The color of the CPU
     @depth: An int indicating how deep to traverse down the tree of
             possible move outcomes
+    @verbose: Indicates if the search should be traced on the console
     type gamestate: Checkers
     type cpu_color: str
     type depth: int
+    type verbose: bool
     """
     best_move = None    
     node_type = ""
@@ -52,89 +137,108 @@ def minimax(gamestate, cpu_color, depth):
     #Base case of Mini Max
     if depth == 0 or gamestate.get_winner() != None:
         node_type = "terminal"
-        print("TERMINAL NODE REACHED (depth: {})".format(depth))
-        print("EVALUATING THIS BOARD:")
-        gamestate.print_board()
-        print("**********")
-        print("GOING BACK UP FROM {} NODE\n".format(node_type))
+        if verbose:
+            print("TERMINAL NODE REACHED (depth: {})".format(depth))
+            print("EVALUATING THIS BOARD:")
+            gamestate.print_board()
+            print("**********")
+            print("GOING BACK UP FROM {} NODE\n".format(node_type))
 
         return (minimax_eval(gamestate, cpu_color), None)
 
-    if gamestate.get_turn() == cpu_color:
+    turn = gamestate.get_turn()
+    if turn == cpu_color:
         node_type = "max"
-        print("AT ^_MAX_^ NODE ({})".format(gamestate.get_turn()))
-        print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
-        gamestate.print_board()
+        if verbose:
+            print("AT ^_MAX_^ NODE ({})".format(turn))
+            print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
+            gamestate.print_board()
 
         best_val = float("-inf")
-        valid_moves = gamestate._valid_moves_exist(
-                        gamestate.get_turn(), check_for_cpu=True)
-
-        for move in valid_moves:
-            #move is a 4-tuple: (start_row, start_col, target_row, target_col)
-            dummy_game = checkers.Checkers(init_config = gamestate.get_board(),
-                                           init_turn = gamestate.get_turn())
-
-            #NOTE: make_move() will switch turns
-            dummy_game.make_move(move[0]+1, move[1]+1, move[2]+1, move[3]+1)
-            print("MOVE MADE BY ^_MAX_^ NODE ({}, depth: {}):".\
-                  format(gamestate.get_turn(), depth))
-            print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
-            dummy_game.print_board() #FOR TESTING
-            print("")
-
-            (val, move_made) = minimax(dummy_game, cpu_color, depth-1)
+        for move in gamestate.legal_moves():
+            #move is a Move: (start_row, start_col, target_row, target_col, move_type)
+            #NOTE: push() will switch turns
+            gamestate.push(move)
+            if verbose:
+                print("MOVE MADE BY ^_MAX_^ NODE ({}, depth: {}):".format(turn, depth))
+                print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
+                gamestate.print_board() #FOR TESTING
+                print("")
+
+            (val, move_made) = minimax(gamestate, cpu_color, depth-1, verbose)
+            gamestate.pop()
             if val > best_val:
                 best_move, best_val = move, val
 
     else: #If it's the minimizing player's turn to move...
         node_type = "min"
-        print("AT v_MIN_v NODE KHOA ({})".format(gamestate.get_turn()))
-        print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
-        gamestate.print_board()
+        if verbose:
+            print("AT v_MIN_v NODE KHOA ({})".format(turn))
+            print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
+            gamestate.print_board()
 
         best_val = float("inf")
-        valid_moves = gamestate._valid_moves_exist(
-                        gamestate.get_turn(), check_for_cpu=True)
-
-        for move in valid_moves:
-            dummy_game = checkers.Checkers(init_config = gamestate.get_board(),
-                                           init_turn = gamestate.get_turn())
-
-            dummy_game.make_move(move[0]+1, move[1]+1, move[2]+1, move[3]+1)
-            print("MOVE MADE BY v_MIN_v NODE ({}, depth: {}):".\
-                  format(gamestate.get_turn(), depth))
-            print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
-            dummy_game.print_board()
-            print("")
-
-            (val, move_made) = minimax(dummy_game, cpu_color, depth-1)
+        for move in gamestate.legal_moves():
+            gamestate.push(move)
+            if verbose:
+                print("MOVE MADE BY v_MIN_v NODE ({}, depth: {}):".format(turn, depth))
+                print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
+                gamestate.print_board()
+                print("")
+
+            (val, move_made) = minimax(gamestate, cpu_color, depth-1, verbose)
+            gamestate.pop()
             if val < best_val:
                 best_move, best_val = move, val
 
-    print("GOING BACK UP FROM {} NODE\n".format(node_type))
+    if verbose:
+        print("GOING BACK UP FROM {} NODE\n".format(node_type))
     return (best_val, best_move)
 
 
 
 
-def minimax_abp(gamestate, cpu_color, depth, alpha, beta):
+def minimax_abp(gamestate, cpu_color, depth, alpha, beta, verbose=True, budget=None, table=None,
+                orderer=None, quiescence=None, ply=0, tablebase=None, evaluation="material"):
     """
     Executes a cpu move based on a depth-limited minimax
     algorithm with alpha-beta pruning.
-    @gamestate: The game state of a checkers match. The game state is
-                altered as the minimax search progresses down the tree
-                of possible move outcomes.
+    @gamestate: The game state of a checkers match. Moves are tried on
+                the game state itself with push() and taken back with
+                pop(), so it's left as it was once the search is done.
     @cpu_color: The color of the CPU
     @depth: An int indicating how deep to traverse down the tree of
             possible move outcomes
     @alpha: The maximum lower bound for an AB-prune
     @beta: The minimum upper bound for an AB-prune
+    @verbose: Indicates if the search should be traced on the console
+    @budget: A SearchBudget to stay within, or None. SearchTimeout is
+             raised when it runs out (the gamestate is still put back
+             the way it was).
+    @table: A TranspositionTable to look positions up in and to store
+            results in, or None
+    @orderer: A MoveOrderer to sort the moves at each node with, or None
+              to try them in the order they're generated
+    @quiescence: The node cap of the quiescence search that scores the
+                 leaves, or None to score them with minimax_eval directly
+    @ply: How many moves below the root of the search the game state is
+    @tablebase: A Tablebase to look endgames up in (anywhere below the
+                root), or None
+    @evaluation: How to score the leaves: "material" (minimax_eval),
+                 "pst" (pst_eval) or "nnue" (nnue_eval)
     type gamestate: Checkers
     type cpu_color: str
     type depth: int
     type alpha: float
     type beta: float
+    type verbose: bool
+    type budget: SearchBudget
+    type table: TranspositionTable
+    type orderer: MoveOrderer
+    type quiescence: int
+    type ply: int
+    type tablebase: Tablebase
+    type evaluation: str
     return: A tuple whose first component is a utility value and
             whose second component is the the move associated with
             that utility value
@@ -142,48 +246,74 @@ def minimax_abp(gamestate, cpu_color, depth, alpha, beta):
     """
     best_move = None    
     node_type = ""
+    if budget != None:
+        budget.tick()
+
+    if verbose:
+        print("ALPHA-BETA PRUNING IN EFFECT")
+    if ply == 0:
+        _prepare_evaluation(gamestate, evaluation)
 
-    print("ALPHA-BETA PRUNING IN EFFECT")
+    #A game that's over is won or lost outright, which beats any evaluation (or tablebase win further off):
+    if gamestate.get_winner() != None and ply > 0:
+        return (_game_over_score(gamestate.get_winner(), cpu_color, ply), None)
+
+    #An endgame that's in the tablebases doesn't need searching (or evaluating):
+    if tablebase != None and ply > 0:
+        score = tablebase.score(gamestate, ply)
+        if score != None:
+            return (score if gamestate.get_turn() == cpu_color else -score, None)
 
     #Base case of Mini Max
     if depth == 0 or gamestate.get_winner() != None:
         node_type = "terminal"
-        print("TERMINAL NODE REACHED (depth: {})".format(depth))
-        print("EVALUATING THIS BOARD:")
-        gamestate.print_board()
-        print("**********")
-        print("GOING BACK UP FROM {} NODE\n".format(node_type))
-
-        return (minimax_eval(gamestate, cpu_color), None)
-
-    if gamestate.get_turn() == cpu_color:
+        if verbose:
+            print("TERMINAL NODE REACHED (depth: {})".format(depth))
+            print("EVALUATING THIS BOARD:")
+            gamestate.print_board()
+            print("**********")
+            print("GOING BACK UP FROM {} NODE\n".format(node_type))
+
+        if quiescence != None and gamestate.get_winner() == None:
+            return (quiescence_search(gamestate, cpu_color, alpha, beta, quiescence, budget, evaluation, ply), None)
+        return (_EVALUATIONS[evaluation](gamestate, cpu_color), None)
+
+    #A position that was already searched deeply enough (maybe reached by a
+    #different move order, or in an earlier search) doesn't need searching again:
+    hash_move = None
+    if table != None:
+        (hit, hash_move) = _probe_table(table, gamestate, cpu_color, depth, alpha, beta, ply)
+        if hit != None:
+            return hit
+        (alpha_orig, beta_orig) = (alpha, beta)
+
+    moves = gamestate.legal_moves() if orderer == None else orderer.order(gamestate, ply, hash_move)
+
+    turn = gamestate.get_turn()
+    if turn == cpu_color:
         node_type = "max"
-        print("AT ^_MAX_^ NODE ({})".format(gamestate.get_turn()))
-        print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
-        gamestate.print_board()
+        if verbose:
+            print("AT ^_MAX_^ NODE ({})".format(turn))
+            print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
+            gamestate.print_board()
 
         best_val = float("-inf")
-        valid_moves = gamestate._valid_moves_exist(
-                        gamestate.get_turn(), check_for_cpu=True)
-
-        for move in valid_moves:
-            #move is a 4-tuple: (start_row, start_col, target_row, target_col)
-            dummy_game = checkers.Checkers(init_config = gamestate.get_board(),
-                                           init_turn = gamestate.get_turn())
+        for move in moves:
+            #move is a Move: (start_row, start_col, target_row, target_col, move_type)
+            #NOTE: push() sets the winner instead of raising GameOverError
+            gamestate.push(move)
+            if verbose:
+                print("MOVE MADE BY ^_MAX_^ NODE ({}, depth: {}):".format(turn, depth))
+                print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
+                gamestate.print_board() #FOR TESTING
+                print("")
 
             try:
-                dummy_game.make_move(move[0]+1, move[1]+1, move[2]+1, move[3]+1)
-            except checkers.GameOverError:
-                dummy_game.set_winner(gamestate.get_turn())
-
-            print("MOVE MADE BY ^_MAX_^ NODE ({}, depth: {}):".\
-                  format(gamestate.get_turn(), depth))
-            print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
-            dummy_game.print_board() #FOR TESTING
-            print("")
-
-            (val, move_made) = minimax_abp(dummy_game,
-                                cpu_color, depth-1, alpha, beta)
+                (val, move_made) = minimax_abp(gamestate,
+                                    cpu_color, depth-1, alpha, beta, verbose, budget, table,
+                                    orderer, quiescence, ply+1, tablebase, evaluation)
+            finally: #Take the move back even if the search runs out of time
+                gamestate.pop()
 
             if val > best_val:
                 best_move, best_val = move, val
@@ -192,35 +322,33 @@ def minimax_abp(gamestate, cpu_color, depth, alpha, beta):
                 alpha = best_val
 
             if beta <= alpha:
-                print("PRUNING!!!")
+                if verbose:
+                    print("PRUNING!!!")
+                if orderer != None:
+                    orderer.record_cutoff(move, ply, depth)
                 break
     else:
         node_type = "min"
-        print("AT v_MIN_v NODE ({})".format(gamestate.get_turn()))
-        print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
-        gamestate.print_board()
+        if verbose:
+            print("AT v_MIN_v NODE ({})".format(turn))
+            print("CURRENT BOARD CONFIG (depth: {}):".format(depth), end="")
+            gamestate.print_board()
 
         best_val = float("inf")
-        valid_moves = gamestate._valid_moves_exist(
-                        gamestate.get_turn(), check_for_cpu=True)
-
-        for move in valid_moves:
-            dummy_game = checkers.Checkers(init_config = gamestate.get_board(),
-                                           init_turn = gamestate.get_turn())
+        for move in moves:
+            gamestate.push(move)
+            if verbose:
+                print("MOVE MADE BY v_MIN_v NODE ({}, depth: {}):".format(turn, depth))
+                print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
+                gamestate.print_board()
+                print("")
 
             try:
-                dummy_game.make_move(move[0]+1, move[1]+1, move[2]+1, move[3]+1)
-            except checkers.GameOverError:
-                dummy_game.set_winner(gamestate.get_turn())
-
-            print("MOVE MADE BY v_MIN_v NODE ({}, depth: {}):".\
-                  format(gamestate.get_turn(), depth))
-            print((move[0]+1, move[1]+1), (move[2]+1, move[3]+1))
-            dummy_game.print_board()
-            print("")
-
-            (val, move_made) = minimax_abp(dummy_game,
-                                cpu_color, depth-1, alpha, beta)
+                (val, move_made) = minimax_abp(gamestate,
+                                    cpu_color, depth-1, alpha, beta, verbose, budget, table,
+                                    orderer, quiescence, ply+1, tablebase, evaluation)
+            finally:
+                gamestate.pop()
             if val < best_val:
                 best_move, best_val = move, val
 
@@ -228,15 +356,459 @@ def minimax_abp(gamestate, cpu_color, depth, alpha, beta):
                 beta = best_val
 
             if beta <= alpha:
-                print("xxxxxPRUNINGxxxxx!!!")
+                if verbose:
+                    print("xxxxxPRUNINGxxxxx!!!")
+                if orderer != None:
+                    orderer.record_cutoff(move, ply, depth)
                 break
 
-    print("GOING BACK UP FROM {} NODE\n".format(node_type))
+    if table != None:
+        _store_in_table(table, gamestate, cpu_color, depth, alpha_orig, beta_orig, best_val, best_move, ply)
+    if verbose:
+        print("GOING BACK UP FROM {} NODE\n".format(node_type))
     return (best_val, best_move)
 
 
 
 
+def quiescence_search(gamestate, cpu_color, alpha, beta, node_limit, budget=None, evaluation="material", ply=0):
+    """
+    Scores a leaf of the main search without stopping in the middle of
+    an exchange of pieces. As long as the player to move has a jump (which
+    they have to take), the jumps are searched; positions without one
+    are scored with the evaluation function. Since jumps are mandatory, only a few
+    moves ever need looking at, but the search is capped at node_limit
+    nodes anyway, after which the remaining positions are scored as they
+    stand.
+    @gamestate: The game state of a checkers match (left as it was)
+    @cpu_color: The color of the CPU
+    @alpha: The maximum lower bound for an AB-prune
+    @beta: The minimum upper bound for an AB-prune
+    @node_limit: The most nodes to visit
+    @budget: A SearchBudget to stay within, or None
+    @evaluation: "material" (minimax_eval), "pst" (pst_eval) or "nnue" (nnue_eval)
+    @ply: How many moves below the root of the main search the game state is
+    type gamestate: Checkers
+    type cpu_color: str
+    type alpha: float
+    type beta: float
+    type node_limit: int
+    type budget: SearchBudget
+    type evaluation: str
+    type ply: int
+    return: A utility value
+    rtype: float
+    """
+    if ply == 0:
+        _prepare_evaluation(gamestate, evaluation)
+    return _quiesce(gamestate, cpu_color, alpha, beta, [node_limit], budget, _EVALUATIONS[evaluation], ply)
+
+
+def _quiesce(gamestate, cpu_color, alpha, beta, nodes_left, budget, evaluate, ply):
+    """
+    Does the work for quiescence_search.
+    @nodes_left: A 1 item list holding the number of nodes the search may
+                 still visit (shared by the whole search)
+    @evaluate: The evaluation function
+    type nodes_left: list
+    type evaluate: function
+    return: A utility value
+    rtype: float
+    """
+    if budget != None:
+        budget.tick()
+    nodes_left[0] -= 1
+    if gamestate.get_winner() != None:
+        return _game_over_score(gamestate.get_winner(), cpu_color, ply)
+    if nodes_left[0] < 0 or not gamestate.has_captures():
+        return evaluate(gamestate, cpu_color)
+
+    #The longest jumps are the likeliest to be best, so they go first:
+    captures = sorted(gamestate.capture_sequences(), key=lambda move: len(move.path), reverse=True)
+    if gamestate.get_turn() == cpu_color:
+        best_val = float("-inf")
+        for move in captures:
+            gamestate.push(move)
+            try:
+                val = _quiesce(gamestate, cpu_color, alpha, beta, nodes_left, budget, evaluate, ply+1)
+            finally:
+                gamestate.pop()
+            best_val = max(best_val, val)
+            alpha = max(alpha, best_val)
+            if beta <= alpha:
+                break
+    else:
+        best_val = float("inf")
+        for move in captures:
+            gamestate.push(move)
+            try:
+                val = _quiesce(gamestate, cpu_color, alpha, beta, nodes_left, budget, evaluate, ply+1)
+            finally:
+                gamestate.pop()
+            best_val = min(best_val, val)
+            beta = min(beta, best_val)
+            if beta <= alpha:
+                break
+    return best_val
+
+
+
+
+def pvs(gamestate, depth, alpha, beta, budget=None, table=None, orderer=None,
+        quiescence=None, ply=0, tablebase=None, evaluation="material"):
+    """
+    A principal variation search: alpha-beta in negamax form (values are
+    from the point of view of the player to move, and a child's value is
+    the negative of its parent's) that searches the first move with the
+    full window and the rest with a zero window, just to prove they are
+    no better. Only a move that turns out better is searched again with
+    the full window. Quiet moves that come late in the move order (so
+    are unlikely to be best) are also searched a ply shallower at first,
+    unless they leave the opponent a jump. The zero windows assume that
+    values are whole numbers, as all of _EVALUATIONS' are.
+    @gamestate: The game state of a checkers match (left as it was)
+    @depth: How deep to search
+    @alpha: The value the player to move is already sure of
+    @beta: The value the opponent is already sure of
+    @budget: A SearchBudget to stay within, or None
+    @table: A TranspositionTable, or None
+    @orderer: A MoveOrderer, or None
+    @quiescence: The node cap of the quiescence search at the leaves, or None
+    @ply: How many moves below the root of the search the game state is
+    @tablebase: A Tablebase to look endgames up in (anywhere below the
+                root), or None
+    @evaluation: "material" (minimax_eval), "pst" (pst_eval) or "nnue" (nnue_eval)
+    type gamestate: Checkers
+    type depth: int
+    type alpha: float
+    type beta: float
+    type budget: SearchBudget
+    type table: TranspositionTable
+    type orderer: MoveOrderer
+    type quiescence: int
+    type ply: int
+    type tablebase: Tablebase
+    type evaluation: str
+    return: A tuple whose first component is a utility value (for the
+            player to move) and whose second component is the move
+            associated with that utility value
+    rtype: tuple
+    """
+    if budget != None:
+        budget.tick()
+    if ply == 0:
+        _prepare_evaluation(gamestate, evaluation)
+    winner = gamestate.get_winner()
+    #The turn doesn't pass on a move that ends the game, but the player
+    #to move in a finished game is really the one who lost:
+    turn = gamestate.get_turn() if winner == None else ("B" if winner == "R" else "R")
+    if winner != None and ply > 0:
+        return (_game_over_score(winner, turn, ply), None)
+    if tablebase != None and ply > 0:
+        score = tablebase.score(gamestate, ply)
+        if score != None:
+            return (score, None)
+    if depth <= 0 or winner != None:
+        if quiescence != None and winner == None:
+            return (quiescence_search(gamestate, turn, alpha, beta, quiescence, budget, evaluation, ply), None)
+        return (_EVALUATIONS[evaluation](gamestate, turn), None)
+
+    hash_move = None
+    if table != None:
+        (hit, hash_move) = _probe_table(table, gamestate, turn, depth, alpha, beta, ply)
+        if hit != None:
+            return hit
+    alpha_orig = alpha
+
+    moves = gamestate.legal_moves() if orderer == None else orderer.order(gamestate, ply, hash_move)
+
+    best_val, best_move = float("-inf"), None
+    for (i, move) in enumerate(moves):
+        gamestate.push(move)
+        try:
+            if i == 0:
+                val = -pvs(gamestate, depth-1, -beta, -alpha, budget, table, orderer, quiescence, ply+1, tablebase,
+                           evaluation)[0]
+            else:
+                reduce = (depth >= _LMR_MIN_DEPTH and i >= _LMR_MIN_MOVES and move.move_type == "step"
+                          and not gamestate.has_captures())
+                val = -pvs(gamestate, depth-2 if reduce else depth-1, -alpha-1, -alpha,
+                           budget, table, orderer, quiescence, ply+1, tablebase, evaluation)[0]
+                if reduce and val > alpha: #The reduced search may have missed something
+                    val = -pvs(gamestate, depth-1, -alpha-1, -alpha, budget, table, orderer, quiescence, ply+1, tablebase,
+                               evaluation)[0]
+                if alpha < val < beta: #Better than the first move after all, so find out by how much
+                    val = -pvs(gamestate, depth-1, -beta, -alpha, budget, table, orderer, quiescence, ply+1, tablebase,
+                               evaluation)[0]
+        finally:
+            gamestate.pop()
+
+        if val > best_val:
+            best_move, best_val = move, val
+        if best_val > alpha:
+            alpha = best_val
+        if alpha >= beta:
+            if orderer != None:
+                orderer.record_cutoff(move, ply, depth)
+            break
+
+    if table != None:
+        _store_in_table(table, gamestate, turn, depth, alpha_orig, beta, best_val, best_move, ply)
+    return (best_val, best_move)
+
+
+def aspiration_search(gamestate, depth, guess=None, budget=None, table=None, orderer=None,
+                      quiescence=None, tablebase=None, evaluation="material"):
+    """
+    Runs pvs from the root with a narrow window around a guess at the
+    score (e.g., the score of the previous iteration of iterative
+    deepening). Narrow windows prune more, and if the score falls
+    outside the window, the search is simply repeated with that side
+    of the window opened up.
+    @gamestate: The game state of a checkers match (left as it was)
+    @depth: How deep to search
+    @guess: The expected score (for the player to move), or None to
+            search with a full window
+    @budget: A SearchBudget to stay within, or None
+    @table: A TranspositionTable, or None
+    @orderer: A MoveOrderer, or None
+    @quiescence: The node cap of the quiescence search at the leaves, or None
+    @tablebase: A Tablebase, or None
+    @evaluation: "material" (minimax_eval), "pst" (pst_eval) or "nnue" (nnue_eval)
+    type gamestate: Checkers
+    type depth: int
+    type guess: float
+    type budget: SearchBudget
+    type table: TranspositionTable
+    type orderer: MoveOrderer
+    type quiescence: int
+    type tablebase: Tablebase
+    type evaluation: str
+    return: A (utility value, move) tuple, with the value for the
+            player to move
+    rtype: tuple
+    """
+    (alpha, beta) = (float("-inf"), float("inf"))
+    if guess != None:
+        window = _ASPIRATION_WINDOW * _PIECE_VALUES[evaluation]
+        (alpha, beta) = (guess - window, guess + window)
+    while True:
+        (val, move) = pvs(gamestate, depth, alpha, beta, budget, table, orderer, quiescence,
+                          tablebase=tablebase, evaluation=evaluation)
+        if val <= alpha and alpha != float("-inf"):
+            alpha = float("-inf")
+        elif val >= beta and beta != float("inf"):
+            beta = float("inf")
+        else:
+            return (val, move)
+
+
+
+
+def _game_over_score(winner, player, ply):
+    """
+    Scores a game that's over, on the same scale as Tablebase.score():
+    a win is worth WIN_SCORE less the moves it took from the root of the
+    search (so sooner wins come first), and a loss the negative of that.
+    @winner: The player who won
+    @player: The player to score it for
+    @ply: How many moves below the root of the search the game ended
+    type winner: str
+    type player: str
+    type ply: int
+    return: The score for the player
+    rtype: int
+    """
+    score = tablebase.WIN_SCORE - ply
+    return score if winner == player else -score
+
+
+def _probe_table(table, gamestate, cpu_color, depth, alpha, beta, ply):
+    """
+    Looks a position up in a transposition table to see if it can
+    be cut off without searching it (and if not, which move was best
+    the last time it was searched). The table holds values from the
+    point of view of the player to move (so that they can be shared
+    no matter which color the CPU is), and minimax_abp works with
+    values from the CPU's point of view, so they get turned around.
+    Won and lost games are stored counted from the position itself
+    (see _store_in_table), so they get counted from the root again.
+    @table: The TranspositionTable
+    @gamestate: The game state of a checkers match
+    @cpu_color: The color of the CPU
+    @depth: How deep the position needs to be searched
+    @alpha: The maximum lower bound for an AB-prune
+    @beta: The minimum upper bound for an AB-prune
+    @ply: How many moves below the root of the search the position is
+    type table: TranspositionTable
+    type gamestate: Checkers
+    type cpu_color: str
+    type depth: int
+    type alpha: float
+    type beta: float
+    type ply: int
+    return: A 2-tuple whose first component is a (utility value, move)
+            tuple like minimax_abp's, or None if the position has to be
+            searched, and whose second component is the stored best move
+            (or None)
+    rtype: tuple
+    """
+    entry = table.probe(gamestate.hash_key())
+    if entry == None:
+        return (None, None)
+    move = None if entry[3] == None else checkers.Move.decode(entry[3])
+    if entry[0] < depth: #Not deep enough to go by, but the move is still a good first guess
+        return (None, move)
+    (bound, val) = entry[1:3]
+    if val > tablebase.MIN_WIN_SCORE:
+        val -= ply
+    elif val < -tablebase.MIN_WIN_SCORE:
+        val += ply
+    if gamestate.get_turn() != cpu_color:
+        val = -val
+        bound = {transtable.LOWER: transtable.UPPER, transtable.UPPER: transtable.LOWER}.get(bound, bound)
+    if ((bound == transtable.EXACT) or (bound == transtable.LOWER and val >= beta)
+        or (bound == transtable.UPPER and val <= alpha)):
+        return ((val, move), move)
+    return (None, move)
+
+
+def _store_in_table(table, gamestate, cpu_color, depth, alpha, beta, val, move, ply):
+    """
+    Stores the result of searching a position in a transposition table
+    (see _probe_table). A won or lost game is scored by the moves it
+    takes from the root of the search, which means nothing once the
+    position is reached from another root or at another ply, so it's
+    stored by the moves it takes from the position itself.
+    @table: The TranspositionTable
+    @gamestate: The game state of a checkers match
+    @cpu_color: The color of the CPU
+    @depth: How deep the position was searched
+    @alpha: The alpha the position was searched with
+    @beta: The beta the position was searched with
+    @val: The utility value the search came up with
+    @move: The best move the search found
+    @ply: How many moves below the root of the search the position is
+    type table: TranspositionTable
+    type gamestate: Checkers
+    type cpu_color: str
+    type depth: int
+    type alpha: float
+    type beta: float
+    type val: float
+    type move: Move
+    type ply: int
+    return: None
+    rtype: None
+    """
+    if val <= alpha: #No move was good enough, so the true value may be even lower
+        bound = transtable.UPPER
+    elif val >= beta: #Pruned, so the true value may be even higher
+        bound = transtable.LOWER
+    else:
+        bound = transtable.EXACT
+    if gamestate.get_turn() != cpu_color:
+        val = -val
+        bound = {transtable.LOWER: transtable.UPPER, transtable.UPPER: transtable.LOWER}.get(bound, bound)
+    if val > tablebase.MIN_WIN_SCORE:
+        val += ply
+    elif val < -tablebase.MIN_WIN_SCORE:
+        val -= ply
+    table.store(gamestate.hash_key(), depth, bound, val, None if move == None else move.encode())
+
+
+
+
+def iterative_deepening(gamestate, cpu_color, time_limit=None, node_limit=None,
+                        max_depth=_MAX_DEPTH, verbose=False, table=None, orderer=None,
+                        quiescence=None, search="minimax", tablebase=None, budget=None,
+                        evaluation="material", new_search=True):
+    """
+    Searches with minimax_abp (or pvs) to depth 1, 2, 3, ... until the time or
+    node budget runs out, and returns the result of the deepest search
+    that finished. A search that runs out partway through is thrown
+    away, so the time it takes per move stays close to the budget no
+    matter how busy the position is. With a transposition table, each
+    depth starts off with what the earlier (shallower) ones found out.
+    @gamestate: The game state of a checkers match (left as it was)
+    @cpu_color: The color of the CPU
+    @time_limit: The number of seconds to search for, or None
+    @node_limit: The number of nodes to search, or None
+    @max_depth: The deepest search to try
+    @verbose: Indicates if each finished depth should be reported on the console
+    @table: A TranspositionTable to use (and keep filling) across searches,
+            or None
+    @orderer: A MoveOrderer to use (its history carries over between
+              searches), or None
+    @quiescence: The node cap of the quiescence search at the leaves, or None
+    @search: "minimax" for minimax_abp, or "pvs" for pvs with aspiration
+             windows around the previous depth's score
+    @tablebase: A Tablebase to look endgames up in, or None
+    @budget: A SearchBudget to search within instead of one made from
+             time_limit and node_limit (e.g., one that another thread
+             can stop), or None
+    @evaluation: How to score the leaves: "material" (minimax_eval),
+                 "pst" (pst_eval) or "nnue" (nnue_eval). A transposition
+                 table should only ever be filled in with one of them.
+    @new_search: Whether to tell the table and the move orderer that a
+                 new search is starting (False if they were already told
+                 for this move, e.g. by pondering)
+    type gamestate: Checkers
+    type cpu_color: str
+    type time_limit: float
+    type node_limit: int
+    type max_depth: int
+    type verbose: bool
+    type table: TranspositionTable
+    type orderer: MoveOrderer
+    type quiescence: int
+    type search: str
+    type tablebase: Tablebase
+    type budget: SearchBudget
+    type evaluation: str
+    type new_search: bool
+    return: A 3-tuple of the utility value, the move (None if there are
+            no moves) and the depth of the search they came from (0 if
+            not even the depth 1 search finished)
+    rtype: tuple
+    """
+    _prepare_evaluation(gamestate, evaluation)
+    moves = list(gamestate.legal_moves())
+    if len(moves) <= 1: #Nothing to think about
+        return (_EVALUATIONS[evaluation](gamestate, cpu_color), moves[0] if moves else None, 0)
+
+    #Until a search finishes, fall back on the first legal move:
+    result = (_EVALUATIONS[evaluation](gamestate, cpu_color), moves[0], 0)
+    if budget == None:
+        budget = SearchBudget(time_limit, node_limit)
+    budget.start()
+    if new_search and table != None:
+        table.new_search()
+    if new_search and orderer != None:
+        orderer.new_search()
+    guess = None
+    for depth in range(1, max_depth+1):
+        try:
+            if search == "pvs":
+                (guess, move) = aspiration_search(gamestate, depth, guess, budget, table, orderer,
+                                                  quiescence, tablebase, evaluation)
+                val = guess if gamestate.get_turn() == cpu_color else -guess
+            else:
+                (val, move) = minimax_abp(gamestate, cpu_color, depth,
+                                          float("-inf"), float("inf"), False, budget, table, orderer,
+                                          quiescence, tablebase=tablebase, evaluation=evaluation)
+        except SearchTimeout:
+            break
+        result = (val, move, depth)
+        if verbose:
+            print("DEPTH {} DONE: {} {} ({} nodes)".format(depth, val, move, budget.get_nodes()))
+    if verbose and table != None:
+        print("TRANSPOSITION TABLE: {}".format(table.get_stats()))
+    return result
+
+
+
+
 #TODO: Implement a stronger evaluation function
 def minimax_eval(gamestate, cpu_color):
     """
@@ -248,13 +820,77 @@ def minimax_eval(gamestate, cpu_color):
     return: A score for the given gamestate
     rtype: int
     """
+    material = gamestate.material()
     score = 0
-    score += gamestate.get_red_count() - gamestate.get_black_count() if cpu_color == "R" else\
-             gamestate.get_black_count() - gamestate.get_red_count()
+    score += (material.red_men + material.red_kings) - (material.black_men + material.black_kings)\
+             if cpu_color == "R" else\
+             (material.black_men + material.black_kings) - (material.red_men + material.red_kings)
 
     return score
 
 
+def pst_eval(gamestate, cpu_color):
+    """
+    An evaluation function built from piece-square tables (see pst.py):
+    what each piece is worth depends on where it stands and on how far
+    the game has got. The gamestate keeps the sums up to date as moves
+    are made and taken back, so this costs about as little as
+    minimax_eval.
+    @gamestate: A Checkers game state to evaluate
+    @cpu_color: The color of the CPU ("B" or "R")
+    type gamestate: Checkers
+    type cpu_color: str
+    return: A score for the given gamestate, in hundredths of a man
+    rtype: int
+    """
+    score = gamestate.pst_score()
+    return score if cpu_color == "B" else -score
+
+
+def nnue_eval(gamestate, cpu_color):
+    """
+    An evaluation function that runs the learned network in nnue.py
+    (DEFAULT_PATH) over the position. It reads the network's accumulator,
+    which the searches attach to the gamestate when they start (see
+    _prepare_evaluation()) and which then follows every move.
+    @gamestate: A Checkers game state to evaluate
+    @cpu_color: The color of the CPU ("B" or "R")
+    type gamestate: Checkers
+    type cpu_color: str
+    return: A score for the given gamestate, in hundredths of a man
+    rtype: int
+    """
+    accumulator = gamestate.get_accumulator()
+    if accumulator != None:
+        return accumulator.get_network().evaluate(gamestate, cpu_color)
+    #Without one, the network raises nnue.NNUEError (imported here for the same reason as in
+    #_prepare_evaluation())
+    import nnue
+    return nnue.get_default_network().evaluate(gamestate, cpu_color)
+
+
+def _prepare_evaluation(gamestate, evaluation):
+    """
+    Gets a gamestate ready to be scored with an evaluation throughout a
+    search (only nnue_eval needs anything: the network's accumulator).
+    @gamestate: The game state at the root of the search
+    @evaluation: The name of the evaluation (see _EVALUATIONS)
+    type gamestate: Checkers
+    type evaluation: str
+    return: None
+    rtype: None
+    """
+    if evaluation == "nnue":
+        #Imported here since nnue needs NumPy (which nothing else does) and imports this module
+        import nnue
+        nnue.attach(gamestate)
+
+
+#The evaluation functions by name, and what a man is worth to each:
+_EVALUATIONS = {"material": minimax_eval, "pst": pst_eval, "nnue": nnue_eval}
+_PIECE_VALUES = {"material": 1, "pst": pst.MAN_VALUE, "nnue": pst.MAN_VALUE}
+
+
 
 
 
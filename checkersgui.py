@@ -1,7 +1,11 @@
 #Contains the class for the checkerboard GUI.
-import tkinter, checkers, math, scoreboardgui, time, checkersai
+import tkinter, checkers, math, scoreboardgui, time, checkersai, transtable, moveorder, tablebase, openingbook, ponder, mcts
 _INIT_CELL_WIDTH = 50
 _INIT_CELL_HEIGHT = 50
+_CPU_THINK_TIME = 1.0 #How many seconds the Mini Max opponent thinks per move
+_CPU_SEARCH = "pvs" #The search the Mini Max opponent uses ("minimax" or "pvs")
+_CPU_EVALUATION = "material" #How the Mini Max opponent scores positions ("material", "pst" or "nnue")
+_MCTS_WORKERS = 1 #How many processes the MCTS opponent searches with
 
 
 
@@ -13,7 +17,8 @@ class CheckersBoard:
         """
         Initializes the attributes of a Checkers GUI game.
         @hum_player: The color of the human player
-        @cpu_opp: The AI opponent to play against
+        @cpu_opp: The AI opponent to play against ("Random Randy",
+                  "Mini Max" or "MCTS")
         @allow_forced_piece_hls: Indicates if pieces that are forced to
                                  move should be highlighted
         type hum_player: str
@@ -56,6 +61,20 @@ class CheckersBoard:
         self._hum_player = hum_player
         self._cpu_player = "B" if hum_player == "R" else "R"
         self._cpu_opp = cpu_opp
+        #What the selected opponent searches with (only that opponent's, so the rest stay None):
+        (self._trans_table, self._move_orderer, self._tablebase) = (None, None, None)
+        (self._opening_book, self._ponderer, self._mcts) = (None, None, None)
+        if cpu_opp == "Mini Max":
+            self._trans_table = transtable.TranspositionTable() #Kept for the whole game, so later moves reuse earlier searches
+            self._move_orderer = moveorder.MoveOrderer() #Likewise for its history table
+            self._tablebase = tablebase.Tablebase() #Whatever tables have been built (see tablebase.py)
+            self._opening_book = openingbook.OpeningBook() #Empty if no book has been built (see openingbook.py)
+            self._ponderer = ponder.Ponderer(self._cpu_player, table=self._trans_table, orderer=self._move_orderer,
+                                             quiescence=checkersai.QUIESCENCE_NODES, search=_CPU_SEARCH,
+                                             tablebase=self._tablebase,
+                                             evaluation=_CPU_EVALUATION) #Thinks on the human's time
+        elif cpu_opp == "MCTS":
+            self._mcts = mcts.MCTS(time_limit=_CPU_THINK_TIME, workers=_MCTS_WORKERS) #Keeps its tree for the whole game
 
         self._must_move_cell = None
         self._must_move_cell_id = 0
@@ -151,7 +170,7 @@ class CheckersBoard:
                and self._gamestate.get_winner() == None):
             if self._cpu_opp == "Random Randy":
                 move_made = checkersai.random_randy(self._gamestate, self._cpu_player)
-                #move_made is a 4-tuple: (ip_row, ip_col, it_row, it_col)
+                #move_made is a Move: (ip_row, ip_col, it_row, it_col, move_type, path)
                 print("Move that was made:")
                 print(move_made)
             elif self._cpu_opp == "Mini Max":
@@ -162,26 +181,60 @@ class CheckersBoard:
                 print("\n\n")
 
                 #move_made = checkersai.minimax(self._gamestate, self._cpu_player, 3)[1]
-                move_made = checkersai.minimax_abp(self._gamestate, self._cpu_player,
-                                                   3, float("-inf"), float("inf"))[1]
+                #move_made = checkersai.minimax_abp(self._gamestate, self._cpu_player,
+                #                                   3, float("-inf"), float("inf"))[1]
+                #Well-known openings don't need searching, and neither does the
+                #reply the CPU was expecting if it already searched it on the human's time:
+                pondered = self._ponderer.finish(self._gamestate, _CPU_THINK_TIME)
+                move_made = self._opening_book.choose(self._gamestate)
+                if move_made != None:
+                    print("BOOK MOVE")
+                elif pondered != None:
+                    move_made = pondered
+                    print("PONDER HIT {}".format(self._ponderer.get_stats()))
+                else:
+                    move_made = checkersai.iterative_deepening(self._gamestate, self._cpu_player,
+                                                               time_limit=_CPU_THINK_TIME, verbose=True,
+                                                               table=self._trans_table,
+                                                               orderer=self._move_orderer,
+                                                               quiescence=checkersai.QUIESCENCE_NODES,
+                                                               search=_CPU_SEARCH,
+                                                               tablebase=self._tablebase,
+                                                               evaluation=_CPU_EVALUATION,
+                                                               new_search=not self._ponderer.new_search_started())[1]
+                print("Move that was made:")
+                print(move_made)
+            elif self._cpu_opp == "MCTS":
+                move_made = self._mcts.search(self._gamestate)
+                print("MCTS SEARCH: {}".format(self._mcts.get_stats()))
                 print("Move that was made:")
                 print(move_made)
 
             #I think these lines of code should only be executed if a valid move exists...
             if move_made != None:
-                self._highlight_clicked_piece(event, midpoint_mappings, for_cpu=True,
-                                              cpu_row_col = (move_made[0], move_made[1]))
-                self._root.update()
-
-                time.sleep(0.5) #To give time for human to see what move was selected.
-                self._try_move(event, midpoint_mappings, for_cpu=True,
-                               cpu_row_col = (move_made[2], move_made[3]))
+                #A combo jump comes back as one move whose path has every cell the
+                #piece lands on, so play each hop of it out on the board.
+                cur_cell = (move_made[0], move_made[1])
+                for targ_cell in (move_made.path or ((move_made[2], move_made[3]),)):
+                    if self._gamestate.get_winner() != None:
+                        break
+                    self._highlight_clicked_piece(event, midpoint_mappings, for_cpu=True,
+                                                  cpu_row_col = cur_cell)
+                    self._root.update()
+
+                    time.sleep(0.5) #To give time for human to see what move was selected.
+                    self._try_move(event, midpoint_mappings, for_cpu=True,
+                                   cpu_row_col = targ_cell)
+                    cur_cell = targ_cell
 
             else: #If a move does not exist...
                 #Switch turns?
                 #TODO: Consider if this block is really necessary
                 pass
 
+        if self._cpu_opp == "Mini Max" and self._gamestate.get_winner() == None:
+            self._ponderer.start(self._gamestate)
+
 
     def _try_move(self, event, midpoint_mappings, for_cpu=False, cpu_row_col=None):
         """
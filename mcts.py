@@ -0,0 +1,420 @@
+#Contains the Monte Carlo tree search (UCT) AI for the game.
+#Instead of evaluating positions, it plays lots of random games ("playouts") out to the
+#end and grows a tree towards the moves that win the most of them, trying the less
+#explored moves every so often (the UCB1 formula). The tree is walked with a Checkers
+#gamestate (push/pop), but the playouts run on bare bitboards (see bitboard.successors()),
+#which is many times faster and doesn't print anything.
+#The tree is kept between moves: if the position the CPU has to move from is already in
+#the tree (after the CPU's last move and the reply), that subtree becomes the new root.
+#With more than one worker, each worker process grows its own tree from the same position
+#(root parallelism) and the visit counts of the root moves are added up. Every worker is a
+#pool of its own with a single process, so each tree stays in one process and gets exactly
+#one search per move (a shared pool could hand two searches to the same process, which
+#would search its tree twice and count the visits of the first search twice). The worker
+#processes are started (and set up their trees) when the MCTS is made, not in the middle
+#of the first search's time.
+#Run it with e.g.:  python mcts.py --iterations 2000 --workers 4
+
+import argparse
+import concurrent.futures
+import math
+import random
+import sys
+import time
+
+import bitboard
+import checkers
+import perft
+
+_EXPLORATION = 1.4 #How much UCB1 favors the less explored moves (about sqrt(2))
+_MAX_PLAYOUT_PLIES = 150 #A playout this long is called a draw
+_worker_searches = {} #Each worker process keeps its own MCTS (and tree) between tasks, by options
+
+
+
+
+class _Node:
+    """ A position in the search tree, reached by a move. """
+    __slots__ = ("move", "mover", "key", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, mover, key):
+        """
+        Initializes a _Node.
+        @move: The Move that leads to the node (None for the root)
+        @mover: The player who made the move
+        @key: The Zobrist key of the node's position
+        type move: Move
+        type mover: str
+        type key: int
+        """
+        self.move = move
+        self.mover = mover
+        self.key = key
+        self.children = []
+        self.untried = None #The moves that don't have a child yet (None until the node is first expanded)
+        self.visits = 0
+        self.wins = 0.0 #For the mover: 1 for every playout they won and 0.5 for every draw
+
+
+
+
+class MCTS:
+    """ A Monte Carlo tree search that keeps its tree from one move to the next. """
+
+    def __init__(self, iterations=None, time_limit=1.0, exploration=_EXPLORATION,
+                 max_playout_plies=_MAX_PLAYOUT_PLIES, workers=1, seed=None):
+        """
+        Initializes an MCTS. A search stops when it has done the given
+        number of iterations or run for the given time, whichever comes
+        first (a limit of None means no limit, but there has to be one).
+        @iterations: The number of playouts per search (per worker)
+        @time_limit: The number of seconds per search
+        @exploration: The exploration constant of UCB1
+        @max_playout_plies: How long a playout may get before it's a draw
+        @workers: The number of worker processes (1 searches in this process)
+        @seed: The seed of the playouts' random moves, or None
+        type iterations: int
+        type time_limit: float
+        type exploration: float
+        type max_playout_plies: int
+        type workers: int
+        type seed: int
+        """
+        if iterations == None and time_limit == None:
+            raise ValueError("an MCTS needs an iteration or a time limit")
+        self._iterations = iterations
+        self._time_limit = time_limit
+        self._exploration = exploration
+        self._max_playout_plies = max_playout_plies
+        self._workers = workers
+        self._rng = random.Random(seed)
+        self._root = None
+        self._pools = [] #A single process pool per worker (see _search_in_parallel())
+        self._stats = {}
+        self.warm_up()
+
+
+    def search(self, gamestate):
+        """
+        Searches a position and picks the root move that was visited the
+        most (the most robust choice, since the win rates of moves with few
+        visits are noisy).
+        @gamestate: The game state of a checkers match (left as it was)
+        type gamestate: Checkers
+        return: The move to play, or None if there are no moves
+        rtype: Move
+        """
+        moves = list(gamestate.legal_moves())
+        if len(moves) <= 1: #Nothing to think about
+            self._stats = {"playouts": 0, "seconds": 0.0, "playouts_per_second": None, "reused": 0}
+            return moves[0] if moves else None
+        if self._workers > 1:
+            return self._search_in_parallel(gamestate)
+
+        root = self._find_root(gamestate)
+        reused = root.visits
+        start = time.perf_counter()
+        deadline = start + self._time_limit if self._time_limit != None else None
+        playouts = 0
+        while ((self._iterations == None or playouts < self._iterations)
+               and (deadline == None or time.perf_counter() < deadline)):
+            self._iterate(gamestate, root)
+            playouts += 1
+        seconds = time.perf_counter() - start
+        self._root = root
+        self._stats = {"playouts": playouts, "seconds": round(seconds, 6),
+                       "playouts_per_second": int(playouts / seconds) if seconds > 0 else None,
+                       "reused": reused}
+        return max(root.children, key=lambda child: child.visits).move
+
+
+    def get_stats(self):
+        """
+        Returns the statistics of the last search.
+        return: A dict with the number of playouts, the time taken, the
+                playouts per second (with more than one worker, the sum of
+                the rates the workers timed themselves, which leaves out
+                handing them the position and collecting the results) and
+                how many visits of the tree were reused from the search
+                before
+        rtype: dict
+        """
+        return self._stats
+
+
+    def root_visits(self):
+        """
+        Returns how often each root move was visited in the last search
+        (by this process).
+        return: A list of (Move, visits, wins) tuples
+        rtype: list
+        """
+        if self._root == None:
+            return []
+        return [(child.move, child.visits, child.wins) for child in self._root.children]
+
+
+    def warm_up(self):
+        """
+        Starts the worker processes (with more than one worker) and has
+        each of them make the MCTS it searches with, and waits for them.
+        Starting a process takes a good fraction of a second, which would
+        otherwise come out of the first search's time. __init__ calls
+        this, so it only needs calling again after close().
+        return: None
+        rtype: None
+        """
+        if self._workers <= 1 or self._pools:
+            return
+        self._pools = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for i in range(self._workers)]
+        for future in [pool.submit(_warm_up_task, self._options()) for pool in self._pools]:
+            future.result()
+
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any were started.
+        return: None
+        rtype: None
+        """
+        for pool in self._pools:
+            pool.shutdown()
+        self._pools = []
+
+
+    def _find_root(self, gamestate):
+        """
+        Returns the node of the tree for a position: the old root, one of
+        its children or grandchildren (after the CPU's move and the reply),
+        or else a new tree. The rest of the old tree is let go.
+        @gamestate: The game state of a checkers match
+        type gamestate: Checkers
+        return: The root _Node
+        rtype: _Node
+        """
+        key = gamestate.hash_key()
+        if self._root != None:
+            for node in [self._root] + self._root.children:
+                if node.key == key:
+                    return node
+                for child in node.children:
+                    if child.key == key:
+                        return child
+        return _Node(None, None, key)
+
+
+    def _iterate(self, gamestate, root):
+        """
+        Does one iteration of the search: walks down the tree by UCB1,
+        adds a child for an untried move, plays a random game out from
+        there and counts the result in every node on the way.
+        @gamestate: The game state of a checkers match (put back afterwards)
+        @root: The root _Node (for the gamestate's position)
+        type gamestate: Checkers
+        type root: _Node
+        return: None
+        rtype: None
+        """
+        node, path, pushed = root, [root], 0
+        try:
+            while True:
+                if gamestate.get_winner() != None:
+                    break
+                if node.untried == None:
+                    node.untried = list(gamestate.legal_moves())
+                    self._rng.shuffle(node.untried)
+                if node.untried:
+                    move = node.untried.pop()
+                    mover = gamestate.get_turn()
+                    gamestate.push(move)
+                    pushed += 1
+                    child = _Node(move, mover, gamestate.hash_key())
+                    node.children.append(child)
+                    node, path = child, path + [child]
+                    break
+                node = self._select(node)
+                gamestate.push(node.move)
+                pushed += 1
+                path.append(node)
+            winner = gamestate.get_winner()
+            if winner == None:
+                winner = playout(*gamestate.snapshot(), rng=self._rng, max_plies=self._max_playout_plies)
+        finally:
+            for i in range(pushed):
+                gamestate.pop()
+        for node in path:
+            node.visits += 1
+            if winner == None:
+                node.wins += 0.5
+            elif winner == node.mover:
+                node.wins += 1
+
+
+    def _select(self, node):
+        """
+        Picks the child to walk down to by UCB1: its win rate (for the
+        player who moves into it) plus a bonus that grows the less it has
+        been visited compared to its siblings.
+        @node: A fully expanded _Node
+        type node: _Node
+        return: The child _Node
+        rtype: _Node
+        """
+        log_visits = math.log(node.visits)
+        exploration = self._exploration
+        return max(node.children, key=lambda child: child.wins / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+
+    def _search_in_parallel(self, gamestate):
+        """
+        Searches a position with a tree per worker process and adds up the
+        visit counts of the root moves.
+        @gamestate: The game state of a checkers match
+        type gamestate: Checkers
+        return: The most visited move
+        rtype: Move
+        """
+        self.warm_up() #In case the pools were closed
+        start = time.perf_counter()
+        futures = [pool.submit(_search_task, (gamestate.snapshot(), self._options(), self._rng.getrandbits(64)))
+                   for pool in self._pools]
+        visits, playouts, rate, reused = {}, 0, 0, 0
+        for (move_visits, stats) in (future.result() for future in futures):
+            for (code, count) in move_visits:
+                visits[code] = visits.get(code, 0) + count
+            playouts += stats["playouts"]
+            rate += stats["playouts_per_second"] or 0 #Timed by the worker itself, without the hand-offs
+            reused += stats["reused"]
+        seconds = time.perf_counter() - start
+        self._stats = {"playouts": playouts, "seconds": round(seconds, 6), "playouts_per_second": rate,
+                       "reused": reused}
+        return checkers.Move.decode(max(visits, key=visits.get))
+
+
+    def _options(self):
+        """
+        Returns the options that a worker process makes its own MCTS with
+        (see _worker_search()).
+        return: A 4-tuple: (iterations, time limit, exploration, max
+                playout plies)
+        rtype: tuple
+        """
+        return (self._iterations, self._time_limit, self._exploration, self._max_playout_plies)
+
+
+
+
+def playout(black, red, kings, turn, rng=random, max_plies=_MAX_PLAYOUT_PLIES):
+    """
+    Plays a game out with random moves from a position given as bitboards.
+    @black: The mask of the black pieces
+    @red: The mask of the red pieces
+    @kings: The mask of all kings
+    @turn: The side to move ("B" or "R")
+    @rng: The random number generator to pick the moves with
+    @max_plies: How many moves may be played before the game is called a draw
+    type black: int
+    type red: int
+    type kings: int
+    type turn: str
+    type rng: Random
+    type max_plies: int
+    return: The winner ("B" or "R"), or None for a draw
+    rtype: str
+    """
+    (own, opp) = (black, red) if turn == "B" else (red, black)
+    other = "R" if turn == "B" else "B"
+    for ply in range(max_plies):
+        positions = bitboard.successors(own, opp, kings, turn)
+        if not positions: #The player to move is stuck (or has no pieces left), so they lose
+            return other
+        (own, opp, kings) = positions[rng.randrange(len(positions))]
+        (own, opp, turn, other) = (opp, own, other, turn)
+    return None
+
+
+def _worker_search(options):
+    """
+    Returns the MCTS that this worker process searches with for some
+    options, making it the first time.
+    @options: The options, as a tuple (see MCTS._options())
+    type options: tuple
+    return: The worker's MCTS
+    rtype: MCTS
+    """
+    if options not in _worker_searches:
+        _worker_searches[options] = MCTS(*options)
+    return _worker_searches[options]
+
+
+def _warm_up_task(options):
+    """
+    Makes this worker process's MCTS ahead of its first search (see
+    MCTS.warm_up()).
+    @options: The options, as a tuple (see MCTS._options())
+    type options: tuple
+    return: None
+    rtype: None
+    """
+    _worker_search(options)
+
+
+def _search_task(task):
+    """
+    Searches a position in a worker process, with the worker's own MCTS
+    (so that its tree can be reused the next time round). Each worker
+    process only ever gets one task per move.
+    @task: A 3-tuple: (position snapshot, (iterations, time limit,
+           exploration, max playout plies), seed)
+    type task: tuple
+    return: A 2-tuple: a list of (encoded move, visits) pairs for the
+            root moves, and the search's statistics
+    rtype: tuple
+    """
+    (snapshot, options, seed) = task
+    search = _worker_search(options)
+    search._rng.seed(seed)
+    search.search(checkers.from_snapshot(snapshot))
+    return ([(move.encode(), visits) for (move, visits, wins) in search.root_visits()], search.get_stats())
+
+
+
+
+def main(argv=None):
+    """
+    The command line entry point: searches a position and reports the
+    playouts per second.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Search a position with the MCTS AI.")
+    parser.add_argument("--fen", default=perft.START_FEN, help="the PDN FEN position to search")
+    parser.add_argument("-n", "--iterations", type=int, default=None, help="the playouts per search (per worker)")
+    parser.add_argument("-t", "--time", type=float, default=1.0, help="the seconds per search")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="the number of worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the random playouts")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    search = MCTS(args.iterations, args.time if args.iterations == None else None,
+                  workers=args.workers, seed=args.seed)
+    if args.workers > 1:
+        print("started {} worker processes in {:.3f}s".format(args.workers, time.perf_counter() - start))
+    try:
+        move = search.search(checkers.from_fen(args.fen))
+    finally:
+        search.close()
+    stats = search.get_stats()
+    print("best {}: {} playouts in {:.3f}s ({} playouts/s)".format(
+        move.notation() if move != None else None, stats["playouts"], stats["seconds"],
+        stats["playouts_per_second"]))
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
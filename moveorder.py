@@ -0,0 +1,136 @@
+#Contains the move ordering heuristics used by the checkers AI search.
+#Alpha-beta only prunes once it has seen a good enough move, so the sooner the best move
+#is tried the less of the tree gets searched. The moves at a node are tried in this order:
+#the move the transposition table remembers as best, captures (the more pieces taken the
+#better), the two "killer" moves that last caused a cutoff at the same ply, and then the
+#rest by how often the same from-to move caused cutoffs before (the history table).
+#The moves are generated in those stages too, as the search asks for them, so a node that
+#cuts off on the hash move or a killer never generates (or sorts) the rest.
+
+import bitboard
+
+_MAX_PLY = 128 #The deepest ply that killer moves are kept for
+
+
+
+
+class MoveOrderer:
+    """ Orders the moves tried by a search, and learns from the cutoffs it makes. """
+
+    def __init__(self, use_hash_move=True, use_captures=True, use_killers=True, use_history=True):
+        """
+        Initializes a MoveOrderer. Each of the heuristics can be turned
+        off, e.g. to measure how much it's worth.
+        @use_hash_move: Whether the transposition table's move goes first
+        @use_captures: Whether captures are ordered by the pieces they take
+        @use_killers: Whether killer moves go before the other quiet moves
+        @use_history: Whether the history table orders the rest
+        type use_hash_move: bool
+        type use_captures: bool
+        type use_killers: bool
+        type use_history: bool
+        """
+        self._use_hash_move = use_hash_move
+        self._use_captures = use_captures
+        self._use_killers = use_killers
+        self._use_history = use_history
+        self._killers = [[None, None] for ply in range(_MAX_PLY)]
+        self._history = [0] * (bitboard.NUM_SQUARES * bitboard.NUM_SQUARES)
+
+
+    def new_search(self):
+        """
+        Gets ready for a new search. The killer moves belong to the
+        position that was searched, so they're forgotten, but the history
+        table carries over (halved, so that newer cutoffs count for more).
+        return: None
+        rtype: None
+        """
+        self._killers = [[None, None] for ply in range(_MAX_PLY)]
+        self._history = [score // 2 for score in self._history]
+
+
+    def order(self, gamestate, ply, hash_move=None):
+        """
+        Yields a node's legal moves, best first. Like
+        Checkers.legal_moves(), the moves are generated in stages as
+        they're asked for: the hash move and the killer moves are only
+        checked for legality (see Checkers.is_legal_move()), and the
+        captures or quiet moves are generated and sorted when the search
+        gets to them.
+        @gamestate: The game state of the node (the moves are tried on it
+                    and taken back in between, as the searches do)
+        @ply: How many moves the node is below the root
+        @hash_move: The best move stored for the node in the transposition
+                    table, or None
+        type gamestate: Checkers
+        type ply: int
+        type hash_move: Move
+        return: A generator of the legal Moves, in the order they should
+                be tried
+        rtype: generator
+        """
+        if gamestate.get_winner() != None:
+            return
+        history = self._history if self._use_history else None
+        tried = []
+        if self._use_hash_move and hash_move != None and gamestate.is_legal_move(hash_move):
+            tried.append(hash_move)
+            yield hash_move
+
+        if gamestate.has_captures():
+            captures = [move for move in gamestate.capture_sequences() if move not in tried]
+            captures.sort(key=lambda move: (len(move.path) if self._use_captures else 0,
+                                            history[_history_index(move)] if history != None else 0),
+                          reverse=True)
+            yield from captures
+            return
+
+        if self._use_killers and ply < _MAX_PLY:
+            for killer in tuple(self._killers[ply]): #A copy, since the searches below can add killers
+                if killer != None and killer not in tried and gamestate.is_legal_move(killer):
+                    tried.append(killer)
+                    yield killer
+        quiet = [move for move in gamestate.quiet_moves() if move not in tried]
+        if history != None:
+            quiet.sort(key=lambda move: history[_history_index(move)], reverse=True)
+        yield from quiet
+
+
+    def record_cutoff(self, move, ply, depth):
+        """
+        Learns from a move that caused a cutoff: it becomes a killer move
+        at its ply (if it isn't a capture, since captures are ordered
+        first anyway) and its history score goes up, by more the deeper
+        the subtree it cut off.
+        @move: The move that caused the cutoff
+        @ply: How many moves the node is below the root
+        @depth: How deep the node was being searched
+        type move: Move
+        type ply: int
+        type depth: int
+        return: None
+        rtype: None
+        """
+        if move.move_type != "jump" and ply < _MAX_PLY:
+            killers = self._killers[ply]
+            if move != killers[0]:
+                killers[1] = killers[0]
+                killers[0] = move
+        self._history[_history_index(move)] += depth*depth
+
+
+
+
+def _history_index(move):
+    """
+    Returns where a move's from and to squares (the to square being
+    the last one landed on) go in the history table.
+    @move: A Move
+    type move: Move
+    return: The index into the history table
+    rtype: int
+    """
+    to_cell = move.path[-1] if move.path else (move.it_row, move.it_col)
+    return (bitboard.cell_to_sq(move.ip_row, move.ip_col) * bitboard.NUM_SQUARES
+            + bitboard.cell_to_sq(to_cell[0], to_cell[1]))
@@ -0,0 +1,588 @@
+#Contains a small learned evaluation network for the checkers AI, in the style of NNUE
+#("efficiently updatable neural network") chess evaluations.
+#The first layer has an input for every kind of piece (own man, own king, other man, other
+#king) on every square, seen from each player's side of the board, and a lot of them. But
+#only a couple of inputs change with each move, so instead of working the layer out for
+#every position, an Accumulator keeps its sums (for both sides) and just adds or takes
+#away the first layer weights of a piece that's put on or taken off a square. Checkers
+#tells an attached Accumulator about every such change as moves are made and taken back
+#(see Checkers.set_accumulator()), like it does for its piece-square sums. The sums are
+#int16s; the rest of the network (the sums of the side to move and of the other side,
+#clipped, then two small float32 layers) is only worked out when a position is scored.
+#On arrays this small the cost is mostly in how many NumPy calls it takes, not in the
+#arithmetic, so scoring goes through buffers set aside up front and weights already
+#arranged for the side to move, and it never works the sums out from scratch: the search
+#attaches an Accumulator when it starts (see attach() and checkersai.nnue_eval).
+#The weights come from a compact file that train() writes. Training fits the network to
+#batcheval's scores of positions from random games (so it learns a cheap stand-in for a
+#richer evaluation; a proper training set would need scored games, which we don't have).
+#Scores are whole numbers in hundredths of a man, like pst_eval's.
+#NumPy isn't needed by anything else in the game, only by this module (and batcheval).
+#Run it with e.g.:  python nnue.py --train
+#              then:  python nnue.py
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+
+import numpy
+
+import batcheval
+import bitboard
+import checkers
+import checkersai
+import perft
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nnue.bin")
+NUM_INPUTS = 4 * bitboard.NUM_SQUARES #Own men, own kings, other men, other kings
+HIDDEN_SIZE = 32 #The size of the accumulator (per side)
+SECOND_SIZE = 16 #The size of the layer after it
+
+_MAGIC = b"CKNN"
+_HEADER = struct.Struct("<4sII") #The magic number and the two layer sizes
+_ONE = 255 #What 1.0 is in the accumulator's int16s (sums are clipped to 0..1 before the next layer)
+_TARGET_SCALE = 100.0 #Training works in men rather than hundredths of a man
+_BIT_INDICES = numpy.arange(bitboard.NUM_SQUARES, dtype=numpy.uint32)
+_default_network = None #The network in DEFAULT_PATH, once it's been loaded (see get_default_network())
+
+
+
+
+class NNUEError(Exception):
+    """ An error that represents a missing or broken network file, or a network scoring a gamestate without its accumulator. """
+    pass
+
+
+
+
+class Network:
+    """ The weights of an evaluation network. """
+
+    def __init__(self, input_weights, input_biases, hidden_weights, hidden_biases, output_weights, output_bias):
+        """
+        Initializes a Network.
+        @input_weights: The int16 first layer weights, (NUM_INPUTS, hidden size)
+        @input_biases: The int16 first layer biases
+        @hidden_weights: The float32 second layer weights, (2*hidden size, second size)
+        @hidden_biases: The float32 second layer biases
+        @output_weights: The float32 output weights (one per second layer unit)
+        @output_bias: The output bias
+        type input_weights: ndarray
+        type input_biases: ndarray
+        type hidden_weights: ndarray
+        type hidden_biases: ndarray
+        type output_weights: ndarray
+        type output_bias: float
+        """
+        self._input_weights = numpy.asarray(input_weights, dtype=numpy.int16)
+        self._input_biases = numpy.asarray(input_biases, dtype=numpy.int16)
+        self._hidden_weights = numpy.asarray(hidden_weights, dtype=numpy.float32)
+        self._hidden_biases = numpy.asarray(hidden_biases, dtype=numpy.float32)
+        self._output_weights = numpy.asarray(output_weights, dtype=numpy.float32)
+        self._output_bias = numpy.float32(output_bias)
+        self._output_offset = float(self._output_bias)
+        #The second layer weights for each side to move, so that the accumulator's sums (black's
+        #first) go in as they are, scaled so that the clipped sums don't need dividing by _ONE,
+        #and with the biases as a last row (an Accumulator's inputs end in a 1 to go with it):
+        hidden = self.get_hidden_size()
+        scaled = self._hidden_weights * numpy.float32(1.0 / _ONE)
+        self._turn_weights = {"B": numpy.vstack([scaled, self._hidden_biases]),
+                              "R": numpy.vstack([scaled[hidden:], scaled[:hidden], self._hidden_biases])}
+        #The first layer weights of each kind of piece on each square, for both sides at once
+        #(black's side first, then red's), so that an update is a single addition. Each square's
+        #row is an array of its own, which is quicker to get at than a slice of a bigger one:
+        self._deltas = {}
+        for color in ("B", "R"):
+            for is_king in (False, True):
+                self._deltas[(color, is_king)] = [
+                    numpy.concatenate([self._input_weights[_input(side, color, is_king, sq)] for side in ("B", "R")])
+                    for sq in range(bitboard.NUM_SQUARES)]
+        #And what moving one from a square to another adds, so that a move is a single addition
+        #too (int16s wrap around, so this comes out the same as adding one row and taking the other):
+        self._moves = {}
+        for (kind, deltas) in self._deltas.items():
+            self._moves[kind] = [[deltas[to_sq] - deltas[from_sq] for to_sq in range(bitboard.NUM_SQUARES)]
+                                 for from_sq in range(bitboard.NUM_SQUARES)]
+
+
+    def get_hidden_size(self):
+        """
+        Returns the size of the accumulator (per side).
+        return: The number of first layer units
+        rtype: int
+        """
+        return len(self._input_biases)
+
+
+    def score(self, accumulator, turn):
+        """
+        Works out the rest of the network from an accumulator.
+        @accumulator: An Accumulator that's up to date with the position
+        @turn: The side to move ("B" or "R")
+        type accumulator: Accumulator
+        type turn: str
+        return: The score for the side to move, in hundredths of a man
+        rtype: int
+        """
+        clipped = accumulator._clipped
+        #(minimum and maximum rather than clip, which costs more than the rest put together on arrays this small)
+        numpy.maximum(accumulator._values, 0, out=clipped)
+        numpy.minimum(clipped, _ONE, out=clipped)
+        hidden = accumulator._inputs.dot(self._turn_weights[turn])
+        numpy.maximum(hidden, 0, out=hidden)
+        return round(float(hidden.dot(self._output_weights)) + self._output_offset)
+
+
+    def evaluate(self, gamestate, cpu_color):
+        """
+        An evaluation function with the same form as minimax_eval. It
+        reads the accumulator of this network that's attached to the
+        gamestate (see attach()).
+        @gamestate: A Checkers game state to evaluate
+        @cpu_color: The color of the CPU ("B" or "R")
+        type gamestate: Checkers
+        type cpu_color: str
+        return: A score for the given gamestate, in hundredths of a man
+        rtype: int
+        """
+        accumulator = gamestate.get_accumulator()
+        if accumulator == None or accumulator._network is not self:
+            #Working the sums out from scratch would take longer than the whole search node
+            raise NNUEError("the gamestate has no accumulator of this network attached (see nnue.attach())")
+        turn = gamestate.get_turn()
+        score = self.score(accumulator, turn)
+        return score if turn == cpu_color else -score
+
+
+    def save(self, path=DEFAULT_PATH):
+        """
+        Writes the network to a file.
+        @path: The file to write
+        type path: str
+        return: None
+        rtype: None
+        """
+        with open(path + ".tmp", "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.get_hidden_size(), len(self._hidden_biases)))
+            for array in (self._input_weights, self._input_biases, self._hidden_weights,
+                          self._hidden_biases, self._output_weights, numpy.array([self._output_bias])):
+                f.write(numpy.ascontiguousarray(array).astype(array.dtype.newbyteorder("<")).tobytes())
+        os.replace(path + ".tmp", path)
+
+
+    def _delta(self, piece, sq):
+        """
+        Returns the first layer weights of a piece on a square, for both
+        sides.
+        @piece: A checkers Piece
+        @sq: The square it's on
+        type piece: Piece
+        type sq: int
+        return: A (2 * hidden size) int16 array: black's side, then red's
+        rtype: ndarray
+        """
+        return self._deltas[(piece.get_color(), piece.piece_is_king())][sq]
+
+
+
+
+class Accumulator:
+    """ The first layer sums of a network for a position, kept up to date as pieces move. """
+
+    def __init__(self, network):
+        """
+        Initializes an Accumulator (for an empty board until it's
+        refreshed).
+        @network: The Network whose first layer it adds up
+        type network: Network
+        """
+        self._network = network
+        self._values = numpy.tile(network._input_biases, 2) #Black's side, then red's
+        #Where Network.score() clips them, followed by a 1 for the second layer biases:
+        self._inputs = numpy.ones(len(self._values) + 1, dtype=numpy.float32)
+        self._clipped = self._inputs[:-1]
+
+
+    def get_network(self):
+        """
+        Returns the network the accumulator belongs to.
+        return: The Network
+        rtype: Network
+        """
+        return self._network
+
+
+    def get_values(self):
+        """
+        Returns the sums: black's side in row 0 and red's in row 1.
+        return: A (2, hidden size) int16 array
+        rtype: ndarray
+        """
+        return self._values.reshape(2, -1)
+
+
+    def refresh(self, black, red, kings):
+        """
+        Works the sums out from scratch for a position.
+        @black: The mask of the black pieces
+        @red: The mask of the red pieces
+        @kings: The mask of all kings
+        type black: int
+        type red: int
+        type kings: int
+        return: None
+        rtype: None
+        """
+        values = self._values
+        values[:] = numpy.tile(self._network._input_biases, 2)
+        for (color, pieces) in (("B", black), ("R", red)):
+            for sq in bitboard.iter_bits(pieces):
+                values += self._network._deltas[(color, bool(kings >> sq & 1))][sq]
+
+
+    def update(self, piece, sq, sign):
+        """
+        Puts a piece on a square, or takes it off.
+        @piece: The Piece
+        @sq: The square
+        @sign: 1 to put it on, -1 to take it off
+        type piece: Piece
+        type sq: int
+        type sign: int
+        return: None
+        rtype: None
+        """
+        if sign > 0:
+            self._values += self._network._delta(piece, sq)
+        else:
+            self._values -= self._network._delta(piece, sq)
+
+
+    def move(self, piece, from_sq, to_sq):
+        """
+        Moves a piece from one square to another.
+        @piece: The Piece
+        @from_sq: The square it was on
+        @to_sq: The square it's on now
+        type piece: Piece
+        type from_sq: int
+        type to_sq: int
+        return: None
+        rtype: None
+        """
+        self._values += self._network._moves[(piece.get_color(), piece.piece_is_king())][from_sq][to_sq]
+
+
+
+
+def load(path=DEFAULT_PATH):
+    """
+    Reads a network from a file that Network.save() wrote.
+    @path: The file to read
+    type path: str
+    return: The Network
+    rtype: Network
+    """
+    if not os.path.exists(path):
+        raise NNUEError("no network at {} (train one with --train)".format(path))
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise NNUEError("{} is not a network".format(path))
+    (magic, hidden, second) = _HEADER.unpack_from(data)
+    shapes = [((NUM_INPUTS, hidden), "<i2"), ((hidden,), "<i2"), ((2*hidden, second), "<f4"),
+              ((second,), "<f4"), ((second,), "<f4"), ((1,), "<f4")]
+    if magic != _MAGIC or len(data) != _HEADER.size + sum(numpy.prod(shape) * numpy.dtype(dtype).itemsize
+                                                          for (shape, dtype) in shapes):
+        raise NNUEError("{} is not a network".format(path))
+    arrays, offset = [], _HEADER.size
+    for (shape, dtype) in shapes:
+        count = int(numpy.prod(shape))
+        arrays.append(numpy.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape))
+        offset += count * numpy.dtype(dtype).itemsize
+    return Network(*arrays[:5], arrays[5][0])
+
+
+def get_default_network():
+    """
+    Returns the network in DEFAULT_PATH, loading it the first time
+    (once per process).
+    return: The Network
+    rtype: Network
+    """
+    global _default_network
+    if _default_network == None:
+        _default_network = load(DEFAULT_PATH)
+    return _default_network
+
+
+def attach(gamestate, network=None):
+    """
+    Attaches an accumulator of a network to a gamestate, brought up to
+    date with its position, unless one is attached already. From then
+    on it follows every move made and taken back, so Network.evaluate()
+    can score the gamestate at any node of a search.
+    @gamestate: A Checkers game state
+    @network: The Network, or None for the default one (see
+              get_default_network())
+    type gamestate: Checkers
+    type network: Network
+    return: The attached Accumulator
+    rtype: Accumulator
+    """
+    if network == None:
+        network = get_default_network()
+    accumulator = gamestate.get_accumulator()
+    if accumulator == None or accumulator.get_network() is not network:
+        accumulator = Accumulator(network)
+        gamestate.set_accumulator(accumulator)
+    return accumulator
+
+
+def train(num_positions=50000, epochs=30, hidden=HIDDEN_SIZE, second=SECOND_SIZE, seed=None, verbose=False):
+    """
+    Trains a network to score positions from random games the way
+    batcheval does, with plain minibatch gradient descent (Adam) in
+    float32, and then rounds the first layer to int16s.
+    @num_positions: The number of positions to train on
+    @epochs: How many times to go over them
+    @hidden: The size of the accumulator (per side)
+    @second: The size of the layer after it
+    @seed: The seed of the random games and the starting weights, or None
+    @verbose: Indicates if the progress should be reported on the console
+    type num_positions: int
+    type epochs: int
+    type hidden: int
+    type second: int
+    type seed: int
+    type verbose: bool
+    return: The trained Network
+    rtype: Network
+    """
+    rng = numpy.random.default_rng(seed)
+    snapshots = random_positions(num_positions, random.Random(seed))
+    positions = batcheval.encode(snapshots)
+    targets = batcheval.evaluate(positions).astype(numpy.float32) / _TARGET_SCALE
+    (own, other) = _features(positions)
+
+    weights = [rng.normal(0, 0.05, (NUM_INPUTS, hidden)), numpy.full(hidden, 0.5),
+               rng.normal(0, 1 / numpy.sqrt(2*hidden), (2*hidden, second)), numpy.zeros(second),
+               rng.normal(0, 1 / numpy.sqrt(second), second), numpy.zeros(1)]
+    weights = [w.astype(numpy.float32) for w in weights]
+    (moments, squares) = ([numpy.zeros_like(w) for w in weights], [numpy.zeros_like(w) for w in weights])
+    (rate, beta1, beta2, steps) = (0.003, 0.9, 0.999, 0)
+    for epoch in range(epochs):
+        order = rng.permutation(len(targets))
+        total = 0.0
+        for start in range(0, len(order), 256):
+            batch = order[start:start+256]
+            (loss, grads) = _gradients(weights, own[batch].astype(numpy.float32),
+                                       other[batch].astype(numpy.float32), targets[batch])
+            total += loss * len(batch)
+            steps += 1
+            for (w, g, m, v) in zip(weights, grads, moments, squares):
+                m *= beta1
+                m += (1 - beta1) * g
+                v *= beta2
+                v += (1 - beta2) * g * g
+                w -= rate * (m / (1 - beta1**steps)) / (numpy.sqrt(v / (1 - beta2**steps)) + 1e-8)
+        if verbose:
+            print("epoch {}: mean squared error {:.4f} (in men)".format(epoch + 1, total / len(targets)))
+
+    (w1, b1, w2, b2, w3, b3) = weights
+    return Network(numpy.clip(numpy.round(w1 * _ONE), -32768, 32767), numpy.clip(numpy.round(b1 * _ONE), -32768, 32767),
+                   w2, b2, w3 * _TARGET_SCALE, b3[0] * _TARGET_SCALE)
+
+
+def random_positions(num_positions, rng=random):
+    """
+    Plays random games (on bare bitboards, see mcts.playout()) and
+    collects their positions.
+    @num_positions: The number of positions to collect
+    @rng: The random number generator to pick the moves with
+    type num_positions: int
+    type rng: Random
+    return: A list of position snapshots (see Checkers.snapshot())
+    rtype: list
+    """
+    snapshots = []
+    while len(snapshots) < num_positions:
+        (black, red, kings, turn) = checkers.from_fen(perft.START_FEN).snapshot()
+        while len(snapshots) < num_positions:
+            snapshots.append((black, red, kings, turn))
+            (own, opp) = (black, red) if turn == "B" else (red, black)
+            successors = bitboard.successors(own, opp, kings, turn)
+            if not successors:
+                break
+            (own, opp, kings) = successors[rng.randrange(len(successors))]
+            (black, red) = (own, opp) if turn == "B" else (opp, own)
+            turn = "R" if turn == "B" else "B"
+    return snapshots
+
+
+def _input(side, color, is_king, sq):
+    """
+    Returns the first layer input of a piece on a square, as seen from
+    one player's side of the board (red sees it turned around).
+    @side: The player whose side it's seen from ("B" or "R")
+    @color: The piece's color
+    @is_king: Indicates if the piece is a king
+    @sq: The square it's on
+    type side: str
+    type color: str
+    type is_king: bool
+    type sq: int
+    return: The input's index
+    rtype: int
+    """
+    kind = (0 if color == side else 2) + (1 if is_king else 0)
+    return kind*bitboard.NUM_SQUARES + (sq if side == "B" else bitboard.NUM_SQUARES-1 - sq)
+
+
+def _features(positions):
+    """
+    Works out the first layer inputs of an array of positions (see
+    batcheval.encode()), from the side to move's side of the board and
+    from the other side's.
+    @positions: A uint32 array of positions, a row each
+    type positions: ndarray
+    return: A 2-tuple of (positions, NUM_INPUTS) uint8 arrays of 0s and 1s
+    rtype: tuple
+    """
+    def squares(masks):
+        return ((masks[:, None] >> _BIT_INDICES[None, :]) & 1).astype(numpy.uint8)
+    (black, red, kings) = (squares(positions[:, 0]), squares(positions[:, 1]), squares(positions[:, 2]))
+    seen_by_black = numpy.concatenate([black & ~kings, black & kings, red & ~kings, red & kings], axis=1)
+    #Red sees the board turned around, so every block of squares goes in reverse:
+    seen_by_red = numpy.concatenate([(red & ~kings)[:, ::-1], (red & kings)[:, ::-1],
+                                     (black & ~kings)[:, ::-1], (black & kings)[:, ::-1]], axis=1)
+    black_to_move = (positions[:, 3] == batcheval.BLACK_TURN)[:, None]
+    return (numpy.where(black_to_move, seen_by_black, seen_by_red),
+            numpy.where(black_to_move, seen_by_red, seen_by_black))
+
+
+def _gradients(weights, own, other, targets):
+    """
+    Runs the network forwards and backwards over a batch.
+    @weights: The float32 weights: [w1, b1, w2, b2, w3, b3]
+    @own: The inputs from the side to move's side, a row per position
+    @other: The inputs from the other side's side
+    @targets: The scores to learn, in men
+    type weights: list
+    type own: ndarray
+    type other: ndarray
+    type targets: ndarray
+    return: A 2-tuple: the mean squared error and the gradient of each weight
+    rtype: tuple
+    """
+    (w1, b1, w2, b2, w3, b3) = weights
+    (own_sums, other_sums) = (own @ w1 + b1, other @ w1 + b1)
+    inputs = numpy.concatenate([numpy.clip(own_sums, 0, 1), numpy.clip(other_sums, 0, 1)], axis=1)
+    hidden_sums = inputs @ w2 + b2
+    hidden = numpy.maximum(hidden_sums, 0)
+    errors = hidden @ w3 + b3[0] - targets
+
+    d_out = 2 * errors / len(targets)
+    d_hidden = numpy.outer(d_out, w3) * (hidden_sums > 0)
+    d_inputs = d_hidden @ w2.T
+    size = w1.shape[1]
+    d_own = d_inputs[:, :size] * ((own_sums > 0) & (own_sums < 1))
+    d_other = d_inputs[:, size:] * ((other_sums > 0) & (other_sums < 1))
+    grads = [own.T @ d_own + other.T @ d_other, d_own.sum(axis=0) + d_other.sum(axis=0),
+             inputs.T @ d_hidden, d_hidden.sum(axis=0), hidden.T @ d_out, numpy.array([d_out.sum()])]
+    return (float((errors * errors).mean()), [g.astype(numpy.float32) for g in grads])
+
+
+
+
+def main(argv=None):
+    """
+    The command line entry point: trains a network, or times it against
+    minimax_eval.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Train or benchmark the NNUE-style evaluation network.")
+    parser.add_argument("--weights", default=DEFAULT_PATH, help="the network file")
+    parser.add_argument("--train", action="store_true", help="train a network and save it")
+    parser.add_argument("-n", "--positions", type=int, default=50000, help="the positions to train on")
+    parser.add_argument("--epochs", type=int, default=30, help="the passes over the training positions")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the random games")
+    args = parser.parse_args(argv)
+
+    if args.train:
+        network = train(args.positions, args.epochs, seed=args.seed, verbose=True)
+        network.save(args.weights)
+        print("saved {} ({} bytes)".format(args.weights, os.path.getsize(args.weights)))
+        return 0
+    if not os.path.exists(args.weights):
+        print("no network at {} (train one with --train)".format(args.weights))
+        return 1
+    network = load(args.weights)
+
+    gamestates = [checkers.from_snapshot(snapshot) for snapshot in random_positions(2000, random.Random(args.seed))]
+    for gamestate in gamestates:
+        attach(gamestate, network)
+
+    def from_scratch(gamestate, cpu_color):
+        gamestate.get_accumulator().refresh(*gamestate.get_bitboards())
+        return network.evaluate(gamestate, cpu_color)
+
+    #Scoring positions as they stand:
+    scorers = [("minimax_eval", checkersai.minimax_eval), ("pst_eval", checkersai.pst_eval),
+               ("nnue, from scratch", from_scratch), ("nnue, accumulated", network.evaluate)]
+    rates = {}
+    for (name, score) in scorers:
+        start = time.perf_counter()
+        for gamestate in gamestates:
+            score(gamestate, "B")
+        rates[name] = len(gamestates) / (time.perf_counter() - start)
+    for (name, rate) in rates.items():
+        print("{:<20} {:>9} evals/s ({:.1f}x minimax_eval)".format(name, int(rate), rate / rates["minimax_eval"]))
+
+    #Scoring the leaves of a search, where the accumulator has to follow every push() and pop():
+    for (name, attached, score) in (("minimax_eval", False, checkersai.minimax_eval),
+                                    ("pst_eval", False, checkersai.pst_eval), ("nnue", True, network.evaluate)):
+        (leaves, start) = (0, time.perf_counter())
+        for gamestate in gamestates[:200]:
+            gamestate.set_accumulator(Accumulator(network) if attached else None)
+            leaves += _score_leaves(gamestate, 2, score)
+        print("{:<20} {:>9} leaves/s in a 2 ply search".format(name, int(leaves / (time.perf_counter() - start))))
+    return 0
+
+
+def _score_leaves(gamestate, depth, score):
+    """
+    Walks every line of play a number of moves deep with push() and
+    pop(), and scores the positions at the end of them.
+    @gamestate: The game state of a checkers match (left as it was)
+    @depth: How many moves deep to go
+    @score: The evaluation function
+    type gamestate: Checkers
+    type depth: int
+    type score: function
+    return: The number of positions scored
+    rtype: int
+    """
+    if depth == 0 or gamestate.get_winner() != None:
+        score(gamestate, "B")
+        return 1
+    leaves = 0
+    for move in gamestate.legal_moves():
+        gamestate.push(move)
+        try:
+            leaves += _score_leaves(gamestate, depth-1, score)
+        finally:
+            gamestate.pop()
+    return leaves
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#Contains the opening book for the checkers AI.
+#The book maps positions (by their Zobrist key, see Checkers.hash_key()) to the moves that
+#were played from them in a collection of games, each with a weight: 2 for every game the
+#player who made the move went on to win, 1 for every draw (or unknown result) and 0 for
+#every loss, like Polyglot's chess books. Moves that only ever lost are left out.
+#The book file is a short header followed by three arrays with one entry per (position,
+#move) record, sorted by key: the keys, the encoded moves (see Move.encode()) and the
+#weights. It's opened with mmap and the key array is binary searched in place, so opening
+#the book costs nothing and a probe only touches the few pages it looks at.
+#The games come from PDN files, e.g. well-known game collections or the output of
+#--self-play, which plays the Mini Max AI against itself and saves the games as PDN.
+#Run it with e.g.:  python openingbook.py games.pdn --plies 20
+#              or:  python openingbook.py --self-play 50 --save-pdn selfplay.pdn
+#              or:  python openingbook.py --probe "B:W21,22,23,24,25,26,27,28,29,30,31,32:B1,2,3,4,5,6,7,8,9,10,11,12"
+
+import argparse
+import bisect
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+
+import checkers
+import checkersai
+import perft
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openingbook.bin")
+MAX_PLIES = 20 #How many moves into each game go into the book
+
+_MAGIC = b"CKOB"
+_HEADER = struct.Struct("<4sI") #The magic number and the number of records
+_RECORD_BYTES = 8 + 8 + 4 #key, move, weight
+_DRAW_PLIES = 200 #A self-play game this long is called a draw
+_RESULTS = {"1-0": "B", "0-1": "R", "1/2-1/2": None, "*": None} #PDN results (black is named first)
+
+
+
+
+class OpeningBookError(Exception):
+    """ An error that represents a broken opening book file. """
+    pass
+
+
+
+
+class OpeningBook:
+    """ Looks positions up in an opening book file. """
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Initializes an OpeningBook. The file is only mapped into memory,
+        not read. A missing file is fine too: the book is then empty.
+        @path: The book file that build() wrote
+        type path: str
+        """
+        self._map = None
+        self._keys = self._moves = self._weights = memoryview(b"").cast("Q")
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, count) = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or len(self._map) != _HEADER.size + _RECORD_BYTES*count:
+            self._map.close()
+            raise OpeningBookError("{} is not an opening book".format(path))
+        view = memoryview(self._map)
+        start = _HEADER.size
+        self._keys = view[start:start + 8*count].cast("Q")
+        self._moves = view[start + 8*count:start + 16*count].cast("Q")
+        self._weights = view[start + 16*count:start + 20*count].cast("I")
+
+
+    def get_size(self):
+        """
+        Returns the number of (position, move) records in the book.
+        return: The number of records
+        rtype: int
+        """
+        return len(self._keys)
+
+
+    def probe(self, gamestate):
+        """
+        Looks up the moves the book has for a position.
+        @gamestate: A Checkers gamestate
+        type gamestate: Checkers
+        return: A list of (Move, weight) tuples, heaviest first (empty
+                if the position isn't in the book)
+        rtype: list
+        """
+        entries = [(checkers.Move.decode(self._moves[i]), self._weights[i])
+                   for i in range(*self._find(gamestate))]
+        entries.sort(key=lambda entry: entry[1], reverse=True)
+        return entries
+
+
+    def choose(self, gamestate, rng=random):
+        """
+        Picks a book move for a position at random, in proportion to the
+        moves' weights (so that the CPU doesn't play the same game every
+        time). Moves that aren't legal in the position (which could only
+        happen if two positions' keys collided) are never picked.
+        @gamestate: A Checkers gamestate
+        @rng: The random number generator to pick with
+        type gamestate: Checkers
+        type rng: Random
+        return: A Move, or None if the position isn't in the book
+        rtype: Move
+        """
+        (start, end) = self._find(gamestate)
+        if start == end:
+            return None
+        #The records are compared and weighed as they're stored; only the pick gets decoded:
+        legal = set(move.encode() for move in gamestate.legal_moves())
+        records = [i for i in range(start, end) if self._moves[i] in legal]
+        if records == []:
+            return None
+        i = rng.choices(records, [self._weights[i] for i in records])[0]
+        return checkers.Move.decode(self._moves[i])
+
+
+    def _find(self, gamestate):
+        """
+        Finds the records the book has for a position.
+        @gamestate: A Checkers gamestate
+        type gamestate: Checkers
+        return: A 2-tuple: the index of the position's first record and the
+                index just past its last one (the same index if it has none)
+        rtype: tuple
+        """
+        if gamestate.need_to_move_again() or gamestate.get_winner() != None:
+            return (0, 0)
+        key = gamestate.hash_key()
+        return (bisect.bisect_left(self._keys, key), bisect.bisect_right(self._keys, key))
+
+
+    def close(self):
+        """
+        Unmaps the book file. The book is empty afterwards.
+        return: None
+        rtype: None
+        """
+        for view in (self._keys, self._moves, self._weights):
+            view.release()
+        self._keys = self._moves = self._weights = memoryview(b"").cast("Q")
+        if self._map != None:
+            self._map.close()
+            self._map = None
+
+
+
+
+def read_pdn(text):
+    """
+    Splits the text of a PDN file into games. Tags, comments, variations,
+    move numbers and move annotations (like "!" or "?") are skipped.
+    @text: The contents of a PDN file
+    type text: str
+    return: A list of (FEN, moves, result) tuples, one per game: the
+            starting position from the game's FEN tag (the usual start
+            position if it doesn't have one), the moves in PDN notation
+            (e.g. "11-15" or "22x15x8") and the winner ("B" or "R", or
+            None for a draw or an unknown result)
+    rtype: list
+    """
+    games = []
+    fen, moves, result = perft.START_FEN, [], None
+    text = re.sub(r"\{[^}]*\}", " ", text) #Comments
+    while re.search(r"\([^()]*\)", text): #Variations, innermost first
+        text = re.sub(r"\([^()]*\)", " ", text)
+    for line in text.splitlines():
+        tag = re.match(r'\s*\[(\w+)\s+"([^"]*)"\]', line)
+        if tag != None:
+            if moves: #A tag after moves starts the next game
+                games.append((fen, moves, result))
+                fen, moves, result = perft.START_FEN, [], None
+            if tag.group(1) == "FEN":
+                fen = tag.group(2)
+            elif tag.group(1) == "Result":
+                result = _RESULTS.get(tag.group(2))
+            continue
+        for token in line.split():
+            if token in _RESULTS:
+                result = _RESULTS[token]
+                games.append((fen, moves, result))
+                fen, moves, result = perft.START_FEN, [], None
+            else:
+                move = re.sub(r"^\d+\.+", "", token).rstrip("!?")
+                if re.fullmatch(r"\d+([-x:]\d+)+", move):
+                    moves.append(move)
+    if moves:
+        games.append((fen, moves, result))
+    return games
+
+
+def find_move(gamestate, notation):
+    """
+    Finds the legal move that a PDN move stands for. A jump can be written
+    with every square it lands on ("22x15x8") or with just the first and
+    last squares ("22x8").
+    @gamestate: A Checkers gamestate
+    @notation: A move in PDN notation
+    type gamestate: Checkers
+    type notation: str
+    return: The Move, or None if no legal move matches
+    rtype: Move
+    """
+    squares = re.split("[-x:]", notation)
+    for move in gamestate.legal_moves():
+        move_squares = re.split("[-x]", move.notation())
+        if (move_squares == squares or (len(squares) == 2 and move_squares[0] == squares[0]
+                                        and move_squares[-1] == squares[-1])):
+            return move
+    return None
+
+
+def build(games, path=DEFAULT_PATH, max_plies=MAX_PLIES, verbose=False):
+    """
+    Builds a book file from games.
+    @games: A list of (FEN, moves, result) tuples like read_pdn()'s
+    @path: The file to write the book to
+    @max_plies: How many moves into each game go into the book
+    @verbose: Indicates if games with moves that aren't legal should be
+              reported on the console (the rest of such a game is skipped)
+    type games: list
+    type path: str
+    type max_plies: int
+    type verbose: bool
+    return: The number of records written
+    rtype: int
+    """
+    weights = {} #(key, move code) -> weight
+    for (i, (fen, moves, result)) in enumerate(games):
+        gamestate = checkers.from_fen(fen)
+        for notation in moves[:max_plies]:
+            move = find_move(gamestate, notation)
+            if move == None:
+                if verbose:
+                    print("Game {}: {} isn't a legal move, skipping the rest".format(i+1, notation))
+                break
+            record = (gamestate.hash_key(), move.encode())
+            weight = 1 if result == None else (2 if result == gamestate.get_turn() else 0)
+            weights[record] = weights.get(record, 0) + weight
+            gamestate.push(move)
+
+    records = sorted((key, code, min(weight, 0xFFFFFFFF)) for ((key, code), weight) in weights.items()
+                     if weight > 0 and code < 1 << 64)
+    with open(path + ".tmp", "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(records)))
+        for field in range(3):
+            f.write(struct.pack("<{}{}".format(len(records), "QQI"[field]),
+                                *(record[field] for record in records)))
+    os.replace(path + ".tmp", path) #So that no one ever maps a half written book
+    return len(records)
+
+
+def self_play(num_games, node_limit=2000, random_plies=4, seed=None, verbose=False):
+    """
+    Plays the Mini Max AI against itself. The first few moves of every
+    game are picked at random, so that the games don't all go the same way.
+    @num_games: The number of games to play
+    @node_limit: The number of nodes to search per move
+    @random_plies: How many moves at the start of each game are random
+    @seed: The seed for the random moves, or None
+    @verbose: Indicates if each finished game should be reported on the console
+    type num_games: int
+    type node_limit: int
+    type random_plies: int
+    type seed: int
+    type verbose: bool
+    return: A list of (FEN, moves, result) tuples like read_pdn()'s
+    rtype: list
+    """
+    rng = random.Random(seed)
+    games = []
+    for i in range(num_games):
+        gamestate = checkers.from_fen(perft.START_FEN)
+        moves = []
+        while gamestate.get_winner() == None and len(moves) < _DRAW_PLIES:
+            if len(moves) < random_plies:
+                move = rng.choice(list(gamestate.legal_moves()))
+            else:
+                move = checkersai.iterative_deepening(gamestate, gamestate.get_turn(), node_limit=node_limit,
+                                                      quiescence=checkersai.QUIESCENCE_NODES,
+                                                      search="pvs")[1]
+            moves.append(move.notation())
+            gamestate.push(move)
+        games.append((perft.START_FEN, moves, gamestate.get_winner()))
+        if verbose:
+            print("Game {}: {} moves, {}".format(i+1, len(moves), _result_token(gamestate.get_winner())))
+    return games
+
+
+def write_pdn(games, f):
+    """
+    Writes games out as PDN.
+    @games: A list of (FEN, moves, result) tuples like read_pdn()'s
+    @f: A file opened for writing text
+    type games: list
+    type f: file
+    return: None
+    rtype: None
+    """
+    for (fen, moves, result) in games:
+        f.write('[Result "{}"]\n'.format(_result_token(result)))
+        if fen != perft.START_FEN:
+            f.write('[FEN "{}"]\n'.format(fen))
+        movetext = []
+        for i in range(0, len(moves), 2):
+            movetext.append("{}. {}".format(i//2 + 1, " ".join(moves[i:i+2])))
+        f.write(" ".join(movetext + [_result_token(result)]) + "\n\n")
+
+
+def _result_token(winner):
+    """
+    Returns the PDN result for a game's winner.
+    @winner: "B", "R" or None
+    type winner: str
+    return: "1-0", "0-1" or "1/2-1/2"
+    rtype: str
+    """
+    return {"B": "1-0", "R": "0-1"}.get(winner, "1/2-1/2")
+
+
+
+
+def main(argv=None):
+    """
+    The command line entry point.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Build (or probe) the checkers opening book.")
+    parser.add_argument("pdn", nargs="*", help="PDN files of games to build the book from")
+    parser.add_argument("-o", "--out", default=DEFAULT_PATH, help="the book file")
+    parser.add_argument("--plies", type=int, default=MAX_PLIES, help="how many moves into each game to use")
+    parser.add_argument("--self-play", type=int, default=0, help="the number of self-play games to add")
+    parser.add_argument("--nodes", type=int, default=2000, help="the nodes searched per self-play move")
+    parser.add_argument("--seed", type=int, default=None, help="the seed for the self-play games")
+    parser.add_argument("--save-pdn", default=None, help="a PDN file to save the self-play games to")
+    parser.add_argument("--probe", action="append", default=[], help="a PDN FEN position to look up instead")
+    args = parser.parse_args(argv)
+    for fen in args.probe:
+        try:
+            checkers.from_fen(fen)
+        except ValueError as error:
+            parser.error(str(error))
+
+    if args.probe:
+        book = OpeningBook(args.out)
+        for fen in args.probe:
+            entries = book.probe(checkers.from_fen(fen))
+            print("{}: {}".format(fen, ", ".join("{} ({})".format(move.notation(), weight)
+                                                 for (move, weight) in entries) or "not in the book"))
+        return 0
+
+    games = []
+    for name in args.pdn:
+        with open(name) as f:
+            games += read_pdn(f.read())
+    if args.self_play > 0:
+        played = self_play(args.self_play, args.nodes, seed=args.seed, verbose=True)
+        if args.save_pdn != None:
+            with open(args.save_pdn, "w") as f:
+                write_pdn(played, f)
+        games += played
+    if games == []:
+        parser.error("no games to build the book from (give PDN files or --self-play)")
+    print("{} records from {} games written to {}".format(build(games, args.out, args.plies, verbose=True),
+                                                         len(games), args.out))
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+#Contains the parallel (multi-process) search for the checkers AI.
+#The tree is split along the principal variation, the way the young brothers wait concept
+#(YBWC) splits a node: the root is searched with iterative deepening, and at every node of
+#the principal variation of the depth before, its first move is searched (split the same
+#way) to find out what the other moves have to beat. Only then are the other moves (the
+#"young brothers") handed out to the workers, all at once, each searched with a zero window
+#around that value (just to prove it's no better, like pvs does). Going through them in
+#turn, the few that turn out better are searched again with a full window, and any that were
+#only proved better than a value an earlier brother has since beaten get another zero window
+#search against the new one. So the best move is always the first one (in the order they
+#were searched) that nothing after it beat. Nodes near the leaves
+#(see _MIN_SPLIT_DEPTH) are searched whole by a single worker.
+#Every worker is a pool of its own with a single process (see mcts.py), started when the
+#ParallelSearch is made, with a transposition table and a MoveOrderer that it keeps from
+#one task (and one search) to the next. The same move at a node always goes to the same
+#worker, so the worker's table already holds what it found out about that move's subtree at
+#the depth before. The results are collected in a fixed order, so a ParallelSearch with the
+#same number of workers, asked the same things, always gives the same answers. Different
+#numbers of workers hand the moves to different tables and move orders, which can change
+#which moves get reduced and what the tables cut off, so they can disagree now and then
+#(searchbench.py --scaling reports it when they do). Alternatively, all of the workers can share one table in shared
+#memory (see SharedTranspositionTable), so that what one of them finds out saves the
+#others work. Then the results can depend on which worker got where first, too.
+
+import concurrent.futures
+import time
+
+import checkers
+import checkersai
+import moveorder
+import transtable
+
+_WORKER_TABLE_MB = 16 #The size of the transposition table each worker keeps
+_MIN_SPLIT_DEPTH = 4 #A node of the principal variation with less depth left than this is a single task
+_worker = None #Each worker process's (table, orderer), set up by _warm_up_task()
+
+
+
+
+class ParallelSearch:
+    """ A fixed depth search split over worker processes that keep their tables between tasks. """
+
+    def __init__(self, workers=4, quiescence=None, table=None, table_mb=_WORKER_TABLE_MB):
+        """
+        Initializes a ParallelSearch and starts its worker processes (see
+        warm_up()).
+        @workers: The number of worker processes (1 searches in this process)
+        @quiescence: The node cap of the quiescence search at the leaves, or None
+        @table: A SharedTranspositionTable for all of the workers to use, or
+                None for each worker to keep a table of its own
+        @table_mb: The size of each worker's own table, in megabytes
+        type workers: int
+        type quiescence: int
+        type table: SharedTranspositionTable
+        type table_mb: float
+        """
+        self._workers = workers
+        self._quiescence = quiescence
+        self._table = table
+        self._table_mb = table_mb
+        self._pools = [] #A single process pool per worker
+        self._local = None #The (table, orderer) of a search with a single worker, in this process
+        self._stats = {}
+        self.warm_up()
+
+
+    def search(self, gamestate, cpu_color, depth):
+        """
+        Searches a position to a fixed depth.
+        @gamestate: The game state of a checkers match (left as it was)
+        @cpu_color: The color of the CPU
+        @depth: How deep to search
+        type gamestate: Checkers
+        type cpu_color: str
+        type depth: int
+        return: A tuple whose first component is a utility value (for the
+                CPU) and whose second component is the best move (or None
+                if there are no moves)
+        rtype: tuple
+        """
+        self.warm_up() #In case the pools were closed
+        if list(gamestate.legal_moves()) == [] or depth < 1:
+            return (checkersai.minimax_eval(gamestate, cpu_color), None)
+
+        start = time.perf_counter()
+        self._stats = {"nodes": 0, "split_nodes": 0, "researches": 0, "critical_path": 0.0}
+        self._new_search()
+        line = []
+        for d in range(1, depth+1):
+            (best_val, line) = self._split(gamestate, d, float("-inf"), float("inf"), 0, line)
+
+        seconds = time.perf_counter() - start
+        self._stats.update({"seconds": round(seconds, 6), "critical_path": round(self._stats["critical_path"], 6),
+                            "nodes_per_second": int(self._stats["nodes"] / seconds) if seconds > 0 else None})
+        return (best_val if gamestate.get_turn() == cpu_color else -best_val, line[0])
+
+
+    def get_stats(self):
+        """
+        Returns the statistics of the last search.
+        return: A dict with the number of nodes searched (and how many of
+                them in the zero window searches that were split over the
+                workers), the number of moves searched again, the time
+                taken and the nodes per second, and the critical path: the
+                time the search would take with a core per worker (the CPU
+                time of the tasks that ran alone, plus that of the busiest
+                worker of each split)
+        rtype: dict
+        """
+        return self._stats
+
+
+    def warm_up(self):
+        """
+        Starts the worker processes (with more than one worker) and has
+        each of them set aside its table, and waits for them. __init__
+        calls this, so it only needs calling again after close().
+        return: None
+        rtype: None
+        """
+        if self._workers <= 1:
+            if self._local == None:
+                self._local = _make_worker(self._table, self._table_mb)
+        elif not self._pools:
+            self._pools = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for i in range(self._workers)]
+            for future in [pool.submit(_warm_up_task, (self._table, self._table_mb)) for pool in self._pools]:
+                future.result()
+
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any were started.
+        return: None
+        rtype: None
+        """
+        for pool in self._pools:
+            pool.shutdown()
+        self._pools = []
+
+
+    def _new_search(self):
+        """
+        Tells every worker's table and MoveOrderer that a new search is
+        starting.
+        return: None
+        rtype: None
+        """
+        if self._pools:
+            for future in [pool.submit(_new_search_task) for pool in self._pools]:
+                future.result()
+        else:
+            _new_search_task(self._local)
+
+
+    def _split(self, gamestate, depth, alpha, beta, ply, line):
+        """
+        Searches a node of the principal variation like pvs does, but with
+        its first move searched the same way, and the rest split over the
+        workers (see the top of the file). Below _MIN_SPLIT_DEPTH, the node
+        is a single task.
+        @gamestate: The game state at the node (left as it was)
+        @depth: How deep to search
+        @alpha: The value the player to move is already sure of
+        @beta: The value the opponent is already sure of
+        @ply: How many moves below the root the node is
+        @line: The principal variation from this node that the search before
+               found (its moves go first), or [] if it didn't get this far
+        type gamestate: Checkers
+        type depth: int
+        type alpha: float
+        type beta: float
+        type ply: int
+        type line: list
+        return: A tuple whose first component is the node's value (for the
+                player to move) and whose second component is the
+                principal variation from it, as far as it was split
+        rtype: tuple
+        """
+        if ply > 0 and gamestate.get_winner() != None: #Nothing to search (or hand out, see _task())
+            return (checkersai.pvs(gamestate, 0, alpha, beta, ply=ply)[0], [])
+        if ply > 0 and depth < _MIN_SPLIT_DEPTH:
+            return (self._run_all([self._task(gamestate, 0, depth, alpha, beta, ply)])[0], [])
+        moves = list(gamestate.legal_moves())
+
+        #The move of the principal variation first, then the rest in the order they're generated:
+        order = list(range(len(moves)))
+        if line != [] and line[0] in moves:
+            order.remove(moves.index(line[0]))
+            order.insert(0, moves.index(line[0]))
+
+        #The first move finds the value to beat...
+        best = order[0]
+        gamestate.push(moves[best])
+        try:
+            (val, best_line) = self._split(gamestate, depth-1, -beta, -alpha, ply+1,
+                                           line[1:] if line != [] and line[0] == moves[best] else [])
+        finally:
+            gamestate.pop()
+        best_val = -val
+        if best_val >= beta:
+            return (best_val, [moves[best]] + best_line)
+        alpha = max(alpha, best_val)
+
+        #...and the rest are searched all at once with a zero window to prove they're no better
+        #(late quiet moves a ply shallower, with the same late move reductions as pvs makes):
+        (tasks, results) = ([], {})
+        for (k, i) in enumerate(order[1:], 1):
+            gamestate.push(moves[i])
+            if gamestate.get_winner() != None: #The game's over, so its value is all there is to it
+                results[i] = (False, None, alpha, checkersai.pvs(gamestate, 0, -beta, -alpha, ply=ply+1)[0])
+            else:
+                reduce = (depth >= checkersai._LMR_MIN_DEPTH and k >= checkersai._LMR_MIN_MOVES
+                          and moves[i].move_type == "step" and not gamestate.has_captures())
+                tasks.append((i, reduce, self._task(gamestate, i, depth-2 if reduce else depth-1,
+                                                    -alpha-1, -alpha, ply+1)))
+            gamestate.pop()
+        for ((i, reduce, task), value) in zip(tasks, self._run_all([task for (i, reduce, task) in tasks], True)):
+            results[i] = (reduce, task, alpha, value)
+        for i in order[1:]:
+            (reduce, task, searched_alpha, val) = results[i]
+            val = -val
+            #A fail high only says the move is better than the alpha it was searched against. The
+            #reduced search may have missed something, and if alpha has gone up since, the move
+            #could still be better than the new one, so either way it's searched again:
+            if task != None and val > searched_alpha and (reduce or val <= alpha):
+                self._stats["researches"] += 1
+                val = -self._run_all([self._retask(task, depth-1, -alpha-1, -alpha)])[0]
+            if val > alpha: #Better after all, so find out by how much
+                if task != None:
+                    self._stats["researches"] += 1
+                    val = -self._run_all([self._retask(task, depth-1, -beta, -alpha)])[0]
+                if val > best_val:
+                    best_val, best, best_line = val, i, []
+                if val >= beta:
+                    break
+                alpha = max(alpha, val)
+        return (best_val, [moves[best]] + best_line)
+
+
+    def _task(self, gamestate, i, depth, alpha, beta, ply):
+        """
+        Makes the task of searching a position. The i-th move at a node
+        always goes to the same worker, so what the worker's table holds
+        about the subtree from the search before gets used. The task has
+        the position's snapshot, which doesn't say whether the game is
+        over (from_snapshot() sets up a game that's still going), so a
+        finished game can't be handed out.
+        @gamestate: The game state at the position
+        @i: Which move of its node reached the position
+        @depth: How deep to search it
+        @alpha: The value the player to move there is already sure of
+        @beta: The value the opponent is already sure of
+        @ply: How many moves below the root it is
+        type gamestate: Checkers
+        type i: int
+        type depth: int
+        type alpha: float
+        type beta: float
+        type ply: int
+        return: A 2-tuple of the worker and the task (see _search_task())
+        rtype: tuple
+        """
+        return (i % max(1, len(self._pools)), (gamestate.snapshot(), depth, alpha, beta, self._quiescence, ply))
+
+
+    def _retask(self, task, depth, alpha, beta):
+        """
+        Makes the task of searching a task's position again, to a different
+        depth or with a different window (on the same worker).
+        @task: A task (see _task())
+        @depth: How deep to search the position
+        @alpha: The value the player to move there is already sure of
+        @beta: The value the opponent is already sure of
+        type task: tuple
+        type depth: int
+        type alpha: float
+        type beta: float
+        return: The new task
+        rtype: tuple
+        """
+        (worker, (snapshot, old_depth, old_alpha, old_beta, quiescence, ply)) = task
+        return (worker, (snapshot, depth, alpha, beta, quiescence, ply))
+
+
+    def _run_all(self, tasks, split=False):
+        """
+        Runs search tasks on their workers (or in this process, with a
+        single worker), waits for all of them, and adds their nodes and
+        CPU time to the statistics.
+        @tasks: A list of (worker, task) pairs (see _task())
+        @split: Whether the tasks ran side by side (only the busiest
+                worker counts towards the critical path) or on their own
+        type tasks: list
+        type split: bool
+        return: The values of the tasks' positions, in order
+        rtype: list
+        """
+        if self._pools:
+            futures = [self._pools[worker].submit(_search_task, task) for (worker, task) in tasks]
+            results = [future.result() for future in futures]
+        else:
+            results = [_search_task(task, self._local) for (worker, task) in tasks]
+
+        busy = {}
+        for ((worker, task), (value, nodes, seconds)) in zip(tasks, results):
+            self._stats["nodes"] += nodes
+            if split:
+                self._stats["split_nodes"] += nodes
+            busy[worker] = busy.get(worker, 0.0) + seconds
+        if busy:
+            self._stats["critical_path"] += max(busy.values()) if split else sum(busy.values())
+        return [value for (value, nodes, seconds) in results]
+
+
+
+
+def parallel_search(gamestate, cpu_color, depth, workers=4, quiescence=None, table=None):
+    """
+    Searches a position to a fixed depth with a ParallelSearch of its
+    own (starting and shutting down its worker processes).
+    @gamestate: The game state of a checkers match (left as it was)
+    @cpu_color: The color of the CPU
+    @depth: How deep to search
+    @workers: The number of worker processes (1 searches in this process)
+    @quiescence: The node cap of the quiescence search at the leaves, or None
+    @table: A SharedTranspositionTable for all of the workers to use, or
+            None for each worker to use a table of its own
+    type gamestate: Checkers
+    type cpu_color: str
+    type depth: int
+    type workers: int
+    type quiescence: int
+    type table: SharedTranspositionTable
+    return: A tuple whose first component is a utility value (for the
+            CPU) and whose second component is the best move (or None
+            if there are no moves)
+    rtype: tuple
+    """
+    search = ParallelSearch(workers, quiescence, table)
+    try:
+        return search.search(gamestate, cpu_color, depth)
+    finally:
+        search.close()
+
+
+def _make_worker(table, table_mb):
+    """
+    Makes what a worker searches with.
+    @table: A SharedTranspositionTable, or None for a table of its own
+    @table_mb: The size of a table of its own, in megabytes
+    type table: SharedTranspositionTable
+    type table_mb: float
+    return: A 2-tuple: (transposition table, MoveOrderer)
+    rtype: tuple
+    """
+    if table == None:
+        table = transtable.TranspositionTable(table_mb)
+    return (table, moveorder.MoveOrderer())
+
+
+def _warm_up_task(options):
+    """
+    Sets up this worker process's table and MoveOrderer ahead of its
+    first search (see ParallelSearch.warm_up()).
+    @options: A 2-tuple: (SharedTranspositionTable or None, table size)
+    type options: tuple
+    return: None
+    rtype: None
+    """
+    global _worker
+    _worker = _make_worker(*options)
+
+
+def _new_search_task(worker=None):
+    """
+    Tells a worker's table and MoveOrderer that a new search is starting.
+    @worker: The worker's (table, orderer), or None for this worker process's
+    type worker: tuple
+    return: None
+    rtype: None
+    """
+    (table, orderer) = worker if worker != None else _worker
+    table.new_search()
+    orderer.new_search()
+
+
+def _search_task(task, worker=None):
+    """
+    Searches a position with pvs, with a worker's table and MoveOrderer.
+    @task: A 6-tuple: (position snapshot, depth, alpha, beta, quiescence
+           node cap, how many moves below the root the position is)
+    @worker: The worker's (table, orderer), or None for this worker process's
+    type task: tuple
+    type worker: tuple
+    return: A 3-tuple: the position's value for the player to move, the
+            number of nodes searched and the CPU time it took
+    rtype: tuple
+    """
+    (snapshot, depth, alpha, beta, quiescence, ply) = task
+    (table, orderer) = worker if worker != None else _worker
+    (budget, start) = (checkersai.SearchBudget(), time.process_time())
+    budget.start()
+    value = checkersai.pvs(checkers.from_snapshot(snapshot), depth, alpha, beta, budget, table, orderer,
+                           quiescence, ply)[0]
+    return (value, budget.get_nodes(), time.process_time() - start)
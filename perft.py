@@ -0,0 +1,177 @@
+#Contains a perft tool for checking and timing the move generator.
+#Perft counts the positions reachable from a gamestate in exactly N moves. The counts
+#only depend on the rules, so any change to move generation that alters them is a bug,
+#and the time it takes to count them is a good measure of move generation speed.
+#Run it with e.g.:  python perft.py start combo --depth 6 --divide --json
+
+import argparse
+import json
+import sys
+import time
+
+import checkers
+
+
+START_FEN = "B:W21,22,23,24,25,26,27,28,29,30,31,32:B1,2,3,4,5,6,7,8,9,10,11,12"
+
+#Named test positions: (PDN FEN, {depth: number of leaf nodes}). The start position
+#agrees with the published English draughts counts through depth 8. From depth 9 on
+#they differ, because in this game a man that gets crowned in the middle of a jump
+#carries on jumping as a king (so a few captures are longer).
+POSITIONS = {
+    "start": (START_FEN,
+              {1: 7, 2: 49, 3: 302, 4: 1469, 5: 7361, 6: 36768, 7: 179740,
+               8: 845931, 9: 3963629}),
+    #Double and triple jumps for both of black's front pieces:
+    "combo": ("B:W6,7,14,15,22,23,26,27:B1,2,12,K32",
+              {1: 4, 2: 17, 3: 64, 4: 440, 5: 2018, 6: 13515, 7: 63139}),
+    #The only move crowns a man halfway through a jump and jumps on backwards:
+    "crowning": ("B:W10,18,26,27:B3,22,K29",
+                 {1: 1, 2: 4, 3: 22, 4: 68, 5: 375, 6: 1348, 7: 8236}),
+    "midgame": ("B:W17,18,19,26,27,K31:B1,2,9,10,K12",
+                {1: 10, 2: 64, 3: 337, 4: 1696, 5: 8213, 6: 40873, 7: 193222}),
+    "kings": ("W:WK3,K31:BK4,K19",
+              {1: 4, 2: 16, 3: 67, 4: 293, 5: 1220, 6: 5078, 7: 22860}),
+}
+
+
+
+
+def perft(gamestate, depth):
+    """
+    Counts the leaf nodes of the game tree below a gamestate. A move
+    is a whole turn (a combo jump counts as one move). The moves are
+    played with push() and taken back with pop(), so the gamestate is
+    left as it was.
+    @gamestate: The Checkers gamestate to count from
+    @depth: The number of moves to look ahead
+    type gamestate: Checkers
+    type depth: int
+    return: The number of positions reached after exactly depth moves
+    rtype: int
+    """
+    if depth == 0:
+        return 1
+    if depth == 1: #No need to play the last moves just to count them
+        return sum(1 for move in gamestate.legal_moves())
+    nodes = 0
+    for move in gamestate.legal_moves():
+        gamestate.push(move)
+        nodes += perft(gamestate, depth-1)
+        gamestate.pop()
+    return nodes
+
+
+def divide(gamestate, depth):
+    """
+    Breaks a perft count down by the first move, which makes it easy
+    to narrow a wrong count down to the move that causes it.
+    @gamestate: The Checkers gamestate to count from
+    @depth: The number of moves to look ahead (at least 1)
+    type gamestate: Checkers
+    type depth: int
+    return: A list of (move, leaf nodes below it) pairs
+    rtype: list
+    """
+    counts = []
+    for move in list(gamestate.legal_moves()):
+        gamestate.push(move)
+        counts.append((move, perft(gamestate, depth-1)))
+        gamestate.pop()
+    return counts
+
+
+def run(name, fen, depth, with_divide=False):
+    """
+    Runs perft on a position and times it.
+    @name: A name for the position
+    @fen: The position as a PDN FEN string
+    @depth: The number of moves to look ahead
+    @with_divide: Whether to break the count down by the first move
+    type name: str
+    type fen: str
+    type depth: int
+    type with_divide: bool
+    return: A dict with the position, the node count, the expected count
+            (None if it isn't known), whether they match, the time taken,
+            the nodes per second and (if asked for) the divide breakdown
+    rtype: dict
+    """
+    gamestate = checkers.from_fen(fen)
+    start = time.perf_counter()
+    if with_divide:
+        counts = divide(gamestate, depth)
+        nodes = sum(count for (move, count) in counts)
+    else:
+        nodes = perft(gamestate, depth)
+    seconds = time.perf_counter() - start
+
+    expected = POSITIONS[name][1].get(depth) if name in POSITIONS else None
+    result = {"position": name, "fen": fen, "depth": depth, "nodes": nodes,
+              "expected": expected, "ok": expected == None or nodes == expected,
+              "seconds": round(seconds, 6),
+              "nps": int(nodes / seconds) if seconds > 0 else None}
+    if with_divide:
+        result["divide"] = {move.notation(): count for (move, count) in counts}
+    return result
+
+
+def print_result(result):
+    """
+    Prints a perft result for people to read.
+    @result: A dict returned by run()
+    type result: dict
+    return: None
+    rtype: None
+    """
+    for (move, count) in result.get("divide", {}).items():
+        print("  {:<14} {}".format(move, count))
+    status = "" if result["expected"] == None else (" ok" if result["ok"] else
+                                                    " MISMATCH (expected {})".format(result["expected"]))
+    print("{} depth {}: {} nodes in {:.3f}s ({} nodes/s){}".format(
+        result["position"], result["depth"], result["nodes"], result["seconds"],
+        result["nps"], status))
+
+
+def main(argv=None):
+    """
+    The command line entry point.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status: 0 if every count matched, 1 otherwise
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Count (and time) the leaf nodes of the checkers game tree.")
+    parser.add_argument("positions", nargs="*",
+                        help="named positions to run ({}); all of them by default".format(", ".join(POSITIONS)))
+    parser.add_argument("--fen", action="append", default=[], help="a PDN FEN position to run as well")
+    parser.add_argument("-d", "--depth", type=int, default=5, help="the number of moves to look ahead")
+    parser.add_argument("--divide", action="store_true", help="break the counts down by the first move")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.positions if name not in POSITIONS]
+    if unknown:
+        parser.error("unknown position(s): {}".format(", ".join(unknown)))
+    for fen in args.fen:
+        try:
+            checkers.from_fen(fen)
+        except ValueError as error:
+            parser.error(str(error))
+    runs = [(name, POSITIONS[name][0]) for name in (args.positions or ([] if args.fen else POSITIONS))]
+    runs += [("fen", fen) for fen in args.fen]
+
+    results = []
+    for (name, fen) in runs:
+        results.append(run(name, fen, args.depth, args.divide))
+        if not args.json:
+            print_result(results[-1])
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
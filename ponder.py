@@ -0,0 +1,194 @@
+#Contains the pondering for the checkers AI: searching on the opponent's time.
+#After the CPU moves, a background thread guesses the human's reply (the move the search
+#expects, from the transposition table) and searches the position after it, with the same
+#transposition table and move orderer the CPU searches with. If the human then plays the
+#expected move (a "ponder hit"), the CPU's answer is mostly or completely worked out
+#already. If not, the thread is stopped, and what it put in the table may still help.
+#Pondering is the start of the CPU's next move, so it's what tells the table and the move
+#orderer a new search is starting; the CPU's own search then doesn't tell them again (see
+#new_search_started()), so they age once a move whether the pondering hits or misses.
+#The search holds the interpreter lock while it runs, but Python hands it over every few
+#milliseconds, which is plenty for the GUI to keep up with clicks.
+
+import threading
+import time
+
+import checkers
+import checkersai
+
+_GUESS_NODES = 500 #The nodes to search for a guess at the reply when the table has none
+
+
+
+
+class Ponderer:
+    """ Searches the position after the expected reply in a background thread. """
+
+    def __init__(self, cpu_color, table=None, orderer=None, quiescence=None, search="pvs",
+                 tablebase=None, evaluation="material"):
+        """
+        Initializes a Ponderer. The search options are the ones the CPU
+        searches with (see checkersai.iterative_deepening), so that the
+        table and the move orderer it fills in are the CPU's own.
+        @cpu_color: The color of the CPU
+        @table: A TranspositionTable, or None
+        @orderer: A MoveOrderer, or None
+        @quiescence: The node cap of the quiescence search at the leaves, or None
+        @search: "minimax" or "pvs"
+        @tablebase: A Tablebase, or None
+        @evaluation: "material", "pst" or "nnue"
+        type cpu_color: str
+        type table: TranspositionTable
+        type orderer: MoveOrderer
+        type quiescence: int
+        type search: str
+        type tablebase: Tablebase
+        type evaluation: str
+        """
+        self._cpu_color = cpu_color
+        self._options = {"table": table, "orderer": orderer, "quiescence": quiescence,
+                         "search": search, "tablebase": tablebase, "evaluation": evaluation}
+        self._thread = None
+        self._budget = None
+        self._key = None #The key of the position being pondered (once the reply is guessed)
+        self._result = None
+        self._new_search_started = False #Whether start() told the table and orderer about a new search
+        self._started = 0
+        self._hits = 0
+        self._misses = 0
+
+
+    def start(self, gamestate):
+        """
+        Starts pondering, if the game isn't over. The thread works on a
+        copy of the gamestate, so the gamestate can be played on while it
+        runs. Any pondering that's still going on is stopped first.
+        @gamestate: The game state of a checkers match, with the
+                    opponent to move
+        type gamestate: Checkers
+        return: None
+        rtype: None
+        """
+        self.stop()
+        self._new_search_started = False
+        if gamestate.get_winner() != None or gamestate.need_to_move_again():
+            return
+        for helper in (self._options["table"], self._options["orderer"]):
+            if helper != None:
+                helper.new_search()
+        self._new_search_started = True
+        self._budget = checkersai.SearchBudget() #No limits: it runs until it's stopped
+        self._key, self._result = None, None
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._ponder, args=(gamestate.snapshot(), self._budget),
+                                        daemon=True) #So that closing the window doesn't wait for it
+        self._thread.start()
+
+
+    def finish(self, gamestate, think_time):
+        """
+        Stops pondering now that the opponent has moved, and returns the
+        pondered move if the opponent played the expected reply. On a hit,
+        the thread first gets to search for whatever is left of think_time
+        (counted from when pondering started), so a hit never plays a
+        move searched for less time than the CPU would have searched anyway.
+        @gamestate: The game state of a checkers match, with the CPU to move
+        @think_time: The number of seconds the CPU searches a move for
+        type gamestate: Checkers
+        type think_time: float
+        return: The move to play, or None on a miss (or if there was no
+                pondering)
+        rtype: Move
+        """
+        if self._thread == None:
+            return None
+        hit = (self._key != None and self._key == gamestate.hash_key()
+               and not gamestate.need_to_move_again())
+        if hit:
+            self._thread.join(max(0, think_time - (time.perf_counter() - self._started)))
+        self.stop()
+        if hit and self._result != None and self._result[2] > 0:
+            self._hits += 1
+            return self._result[1]
+        self._misses += 1
+        return None
+
+
+    def stop(self):
+        """
+        Stops the pondering thread (if there is one) and waits for it.
+        return: None
+        rtype: None
+        """
+        if self._thread != None:
+            self._budget.stop()
+            self._thread.join()
+            self._thread = None
+
+
+    def new_search_started(self):
+        """
+        Returns whether the last start() told the table and the move
+        orderer that a new search was starting, so the CPU's search for
+        this move shouldn't tell them again (see
+        checkersai.iterative_deepening's new_search).
+        return: True if it did
+        rtype: bool
+        """
+        return self._new_search_started
+
+
+    def get_stats(self):
+        """
+        Returns how often the opponent played the expected reply.
+        return: A dict with the number of hits and misses
+        rtype: dict
+        """
+        return {"hits": self._hits, "misses": self._misses}
+
+
+    def _ponder(self, snapshot, budget):
+        """
+        The pondering thread: guesses the reply, plays it and searches
+        until it's stopped (or the search reaches its deepest depth).
+        @snapshot: A snapshot of the position (see Checkers.snapshot())
+        @budget: The SearchBudget that stop() stops
+        type snapshot: tuple
+        type budget: SearchBudget
+        return: None
+        rtype: None
+        """
+        gamestate = checkers.from_snapshot(snapshot)
+        reply = self._guess_reply(gamestate)
+        if reply == None:
+            return
+        gamestate.push(reply)
+        if gamestate.get_winner() != None:
+            return
+        self._key = gamestate.hash_key()
+        self._result = checkersai.iterative_deepening(gamestate, self._cpu_color, budget=budget,
+                                                      new_search=False, **self._options)
+
+
+    def _guess_reply(self, gamestate):
+        """
+        Guesses the opponent's reply: the best move stored for the
+        position in the transposition table (the CPU's search has usually
+        just looked at it), or else the result of a short search.
+        @gamestate: The game state of a checkers match, with the opponent to move
+        type gamestate: Checkers
+        return: The expected Move, or None if there are no moves
+        rtype: Move
+        """
+        moves = list(gamestate.legal_moves())
+        table = self._options["table"]
+        entry = table.probe(gamestate.hash_key()) if table != None else None
+        if entry != None and entry[3] != None and checkers.Move.decode(entry[3]) in moves:
+            return checkers.Move.decode(entry[3])
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+        opp_color = "B" if self._cpu_color == "R" else "R"
+        return checkersai.iterative_deepening(gamestate, opp_color, node_limit=_GUESS_NODES,
+                                              quiescence=self._options["quiescence"],
+                                              search=self._options["search"],
+                                              evaluation=self._options["evaluation"])[1]
@@ -0,0 +1,127 @@
+#Contains the piece-square tables for the checkers AI's evaluation (see checkersai.pst_eval).
+#Every man and king is worth a value that depends on the square it stands on, once for the
+#opening and once for the endgame. The values already include what the piece itself is
+#worth, so a position's score is just the sum over its pieces. Checkers keeps the two sums
+#up to date as pieces move, get captured and get crowned (like its piece counts and Zobrist
+#key), so scoring a leaf doesn't have to look at the board at all. The two sums are blended
+#by the phase of the game: the fewer pieces are left, the more the endgame one counts.
+#The tables are for black (who starts at the top and moves down); red's are the same with
+#the board turned around. The values are whole numbers in hundredths of a man, and they're
+#stored with black's pieces counting up and red's counting down. batcheval.py scores arrays
+#of positions with these same tables, so there's only the one set of them to tune.
+
+import bitboard
+
+MAN_VALUE = 100 #What a man is worth, more or less (the tables vary it a little by square)
+KING_VALUE = 130
+FULL_PHASE = 24 #The number of pieces at the start of a game: all opening, no endgame
+
+#Men: in the opening, the back rank (which keeps the other side from crowning) and the
+#middle of the board are worth holding; in the endgame, getting closer to being crowned is
+#what counts. Black's king row is the bottom one, where a man never stays.
+_MAN_OPENING = (6, 4, 4, 6,
+                0, 2, 2, 0,
+                1, 3, 3, 1,
+                2, 4, 4, 2,
+                3, 5, 5, 3,
+                4, 6, 6, 4,
+                6, 8, 8, 6,
+                0, 0, 0, 0)
+_MAN_ENDGAME = (0, 0, 0, 0,
+                2, 2, 2, 2,
+                4, 4, 4, 4,
+                7, 7, 7, 7,
+                10, 10, 10, 10,
+                14, 14, 14, 14,
+                20, 20, 20, 20,
+                0, 0, 0, 0)
+#Kings: the middle of the board, all the more so in the endgame (and a king is worth more
+#then, when there are fewer men left to get in its way). The corners are the worst.
+_KING_OPENING = (-4, -2, -2, -4,
+                 -2, 0, 0, -2,
+                 0, 3, 3, 1,
+                 1, 5, 5, 0,
+                 0, 5, 5, 1,
+                 1, 3, 3, 0,
+                 -2, 0, 0, -2,
+                 -4, -2, -2, -4)
+_KING_ENDGAME = (-8, -4, -4, -8,
+                 -4, 2, 2, -4,
+                 0, 8, 8, 2,
+                 2, 12, 12, 0,
+                 0, 12, 12, 2,
+                 2, 8, 8, 0,
+                 -4, 2, 2, -4,
+                 -8, -4, -4, -8)
+_KING_ENDGAME_BONUS = 20
+
+
+def _make_values():
+    """
+    Puts the tables together into the values of each kind of piece on
+    each square (for both colors, with red's turned around and counting
+    down).
+    return: A dict mapping (color, is_king) to a tuple of 32 (opening,
+            endgame) pairs, indexed by square
+    rtype: dict
+    """
+    black_men = tuple((MAN_VALUE + opening, MAN_VALUE + endgame)
+                      for (opening, endgame) in zip(_MAN_OPENING, _MAN_ENDGAME))
+    black_kings = tuple((KING_VALUE + opening, KING_VALUE + _KING_ENDGAME_BONUS + endgame)
+                        for (opening, endgame) in zip(_KING_OPENING, _KING_ENDGAME))
+    return {("B", False): black_men, ("B", True): black_kings,
+            ("R", False): tuple((-opening, -endgame) for (opening, endgame) in black_men[::-1]),
+            ("R", True): tuple((-opening, -endgame) for (opening, endgame) in black_kings[::-1])}
+
+
+VALUES = _make_values()
+
+
+
+
+def piece_values(piece):
+    """
+    Returns the per-square values for a piece's color and rank.
+    @piece: A checkers Piece
+    type piece: Piece
+    return: A tuple of 32 (opening, endgame) pairs, indexed by square
+    rtype: tuple
+    """
+    return VALUES[(piece.get_color(), piece.piece_is_king())]
+
+
+def position_sums(black, red, kings):
+    """
+    Adds up the values of a position's pieces from scratch.
+    @black: The mask of the black pieces
+    @red: The mask of the red pieces
+    @kings: The mask of all kings
+    type black: int
+    type red: int
+    type kings: int
+    return: A 2-tuple: the (opening, endgame) sums, for black
+    rtype: tuple
+    """
+    (opening, endgame) = (0, 0)
+    for (color, pieces) in (("B", black), ("R", red)):
+        for sq in bitboard.iter_bits(pieces):
+            values = VALUES[(color, bool(kings >> sq & 1))][sq]
+            opening += values[0]
+            endgame += values[1]
+    return (opening, endgame)
+
+
+def blend(opening, endgame, num_pieces):
+    """
+    Blends the opening and endgame sums by the phase of the game.
+    @opening: The opening sum
+    @endgame: The endgame sum
+    @num_pieces: How many pieces are left on the board (of both colors)
+    type opening: int
+    type endgame: int
+    type num_pieces: int
+    return: The score, for black
+    rtype: int
+    """
+    phase = min(num_pieces, FULL_PHASE)
+    return (opening*phase + endgame*(FULL_PHASE - phase)) // FULL_PHASE
@@ -0,0 +1,225 @@
+#Contains a benchmark for the checkers AI search.
+#It searches a set of positions (the named perft positions) to a fixed depth with different
+#search configurations and reports how many nodes each one visited and how fast, so that
+#search changes can be compared on the same footing.
+#With --scaling it instead times the parallel search with different numbers of workers.
+#Run it with e.g.:  python searchbench.py start midgame --depth 7 --json
+#              or:  python searchbench.py --depth 6 --evaluation pst
+#              or:  python searchbench.py --scaling --workers 1,2,4,8,16 --depth 6
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import checkers
+import checkersai
+import moveorder
+import parallelsearch
+import perft
+import transtable
+
+
+#Search configurations: name -> (search, function returning fresh keyword arguments for it),
+#where the search is "minimax" (minimax_abp) or "pvs" (aspiration_search)
+CONFIGS = {
+    "plain": ("minimax", lambda: {}),
+    "tt": ("minimax", lambda: {"table": transtable.TranspositionTable()}),
+    "ordered": ("minimax", lambda: {"table": transtable.TranspositionTable(), "orderer": moveorder.MoveOrderer()}),
+    "quiescence": ("minimax", lambda: {"table": transtable.TranspositionTable(), "orderer": moveorder.MoveOrderer(),
+                                       "quiescence": checkersai.QUIESCENCE_NODES}),
+    "pvs": ("pvs", lambda: {"table": transtable.TranspositionTable(), "orderer": moveorder.MoveOrderer(),
+                            "quiescence": checkersai.QUIESCENCE_NODES}),
+}
+
+
+
+
+def bench(fen, depth, config, evaluation="material"):
+    """
+    Searches a position to depth 1, 2, ..., depth (the way
+    iterative_deepening does, so that the table and the move ordering
+    get to learn from the shallower searches) and times it.
+    @fen: The position as a PDN FEN string
+    @depth: The deepest search
+    @config: The name of a search configuration in CONFIGS
+    @evaluation: How to score the leaves (see checkersai.minimax_abp).
+                 minimax_eval's material counts are mostly tied, which
+                 hides how much move ordering prunes; pst_eval's aren't.
+    type fen: str
+    type depth: int
+    type config: str
+    type evaluation: str
+    return: A dict with the node count, time taken, nodes per second and
+            the value and move the deepest search came up with
+    rtype: dict
+    """
+    gamestate = checkers.from_fen(fen)
+    cpu_color = gamestate.get_turn()
+    (search, make_options) = CONFIGS[config]
+    options = make_options()
+    options["evaluation"] = evaluation
+    guess = None
+    budget = checkersai.SearchBudget() #No limits, it's only there to count the nodes
+    budget.start()
+    start = time.perf_counter()
+    for d in range(1, depth+1):
+        if search == "pvs":
+            (guess, move) = checkersai.aspiration_search(gamestate, d, guess, budget, **options)
+            val = guess #The position's side to move is the CPU, so this is from its point of view too
+        else:
+            (val, move) = checkersai.minimax_abp(gamestate, cpu_color, d, float("-inf"), float("inf"),
+                                                 False, budget, **options)
+    seconds = time.perf_counter() - start
+    result = {"config": config, "nodes": budget.get_nodes(), "seconds": round(seconds, 6),
+              "nps": int(budget.get_nodes() / seconds) if seconds > 0 else None,
+              "value": val, "move": move.notation() if move != None else None}
+    if options.get("table") != None:
+        result["table"] = options["table"].get_stats()
+    return result
+
+
+def bench_scaling(fen, depth, worker_counts, shared=False):
+    """
+    Times parallel search on a position with each of the given numbers of
+    workers. The worker processes are started before the clock starts.
+    @fen: The position as a PDN FEN string
+    @depth: The depth to search to
+    @worker_counts: The numbers of workers to try
+    @shared: Whether the workers share a SharedTranspositionTable (a new,
+             empty one for every number of workers)
+    type fen: str
+    type depth: int
+    type worker_counts: list
+    type shared: bool
+    return: A list of dicts (one per number of workers) with the time
+            taken, the speedup over the first number of workers, the
+            search's statistics (see ParallelSearch.get_stats()) and the
+            value and move the search came up with
+    rtype: list
+    """
+    results = []
+    for workers in worker_counts:
+        gamestate = checkers.from_fen(fen)
+        table = transtable.SharedTranspositionTable() if shared else None
+        search = parallelsearch.ParallelSearch(workers, checkersai.QUIESCENCE_NODES, table)
+        try:
+            start = time.perf_counter()
+            (val, move) = search.search(gamestate, gamestate.get_turn(), depth)
+            seconds = time.perf_counter() - start
+        finally:
+            search.close()
+            if table != None:
+                table.close()
+        stats = search.get_stats()
+        results.append({"workers": workers, "seconds": round(seconds, 6),
+                        "speedup": round(results[0]["seconds"] / seconds, 2) if results else 1.0,
+                        "critical_path": stats["critical_path"], "nodes": stats["nodes"],
+                        "value": val, "move": move.notation() if move != None else None})
+    return results
+
+
+def evaluations():
+    """
+    Returns the evaluations there are to search with: "nnue" only if
+    NumPy is installed and a network has been trained (see nnue.py).
+    return: The names of the evaluations (see checkersai._EVALUATIONS)
+    rtype: list
+    """
+    names = [name for name in checkersai._EVALUATIONS if name != "nnue"]
+    try:
+        #Imported here since nnue needs NumPy, which the rest of the benchmark doesn't
+        import nnue
+    except ImportError:
+        return names
+    return names + ["nnue"] if os.path.exists(nnue.DEFAULT_PATH) else names
+
+
+def main(argv=None):
+    """
+    The command line entry point.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the checkers AI search.")
+    parser.add_argument("positions", nargs="*",
+                        help="named positions to search ({}); all of them by default".format(", ".join(perft.POSITIONS)))
+    parser.add_argument("-d", "--depth", type=int, default=6, help="the depth to search to")
+    parser.add_argument("-c", "--config", action="append", choices=list(CONFIGS),
+                        help="a search configuration to run (all of them by default)")
+    parser.add_argument("-e", "--evaluation", choices=evaluations(), default="material",
+                        help="how to score the leaves (nnue once a network is trained with nnue.py --train)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--scaling", action="store_true",
+                        help="time the parallel search with different numbers of workers instead")
+    parser.add_argument("--workers", default="1,2,4,8,16",
+                        help="comma separated numbers of workers for --scaling")
+    parser.add_argument("--shared", action="store_true",
+                        help="have the --scaling workers share one transposition table")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.positions if name not in perft.POSITIONS]
+    if unknown:
+        parser.error("unknown position(s): {}".format(", ".join(unknown)))
+    configs = args.config or list(CONFIGS)
+    if args.scaling:
+        return main_scaling(args)
+
+    results = []
+    totals = {config: 0 for config in configs}
+    for name in (args.positions or perft.POSITIONS):
+        for config in configs:
+            result = bench(perft.POSITIONS[name][0], args.depth, config, args.evaluation)
+            result.update(position=name, depth=args.depth, evaluation=args.evaluation)
+            results.append(result)
+            totals[config] += result["nodes"]
+            if not args.json:
+                print("{:<10} {:<10} depth {}: {:>9} nodes in {:.3f}s ({} nodes/s)  best {} ({})".format(
+                    name, config, args.depth, result["nodes"], result["seconds"], result["nps"],
+                    result["move"], result["value"]))
+
+    if args.json:
+        print(json.dumps({"results": results, "total_nodes": totals}, indent=2))
+    else:
+        base = totals[configs[0]]
+        print("total nodes: " + ", ".join("{} {} ({:.2f}x)".format(config, nodes, base / nodes if nodes else 0)
+                                          for (config, nodes) in totals.items()))
+    return 0
+
+
+def main_scaling(args):
+    """
+    Runs the --scaling benchmark. Different numbers of workers can choose
+    different moves (see the top of parallelsearch.py), so that's
+    reported, not taken as a failure.
+    @args: The parsed command line arguments
+    type args: Namespace
+    return: The exit status (0)
+    rtype: int
+    """
+    worker_counts = [int(workers) for workers in args.workers.split(",")]
+    results = {}
+    consistent = True
+    for name in (args.positions or perft.POSITIONS):
+        results[name] = bench_scaling(perft.POSITIONS[name][0], args.depth, worker_counts, args.shared)
+        consistent = consistent and (args.shared or len(set((r["move"], r["value"]) for r in results[name])) == 1)
+        if not args.json:
+            for result in results[name]:
+                print("{:<10} depth {} with {:>2} worker(s): {:.3f}s ({:.2f}x), critical path {:.3f}s, {:>8} nodes"
+                      "  best {} ({})".format(name, args.depth, result["workers"], result["seconds"],
+                                              result["speedup"], result["critical_path"], result["nodes"],
+                                              result["move"], result["value"]))
+    if args.json:
+        print(json.dumps({"depth": args.depth, "results": results, "consistent": consistent}, indent=2))
+    elif not consistent:
+        print("The results differed between numbers of workers (their tables and move orders differ).")
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
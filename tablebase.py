@@ -0,0 +1,728 @@
+#Contains the endgame tablebases for the checkers AI: a generator that solves every position
+#with a few pieces left by retrograde analysis, and a probe for the search to look them up in.
+#There is a table for every material signature (how many men and kings each side has). It
+#only holds positions with black to move: a position with red to move is looked up turned
+#around (the board rotated half a turn and the colors swapped), which plays out the same.
+#Every position gets one byte: 0 if it's a draw, or 1 + the number of moves (whole turns,
+#like perft's) until the game ends with best play, which is odd for a win for the player to
+#move and even for a loss. The tables are plain files of these bytes after a short header,
+#indexed by the squares the pieces stand on, and they are opened with mmap, so the search
+#only ever reads the pages of them it actually probes.
+#Run it with e.g.:  python tablebase.py --pieces 4 --workers 4
+#              or:  python tablebase.py --probe "W:WK3,K31:BK4"
+
+from array import array
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import math
+import mmap
+import os
+import sys
+
+import bitboard
+import checkers
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+WIN = 1
+DRAW = 0
+LOSS = -1
+WIN_SCORE = 100000 #What a won position scores in a search, less the moves it takes to win (more than any evaluation)
+MIN_WIN_SCORE = WIN_SCORE - 1000 #A score past this is a won (or lost) game, not an evaluation
+
+_MAGIC = b"CKTB"
+_HEADER_BYTES = len(_MAGIC) + 4 #The magic number and the material signature
+_MAX_DISTANCE = 253 #Longer wins (and losses) are stored as if they took this long
+_MEN_SQUARES = 28 #A man is never on its own king row, since it would have been crowned
+_RED_MEN_OFFSET = 4 #Red's king row is squares 0-3, so red men are on squares 4-31
+_CHUNK_ENTRIES = 1 << 15 #How many table entries a worker scans at a time...
+_CHUNK_POSITIONS = 1 << 11 #...and how many settled positions it works out the unmoves of
+_BINOMIAL = [[math.comb(n, k) for k in range(bitboard.NUM_SQUARES+1)] for n in range(bitboard.NUM_SQUARES+1)]
+
+
+
+
+class TablebaseError(Exception):
+    """ An error that represents a missing or broken tablebase file. """
+    pass
+
+
+
+
+class Tablebase:
+    """ Looks positions up in the endgame tables in a directory. """
+
+    def __init__(self, directory=DEFAULT_DIR):
+        """
+        Initializes a Tablebase. Nothing is read until a table is first
+        probed, and then it's only mapped into memory (the pages come in
+        as they're needed), so this costs next to nothing even when
+        the tables are big. A directory without tables is fine too:
+        every probe then just comes back empty.
+        @directory: The directory that generate() wrote the tables to
+        type directory: str
+        """
+        self._directory = directory
+        self._maps = {} #Material signature -> mmap (or None if there's no table for it)
+        self._max_pieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                signature = _parse_file_name(name)
+                if signature != None:
+                    self._max_pieces = max(self._max_pieces, sum(signature))
+
+
+    def get_max_pieces(self):
+        """
+        Returns the most pieces a position can have to be in the tables.
+        return: The number of pieces of the biggest table (0 if there
+                are no tables)
+        rtype: int
+        """
+        return self._max_pieces
+
+
+    def probe(self, gamestate):
+        """
+        Looks up a position.
+        @gamestate: A Checkers gamestate (not in the middle of a combo
+                    jump, and with the game not over yet)
+        type gamestate: Checkers
+        return: None if the position isn't in the tables, otherwise a
+                2-tuple whose first component is WIN, DRAW or LOSS (for the
+                player to move) and whose second component is the number of
+                moves until the game ends (None for a draw)
+        rtype: tuple
+        """
+        if (sum(gamestate.material()) > self._max_pieces or gamestate.get_winner() != None
+            or gamestate.need_to_move_again()):
+            return None
+        return self.probe_bitboards(*gamestate.snapshot())
+
+
+    def probe_bitboards(self, black, red, kings, turn):
+        """
+        Looks up a position given as bitboards (see probe()).
+        @black: The mask of the black pieces
+        @red: The mask of the red pieces
+        @kings: The mask of all kings
+        @turn: The side to move ("B" or "R")
+        type black: int
+        type red: int
+        type kings: int
+        type turn: str
+        return: Like probe()
+        rtype: tuple
+        """
+        if turn == "R":
+            (black, red, kings) = (bitboard.flip(red), bitboard.flip(black), bitboard.flip(kings))
+        if black == 0 or red == 0:
+            return None
+        signature = _signature(black, red, kings)
+        byte = self._read(signature, _index(signature, black, red, kings))
+        if byte == None:
+            return None
+        if byte == 0:
+            return (DRAW, None)
+        return (WIN if (byte-1) % 2 == 1 else LOSS, byte-1)
+
+
+    def score(self, gamestate, ply=0):
+        """
+        Looks up a position and scores it for a search: a win is worth
+        WIN_SCORE less the moves it takes, counted from the root of the
+        search (so faster wins come first, and a game that's already over
+        beats them, see checkersai), a loss the negative of that, and a
+        draw 0.
+        @gamestate: A Checkers gamestate
+        @ply: How many moves below the root of the search the position is
+        type gamestate: Checkers
+        type ply: int
+        return: The score for the player to move, or None if the
+                position isn't in the tables
+        rtype: int
+        """
+        result = self.probe(gamestate)
+        if result == None:
+            return None
+        if result[0] == DRAW:
+            return 0
+        return result[0] * (WIN_SCORE - ply - result[1])
+
+
+    def close(self):
+        """
+        Unmaps the tables. The Tablebase can still be used afterwards
+        (they're mapped again as needed).
+        return: None
+        rtype: None
+        """
+        for table in self._maps.values():
+            if table != None:
+                table.close()
+        self._maps = {}
+
+
+    def _read(self, signature, index):
+        """
+        Reads a position's byte out of the table for its signature,
+        mapping the table in first if it isn't yet.
+        @signature: The Material of the position (black to move)
+        @index: The position's index in the table
+        type signature: Material
+        type index: int
+        return: The byte, or None if there's no table for the signature
+        rtype: int
+        """
+        if signature not in self._maps:
+            path = os.path.join(self._directory, _file_name(signature))
+            if not os.path.exists(path):
+                self._maps[signature] = None
+            else:
+                with open(path, "rb") as f:
+                    table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if (table[:_HEADER_BYTES] != _MAGIC + bytes(signature)
+                    or len(table) != _HEADER_BYTES + _table_size(signature)):
+                    table.close()
+                    raise TablebaseError("{} is not a tablebase for {}".format(path, signature))
+                self._maps[signature] = table
+        table = self._maps[signature]
+        return None if table == None else table[_HEADER_BYTES + index]
+
+
+
+
+def generate(directory=DEFAULT_DIR, max_pieces=4, workers=1, verbose=False):
+    """
+    Builds the tables for every material signature with up to max_pieces
+    pieces (and at least one piece each). A table depends on the tables
+    that a capture or a crowning leads into, so the signatures are done in
+    order of how many pieces, and then how many men, they have. Each one
+    is split over a pool of worker processes by ranges of its positions
+    (see _solve_unit()). Tables that are already there are kept.
+    @directory: The directory to write the tables to
+    @max_pieces: The most pieces on the board
+    @workers: The number of worker processes (1 does everything in this
+              process)
+    @verbose: Indicates if each table should be reported on the console
+    type directory: str
+    type max_pieces: int
+    type workers: int
+    type verbose: bool
+    return: A list of dicts with the signature, size and wins, draws and
+            losses of every table that was built
+    rtype: list
+    """
+    os.makedirs(directory, exist_ok=True)
+    units = set()
+    for pieces in range(2, max_pieces+1):
+        for signature in _signatures(pieces):
+            units.add(min(signature, _flip_signature(signature)))
+
+    results = []
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for unit in sorted(units, key=lambda unit: (sum(unit), unit.black_men + unit.red_men, unit)):
+            if all(os.path.exists(os.path.join(directory, _file_name(signature)))
+                   for signature in (unit, _flip_signature(unit))):
+                continue
+            for result in _solve_unit(directory, unit, pool):
+                results.append(result)
+                if verbose:
+                    print("{}: {} positions, {} wins, {} draws, {} losses, longest win {}".format(
+                        _file_name(result["signature"]), result["positions"], result["wins"],
+                        result["draws"], result["losses"], result["longest_win"]))
+    finally:
+        if pool != None:
+            pool.shutdown()
+    return results
+
+
+def _solve_unit(directory, unit, pool=None):
+    """
+    Solves a signature together with its turned around signature (a move
+    from a position in one of them leads into the other, unless it's a
+    capture or a crowning), and writes both tables.
+    The moves from every position are generated first. The ones that
+    lead out of the two tables are looked up in the tables already built,
+    and the ones that stay inside are counted. Then, starting from the
+    positions whose values are known, values spread back to the positions
+    one move before them ("unmoves"), in order of how many moves they take:
+    a position with a move to a lost position is won, and one whose moves
+    all turn out to lead to won positions is lost. Whatever is left over
+    once nothing more changes is a draw.
+    The generating (and looking up) is handed out to the pool by ranges
+    of the tables, and so is working out the unmoves of the positions
+    settled at each distance, by ranges of them. What the unmoves do to
+    the positions before them is then worked out here, in the same order
+    as if it were all done here, so the tables come out the same however
+    many workers there are.
+    @directory: The directory to write the tables to (and read the
+                tables the unit depends on from)
+    @unit: The signature
+    @pool: A concurrent.futures executor to hand the work out to, or None
+           to do it all in this process
+    type directory: str
+    type unit: Material
+    type pool: Executor
+    return: A list of dicts like generate()'s, one per table written
+    rtype: list
+    """
+    signatures = [unit] if _flip_signature(unit) == unit else [unit, _flip_signature(unit)]
+    offsets = {signatures[0]: 0}
+    if len(signatures) == 2:
+        offsets[signatures[1]] = _table_size(signatures[0])
+    total = sum(_table_size(signature) for signature in signatures)
+
+    values = bytearray(total) #The answer: 0 for a draw, or 1 + the number of moves
+    counts = bytearray(total) #The moves to inside positions whose values aren't known yet
+    longest = bytearray(total) #The most moves that a lost position's moves take to lose (+1)
+    drawn = bytearray(total) #1 if a move leads to a drawn position outside (so it can't be lost)
+    queued = bytearray(total) #1 if the position has a win (through a capture or crowning) queued
+    buckets = [[]] #The positions to settle, by how many moves they take
+
+    def bucket(distance):
+        distance = min(distance, _MAX_DISTANCE - (_MAX_DISTANCE - distance) % 2)
+        while len(buckets) <= distance:
+            buckets.append([])
+        return buckets[distance]
+
+    def run(function, tasks):
+        #(a single task isn't worth handing out)
+        return pool.map(function, tasks) if pool != None and len(tasks) > 1 else map(function, tasks)
+
+    tasks = [(directory, signature, offsets[signature], start, min(start + _CHUNK_ENTRIES, _table_size(signature)))
+             for signature in signatures for start in range(0, _table_size(signature), _CHUNK_ENTRIES)]
+    sizes = dict.fromkeys(signatures, 0) #How many positions (not entries) each table has
+    for (task, (chunk_counts, chunk_longest, chunk_drawn, known, size)) in zip(tasks, run(_scan_chunk, tasks)):
+        (start, stop) = (task[2] + task[3], task[2] + task[4])
+        (counts[start:stop], longest[start:stop], drawn[start:stop]) = (chunk_counts, chunk_longest, chunk_drawn)
+        sizes[task[1]] += size
+        for (position, distance, won) in known:
+            queued[position] = won
+            bucket(distance).append(position)
+
+    #Settle the positions in order of distance, spreading each one back to the
+    #positions it can be reached from:
+    distance = 0
+    while distance < len(buckets):
+        while buckets[distance]: #(a distance that's cut down to _MAX_DISTANCE can add to its own bucket)
+            (positions, buckets[distance]) = (buckets[distance], [])
+            settled = []
+            for position in positions:
+                if values[position] == 0:
+                    values[position] = distance + 1
+                    settled.append(position)
+            tasks = [(signatures, offsets, settled[start:start+_CHUNK_POSITIONS])
+                     for start in range(0, len(settled), _CHUNK_POSITIONS)]
+            for unmoves in run(_unmove_chunk, tasks):
+                unmoves = array("I", unmoves)
+                #(skipping the positions settled already, and the illegal unmoves, where a jump had to be made)
+                if distance % 2 == 0: #These positions are lost, so the ones before are won
+                    bucket(distance + 1).extend([previous for previous in unmoves
+                                                 if values[previous] == 0 and counts[previous] != 0])
+                    continue
+                for previous in unmoves:
+                    if values[previous] != 0 or counts[previous] == 0:
+                        continue
+                    counts[previous] -= 1
+                    longest[previous] = max(longest[previous], distance + 1)
+                    if counts[previous] == 0 and not queued[previous] and not drawn[previous]:
+                        bucket(longest[previous]).append(previous)
+        buckets[distance] = None
+        distance += 1
+
+    results = []
+    for signature in signatures:
+        offset = offsets[signature]
+        table = values[offset:offset+_table_size(signature)]
+        path = os.path.join(directory, _file_name(signature))
+        with open(path + ".tmp", "wb") as f:
+            f.write(_MAGIC + bytes(signature))
+            f.write(table)
+        os.replace(path + ".tmp", path) #So that no one ever maps a half written table
+        #(the entries that aren't positions are never settled, so they're all 0s)
+        bytes_counted = collections.Counter(table)
+        wins = sum(count for (byte, count) in bytes_counted.items() if byte % 2 == 0 and byte != 0)
+        losses = sum(count for (byte, count) in bytes_counted.items() if byte % 2 == 1)
+        results.append({"signature": signature, "positions": sizes[signature], "wins": wins,
+                        "draws": sizes[signature] - wins - losses, "losses": losses,
+                        "longest_win": max([byte-1 for byte in bytes_counted if byte % 2 == 0 and byte != 0],
+                                           default=None)})
+    return results
+
+
+def _scan_chunk(task):
+    """
+    Generates the moves from a range of a table's positions for
+    _solve_unit(): the ones that lead out of the unit are looked up in
+    the tables already built, and the ones that stay inside are counted.
+    @task: A 5-tuple: (directory, signature, the table's offset in the
+           unit, the first index, the index after the last)
+    type task: tuple
+    return: A 5-tuple: the counts, longest losses and drawn flags of the
+            range (see _solve_unit()), a list of (position, distance, won)
+            tuples for the positions that can be settled already, and the
+            number of positions in the range
+    rtype: tuple
+    """
+    (directory, signature, offset, start, stop) = task
+    tables = Tablebase(directory)
+    (counts, longest, drawn) = (bytearray(stop - start), bytearray(stop - start), bytearray(stop - start))
+    (known, size) = ([], 0)
+    for (index, black, red, kings) in _positions(signature, start, stop):
+        size += 1
+        (outside, internal) = _successors(black, red, kings)
+        win, lose = None, 0
+        for (successor_black, successor_red, successor_kings) in outside:
+            if successor_black == 0: #The opponent has no pieces left
+                byte = 1
+            else:
+                successor_signature = _signature(successor_black, successor_red, successor_kings)
+                byte = tables._read(successor_signature, _index(successor_signature, successor_black,
+                                                                 successor_red, successor_kings))
+                if byte == None:
+                    raise TablebaseError("the table for {} has to be built first".format(successor_signature))
+            if byte == 0:
+                drawn[index - start] = 1
+            elif byte % 2 == 1: #The opponent loses
+                win = byte if win == None else min(win, byte)
+            else:
+                lose = max(lose, byte)
+        counts[index - start] = len(internal)
+        longest[index - start] = lose
+        if win != None:
+            known.append((offset + index, win, 1))
+        elif not internal and not drawn[index - start]:
+            known.append((offset + index, lose, 0)) #Every move (if any) loses
+    tables.close()
+    return (counts, longest, drawn, known, size)
+
+
+def _unmove_chunk(task):
+    """
+    Works out the positions one move before each of a list of positions
+    in a unit, for _solve_unit().
+    @task: A 3-tuple: (the unit's signatures, a dict of their offsets in
+           the unit, a list of positions in the unit)
+    type task: tuple
+    return: The positions one move before them, in order, as the bytes of
+            an array of unsigned ints (which are much quicker to send back
+            than a list)
+    rtype: bytes
+    """
+    (signatures, offsets, positions) = task
+    unmoves = array("I")
+    for position in positions:
+        signature = signatures[0] if position < _table_size(signatures[0]) else signatures[1]
+        (black, red, kings) = _position(signature, position - offsets[signature])
+        before = _flip_signature(signature)
+        unmoves.extend(offsets[before] + _index(before, before_black, before_red, before_kings)
+                       for (before_black, before_red, before_kings) in _unmoves(black, red, kings))
+    return unmoves.tobytes()
+
+
+def _successors(black, red, kings):
+    """
+    Generates the moves of the player to move (black) the way
+    Checkers.legal_moves() does: every complete jump sequence if there
+    is one, and otherwise every step.
+    @black: The mask of the pieces of the player to move
+    @red: The mask of the opponent's pieces
+    @kings: The mask of all kings
+    type black: int
+    type red: int
+    type kings: int
+    return: A 2-tuple of lists of the positions after each move, turned
+            around so that the opponent is black: the first list holds
+            the ones in another table (after a capture or a crowning),
+            and the second the ones in the turned around table of this one
+    rtype: tuple
+    """
+    outside, inside = [], []
+    empty = ~(black | red) & bitboard.FULL_MASK
+    king_row = bitboard.KING_ROW["B"]
+    jumpers = bitboard.jumpers(black, red, kings, "B")
+    for sq in bitboard.iter_bits(jumpers):
+        kind = "K" if kings >> sq & 1 else "B"
+        for path in bitboard.jump_paths(sq, kind, "B", red, empty):
+            jumped, here, crowned = 0, sq, kind == "K"
+            for land in path:
+                jumped |= 1 << bitboard.JUMPED_SQUARES[(here, land)]
+                crowned = crowned or king_row >> land & 1
+                here = land
+            new_kings = kings & ~(1 << sq) & ~jumped
+            if crowned:
+                new_kings |= 1 << here
+            outside.append((bitboard.flip(red & ~jumped), bitboard.flip(black & ~(1 << sq) | 1 << here),
+                            bitboard.flip(new_kings)))
+    if jumpers:
+        return (outside, inside)
+
+    for sq in bitboard.iter_bits(black):
+        is_king = kings >> sq & 1
+        for to in bitboard.STEP_TABLE["K" if is_king else "B"][sq]:
+            if empty >> to & 1:
+                new_kings = kings & ~(1 << sq)
+                if is_king or king_row >> to & 1:
+                    new_kings |= 1 << to
+                successor = (bitboard.flip(red), bitboard.flip(black & ~(1 << sq) | 1 << to),
+                             bitboard.flip(new_kings))
+                (inside if is_king or not king_row >> to & 1 else outside).append(successor)
+    return (outside, inside)
+
+
+def _unmoves(black, red, kings):
+    """
+    Generates the positions that a position can be reached from by a
+    step that doesn't crown (the only moves that don't lead into another
+    table). Whether the step was legal (no jump had to be made instead)
+    is left to the caller.
+    @black: The mask of the pieces of the player to move
+    @red: The mask of the opponent's pieces (the ones that just moved)
+    @kings: The mask of all kings
+    type black: int
+    type red: int
+    type kings: int
+    return: A list of the positions before, turned around so that the
+            player who moved is black
+    rtype: list
+    """
+    befores = []
+    empty = ~(black | red) & bitboard.FULL_MASK
+    for sq in bitboard.iter_bits(red):
+        is_king = kings >> sq & 1
+        #A red man moves up the board, so it came from one of the squares below it:
+        for source in bitboard.STEP_TABLE["K" if is_king else "B"][sq]:
+            if empty >> source & 1:
+                before_kings = kings & ~(1 << sq) | (1 << source if is_king else 0)
+                befores.append((bitboard.flip(red & ~(1 << sq) | 1 << source), bitboard.flip(black),
+                                bitboard.flip(before_kings)))
+    return befores
+
+
+
+
+def _signatures(pieces):
+    """
+    Returns every material signature with the given number of pieces,
+    and at least one piece for each player.
+    @pieces: The number of pieces
+    type pieces: int
+    return: A list of Materials
+    rtype: list
+    """
+    return [checkers.Material(black_men, black_kings, red_men, red_kings)
+            for black_men in range(pieces+1) for black_kings in range(pieces+1-black_men)
+            for red_men in range(pieces+1-black_men-black_kings)
+            for red_kings in (pieces-black_men-black_kings-red_men,)
+            if black_men + black_kings > 0 and red_men + red_kings > 0]
+
+
+def _flip_signature(signature):
+    """
+    Returns the signature of a position turned around.
+    @signature: A Material
+    type signature: Material
+    return: The Material with the colors swapped
+    rtype: Material
+    """
+    return checkers.Material(signature.red_men, signature.red_kings, signature.black_men, signature.black_kings)
+
+
+def _signature(black, red, kings):
+    """
+    Returns the material signature of a position.
+    type black: int
+    type red: int
+    type kings: int
+    return: A Material
+    rtype: Material
+    """
+    return checkers.Material(bitboard.count_bits(black & ~kings), bitboard.count_bits(black & kings),
+                             bitboard.count_bits(red & ~kings), bitboard.count_bits(red & kings))
+
+
+def _table_size(signature):
+    """
+    Returns the number of entries in the table for a signature: one for
+    every way of placing each group of pieces (black men, red men, black
+    kings, red kings) on the squares it can stand on. Placements where
+    pieces of different groups would share a square are never looked
+    up, but are left in so that an index is quick to work out.
+    @signature: A Material
+    type signature: Material
+    return: The number of entries
+    rtype: int
+    """
+    return (_BINOMIAL[_MEN_SQUARES][signature.black_men] * _BINOMIAL[_MEN_SQUARES][signature.red_men]
+            * _BINOMIAL[bitboard.NUM_SQUARES][signature.black_kings]
+            * _BINOMIAL[bitboard.NUM_SQUARES][signature.red_kings])
+
+
+def _rank(bb, offset):
+    """
+    Returns the rank of a group of squares among all the groups of
+    as many squares (in colexicographic order).
+    @bb: A square mask
+    @offset: The lowest square the group could include
+    type bb: int
+    type offset: int
+    return: The rank
+    rtype: int
+    """
+    rank, k = 0, 0
+    for sq in bitboard.iter_bits(bb):
+        k += 1
+        rank += _BINOMIAL[sq - offset][k]
+    return rank
+
+
+def _index(signature, black, red, kings):
+    """
+    Returns the index of a position (black to move) in its table.
+    type signature: Material
+    type black: int
+    type red: int
+    type kings: int
+    return: The index
+    rtype: int
+    """
+    index = _rank(black & ~kings, 0)
+    index = index * _BINOMIAL[_MEN_SQUARES][signature.red_men] + _rank(red & ~kings, _RED_MEN_OFFSET)
+    index = index * _BINOMIAL[bitboard.NUM_SQUARES][signature.black_kings] + _rank(black & kings, 0)
+    return index * _BINOMIAL[bitboard.NUM_SQUARES][signature.red_kings] + _rank(red & kings, 0)
+
+
+_groups = {} #(number of squares, group size, lowest square) -> the groups' masks in order of rank
+
+def _group_masks(n, k, offset):
+    """
+    Returns every group of k squares out of n, in order of rank.
+    @n: The number of squares to choose from
+    @k: The number of squares in a group
+    @offset: The lowest square
+    type n: int
+    type k: int
+    type offset: int
+    return: A list of masks
+    rtype: list
+    """
+    if (n, k, offset) not in _groups:
+        groups = sorted(itertools.combinations(range(n), k), key=lambda group: group[::-1])
+        _groups[(n, k, offset)] = [sum(1 << (sq + offset) for sq in group) for group in groups]
+    return _groups[(n, k, offset)]
+
+
+def _position(signature, index):
+    """
+    Returns the position at an index of a signature's table (the inverse
+    of _index()).
+    type signature: Material
+    type index: int
+    return: A 3-tuple: (black pieces, red pieces, kings)
+    rtype: tuple
+    """
+    (index, red_kings) = divmod(index, _BINOMIAL[bitboard.NUM_SQUARES][signature.red_kings])
+    (index, black_kings) = divmod(index, _BINOMIAL[bitboard.NUM_SQUARES][signature.black_kings])
+    (black_men, red_men) = divmod(index, _BINOMIAL[_MEN_SQUARES][signature.red_men])
+    black_kings = _group_masks(bitboard.NUM_SQUARES, signature.black_kings, 0)[black_kings]
+    red_kings = _group_masks(bitboard.NUM_SQUARES, signature.red_kings, 0)[red_kings]
+    black = _group_masks(_MEN_SQUARES, signature.black_men, 0)[black_men] | black_kings
+    red = _group_masks(_MEN_SQUARES, signature.red_men, _RED_MEN_OFFSET)[red_men] | red_kings
+    return (black, red, black_kings | red_kings)
+
+
+def _positions(signature, start=0, stop=None):
+    """
+    Yields the positions of a signature's table in order (or of a range
+    of it), skipping the entries where two pieces would share a square.
+    @signature: A Material
+    @start: The first index
+    @stop: The index after the last, or None for the end of the table
+    type signature: Material
+    type start: int
+    type stop: int
+    return: A generator of 4-tuples: (index, black pieces, red pieces, kings)
+    rtype: generator
+    """
+    #The entries in order of index (the red kings change fastest):
+    entries = itertools.product(_group_masks(_MEN_SQUARES, signature.black_men, 0),
+                                _group_masks(_MEN_SQUARES, signature.red_men, _RED_MEN_OFFSET),
+                                _group_masks(bitboard.NUM_SQUARES, signature.black_kings, 0),
+                                _group_masks(bitboard.NUM_SQUARES, signature.red_kings, 0))
+    pieces = sum(signature)
+    for (index, (black_men, red_men, black_kings, red_kings)) in enumerate(itertools.islice(entries, start, stop),
+                                                                          start):
+        if bitboard.count_bits(black_men | red_men | black_kings | red_kings) == pieces:
+            yield (index, black_men | black_kings, red_men | red_kings, black_kings | red_kings)
+
+
+def _file_name(signature):
+    """
+    Returns the name of the file for a signature's table, e.g. "1012.cktb"
+    for a black man against a red man and two red kings.
+    type signature: Material
+    return: The file name
+    rtype: str
+    """
+    return "{}{}{}{}.cktb".format(*signature)
+
+
+def _parse_file_name(name):
+    """
+    Returns the signature that a file name is for (see _file_name()).
+    @name: A file name
+    type name: str
+    return: A Material, or None if the name isn't a table's
+    rtype: Material
+    """
+    (stem, extension) = os.path.splitext(name)
+    if extension != ".cktb" or len(stem) != 4 or not stem.isdigit():
+        return None
+    return checkers.Material(*(int(digit) for digit in stem))
+
+
+
+
+def main(argv=None):
+    """
+    The command line entry point.
+    @argv: The command line arguments (defaults to sys.argv[1:])
+    type argv: list
+    return: The exit status
+    rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Build (or probe) the checkers endgame tablebases.")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="the directory the tables go in")
+    parser.add_argument("-p", "--pieces", type=int, default=4, help="the most pieces to build tables for")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="the number of worker processes to build them with")
+    parser.add_argument("--probe", action="append", default=[], help="a PDN FEN position to look up instead")
+    args = parser.parse_args(argv)
+    for fen in args.probe:
+        try:
+            checkers.from_fen(fen)
+        except ValueError as error:
+            parser.error(str(error))
+
+    if args.probe:
+        tables = Tablebase(args.dir)
+        for fen in args.probe:
+            result = tables.probe(checkers.from_fen(fen))
+            if result == None:
+                print("{}: not in the tables".format(fen))
+            elif result[0] == DRAW:
+                print("{}: draw".format(fen))
+            else:
+                print("{}: {} in {} moves".format(fen, "win" if result[0] == WIN else "loss", result[1]))
+        return 0
+    generate(args.dir, args.pieces, args.workers, verbose=True)
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
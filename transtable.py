@@ -0,0 +1,391 @@
+#Contains the transposition table used by the checkers AI search.
+#The table remembers what the search found out about positions it has already seen, keyed
+#by their Zobrist hash (see Checkers.hash_key()), so that a position reached again by a
+#different move order (or in the next iteration of iterative deepening) isn't searched
+#again from scratch. SharedTranspositionTable keeps its entries in shared memory so that
+#the worker processes of a parallel search can all use the same table.
+
+from array import array
+from multiprocessing import shared_memory, resource_tracker
+import os
+import struct
+import sys
+
+#What a stored value says about a position's true value:
+EXACT = 0   #It is the true value
+LOWER = 1   #The true value is at least this (the search cut off on a high value)
+UPPER = 2   #The true value is at most this (every move came out no better than alpha)
+
+_ENTRY_BYTES = 8 + 8 + 8 + 1 + 1 + 1 #key, value, move, depth, bound type, age
+_EMPTY_MOVE = 0 #No Move encodes to 0 (it would have to go from square 0 to square 0)
+_SHARED_ENTRY_WORDS = 4 #check, depth/bound/age, value, move (64 bits each)
+_DOUBLE = struct.Struct("<d")
+_QWORD = struct.Struct("<Q")
+_attached_tables = {} #The shared tables this process has attached to, by name
+
+
+
+
+class TranspositionTable:
+    """ A fixed size table of search results, with two entries per bucket. """
+
+    def __init__(self, size_mb=16):
+        """
+        Initializes a TranspositionTable. All of the memory is set aside
+        up front and the table never grows. Every bucket has two entries:
+        the first is depth-preferred (it's only replaced by a search that
+        was at least as deep, or by any search once it's left over from
+        an old search), and the second is always replaced.
+        @size_mb: The number of megabytes the table may use
+        type size_mb: float
+        """
+        self._num_buckets = max(1, int(size_mb * 2**20) // (2*_ENTRY_BYTES))
+        num_entries = 2*self._num_buckets
+        self._keys = array("Q", [0]) * num_entries
+        self._values = array("d", [0.0]) * num_entries
+        self._moves = array("Q", [_EMPTY_MOVE]) * num_entries
+        self._depths = array("b", [-1]) * num_entries #-1 marks an empty entry
+        self._bounds = array("b", [EXACT]) * num_entries
+        self._ages = array("B", [0]) * num_entries
+        self._age = 0
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._overwrites = 0
+
+
+    def get_size(self):
+        """
+        Returns the number of entries the table can hold.
+        return: The number of entries (two per bucket)
+        rtype: int
+        """
+        return 2*self._num_buckets
+
+
+    def new_search(self):
+        """
+        Marks the start of a new search (e.g., for the next move of a
+        game). Entries from earlier searches are kept and can still be
+        hit, but they no longer get priority in the depth-preferred slot.
+        return: None
+        rtype: None
+        """
+        self._age = (self._age + 1) % 256
+
+
+    def clear(self):
+        """
+        Empties the table and resets its counters.
+        return: None
+        rtype: None
+        """
+        self._depths = array("b", [-1]) * len(self._depths)
+        self._hits = self._misses = self._stores = self._overwrites = 0
+
+
+    def probe(self, key):
+        """
+        Looks up a position.
+        @key: The position's 64-bit hash
+        type key: int
+        return: A 4-tuple (depth, bound type, value, move) for the position,
+                where move is a Move.encode() int (or None), or None if the
+                position isn't in the table
+        rtype: tuple, None
+        """
+        i = 2*(key % self._num_buckets)
+        for slot in (i, i+1):
+            if self._keys[slot] == key and self._depths[slot] >= 0:
+                self._hits += 1
+                move = self._moves[slot]
+                return (self._depths[slot], self._bounds[slot], self._values[slot],
+                        None if move == _EMPTY_MOVE else move)
+        self._misses += 1
+        return None
+
+
+    def store(self, key, depth, bound, value, move):
+        """
+        Stores what a search found out about a position.
+        @key: The position's 64-bit hash
+        @depth: How deep the position was searched
+        @bound: EXACT, LOWER or UPPER
+        @value: The value the search came up with
+        @move: The best move found, as a Move.encode() int (or None)
+        type key: int
+        type depth: int
+        type bound: int
+        type value: float
+        type move: int
+        return: None
+        rtype: None
+        """
+        i = 2*(key % self._num_buckets)
+        if _use_first_slot(key, depth, self._age, self._keys[i], self._depths[i], self._ages[i]):
+            slot = i
+            if self._keys[i+1] == key:
+                self._depths[i+1] = -1 #Don't keep an older copy of the position in the other slot
+        else:
+            slot = i+1
+        if self._depths[slot] >= 0 and self._keys[slot] != key:
+            self._overwrites += 1
+        self._stores += 1
+        self._keys[slot] = key
+        self._depths[slot] = min(depth, 127)
+        self._bounds[slot] = bound
+        self._values[slot] = value
+        self._moves[slot] = _EMPTY_MOVE if move == None else move
+        self._ages[slot] = self._age
+
+
+    def get_stats(self):
+        """
+        Returns the table's counters.
+        return: A dict with the number of hits, misses, stores, overwrites
+                (stores that pushed out a different position) and the
+                fraction of entries in use
+        rtype: dict
+        """
+        used = sum(1 for depth in self._depths if depth >= 0)
+        return {"hits": self._hits, "misses": self._misses, "stores": self._stores,
+                "overwrites": self._overwrites, "fill": used / len(self._depths)}
+
+
+
+
+class SharedTranspositionTable:
+    """ A TranspositionTable whose entries live in shared memory. """
+
+    def __init__(self, size_mb=16, name=None, num_buckets=None):
+        """
+        Initializes a SharedTranspositionTable: either a new one, or (given
+        the name and number of buckets of an existing one) another handle
+        on it. It works like TranspositionTable, but any number of processes
+        can probe and store at once. There are no locks: each entry is
+        four 64-bit words, the first of which is the XOR of the position's
+        key with the other three. An entry that's being written while it's
+        read (or that two processes wrote at once) fails that check, and
+        is treated as a miss rather than returning a mix of two entries.
+        The hit/miss/store counters are kept for each handle separately.
+        @size_mb: The number of megabytes the table may use (for a new table)
+        @name: The name of the shared memory block of an existing table
+        @num_buckets: The number of buckets of an existing table
+        type size_mb: float
+        type name: str
+        type num_buckets: int
+        """
+        if name == None:
+            self._num_buckets = max(1, int(size_mb * 2**20) // (2*8*_SHARED_ENTRY_WORDS))
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=8*(1 + 2*self._num_buckets*_SHARED_ENTRY_WORDS))
+            self._owner = True
+            _attached_tables[self._shm.name] = self #Unpickling it in this process gives back this handle
+        else:
+            self._num_buckets = num_buckets
+            #Only the process that made the table should free it, so this one
+            #doesn't get the resource tracker to (see multiprocessing issue 82300):
+            if sys.version_info >= (3, 13):
+                self._shm = shared_memory.SharedMemory(name=name, track=False)
+            else:
+                self._shm = shared_memory.SharedMemory(name=name)
+                if os.name == "posix": #The only place it's tracked, under the name with a leading "/"
+                    resource_tracker.unregister("/" + self._shm.name, "shared_memory")
+            self._owner = False
+        self._words = self._shm.buf.cast("Q") #Word 0 holds the age; the entries come after it
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._overwrites = 0
+
+
+    def __reduce__(self):
+        """
+        Pickles a handle on the table (e.g., to send it to a worker
+        process) as the name of its shared memory block, so that it's
+        attached to rather than copied.
+        return: The function to call and its arguments
+        rtype: tuple
+        """
+        return (_attach_shared_table, (self._shm.name, self._num_buckets))
+
+
+    def get_name(self):
+        """
+        Returns the name of the table's shared memory block.
+        return: The name of the shared memory block
+        rtype: str
+        """
+        return self._shm.name
+
+
+    def get_size(self):
+        """
+        Returns the number of entries the table can hold.
+        return: The number of entries (two per bucket)
+        rtype: int
+        """
+        return 2*self._num_buckets
+
+
+    def new_search(self):
+        """
+        Marks the start of a new search (see TranspositionTable.new_search()).
+        The age is in shared memory too, so every process sees it.
+        return: None
+        rtype: None
+        """
+        self._words[0] = (self._words[0] + 1) % 256
+
+
+    def clear(self):
+        """
+        Empties the table and resets this handle's counters.
+        return: None
+        rtype: None
+        """
+        self._shm.buf[8:] = bytes(len(self._shm.buf) - 8)
+        self._hits = self._misses = self._stores = self._overwrites = 0
+
+
+    def _read(self, slot):
+        """
+        Reads an entry.
+        @slot: The index of the entry
+        type slot: int
+        return: A 6-tuple: (key, depth, bound type, age, value bits, move),
+                where key is what the check word says (it's only the key
+                of the entry if the entry isn't torn), and depth is -1
+                for an empty entry
+        rtype: tuple
+        """
+        base = 1 + slot*_SHARED_ENTRY_WORDS
+        (check, meta, bits, move) = self._words[base:base+_SHARED_ENTRY_WORDS]
+        return (check ^ meta ^ bits ^ move, (meta & 0xFF) - 1, (meta >> 8) & 0xFF, meta >> 16, bits, move)
+
+
+    def probe(self, key):
+        """
+        Looks up a position (see TranspositionTable.probe()).
+        @key: The position's 64-bit hash
+        type key: int
+        return: A 4-tuple (depth, bound type, value, move), or None
+        rtype: tuple, None
+        """
+        i = 2*(key % self._num_buckets)
+        for slot in (i, i+1):
+            (slot_key, depth, bound, age, bits, move) = self._read(slot)
+            if slot_key == key and depth >= 0:
+                self._hits += 1
+                return (depth, bound, _DOUBLE.unpack(_QWORD.pack(bits))[0],
+                        None if move == _EMPTY_MOVE else move)
+        self._misses += 1
+        return None
+
+
+    def store(self, key, depth, bound, value, move):
+        """
+        Stores what a search found out about a position (see
+        TranspositionTable.store()).
+        @key: The position's 64-bit hash
+        @depth: How deep the position was searched
+        @bound: EXACT, LOWER or UPPER
+        @value: The value the search came up with
+        @move: The best move found, as a Move.encode() int (or None)
+        type key: int
+        type depth: int
+        type bound: int
+        type value: float
+        type move: int
+        return: None
+        rtype: None
+        """
+        age = self._words[0]
+        i = 2*(key % self._num_buckets)
+        first = self._read(i)
+        if _use_first_slot(key, depth, age, first[0], first[1], first[3]):
+            slot = i
+            if self._read(i+1)[0] == key:
+                self._words[1 + (i+1)*_SHARED_ENTRY_WORDS + 1] = 0 #Empty the older copy in the other slot
+        else:
+            slot = i+1
+        (slot_key, slot_depth) = self._read(slot)[:2]
+        if slot_depth >= 0 and slot_key != key:
+            self._overwrites += 1
+        self._stores += 1
+
+        meta = (min(depth, 127) + 1) | bound << 8 | age << 16
+        bits = _QWORD.unpack(_DOUBLE.pack(value))[0]
+        move = _EMPTY_MOVE if move == None else move
+        base = 1 + slot*_SHARED_ENTRY_WORDS
+        self._words[base:base+_SHARED_ENTRY_WORDS] = array("Q", [key ^ meta ^ bits ^ move, meta, bits, move])
+
+
+    def get_stats(self):
+        """
+        Returns this handle's counters (see TranspositionTable.get_stats()).
+        return: A dict with the number of hits, misses, stores, overwrites
+                and the fraction of entries in use (by any process)
+        rtype: dict
+        """
+        metas = self._words[2::_SHARED_ENTRY_WORDS]
+        used = sum(1 for meta in metas if meta & 0xFF)
+        return {"hits": self._hits, "misses": self._misses, "stores": self._stores,
+                "overwrites": self._overwrites, "fill": used / len(metas)}
+
+
+    def close(self):
+        """
+        Lets go of this handle on the table, and frees the shared memory
+        if this is the handle that made it. No handle on the table may be
+        used after its maker has been closed.
+        return: None
+        rtype: None
+        """
+        _attached_tables.pop(self._shm.name, None)
+        self._words.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+
+
+def _attach_shared_table(name, num_buckets):
+    """
+    Returns a handle on an existing SharedTranspositionTable, attaching
+    to its shared memory only the first time it's asked for in a process.
+    @name: The name of the table's shared memory block
+    @num_buckets: The number of buckets in the table
+    type name: str
+    type num_buckets: int
+    return: A handle on the table
+    rtype: SharedTranspositionTable
+    """
+    if name not in _attached_tables:
+        _attached_tables[name] = SharedTranspositionTable(name=name, num_buckets=num_buckets)
+    return _attached_tables[name]
+
+
+def _use_first_slot(key, depth, age, first_key, first_depth, first_age):
+    """
+    Decides which entry of a bucket a new result goes in. The first one
+    is depth-preferred: it's used if it's empty, holds the same position,
+    holds a search that was no deeper, or was left over from an older
+    search. Otherwise the result goes in the second (always replaced) one.
+    @key: The key of the new result
+    @depth: The depth of the new result
+    @age: The age of the current search
+    @first_key: The key in the first entry
+    @first_depth: The depth in the first entry (-1 if it's empty)
+    @first_age: The age of the first entry
+    type key: int
+    type depth: int
+    type age: int
+    type first_key: int
+    type first_depth: int
+    type first_age: int
+    return: True if the result goes in the first entry, False otherwise
+    rtype: bool
+    """
+    return first_key == key or first_depth < 0 or depth >= first_depth or first_age != age